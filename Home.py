@@ -1,7 +1,15 @@
+import time
+_inicio_render = time.perf_counter()
+
 import streamlit as st
 
 from pathlib import Path
 
+from aquecimento import iniciar_aquecimento, registrar_render
+
+# Constrói os dados em segundo plano enquanto a página inicial é exibida
+iniciar_aquecimento()
+
 st.sidebar.markdown('Dessenvolvido por [Brayan Maurico Rodríguez](https://sites.google.com/view/brayanmauricio)')
 
       
@@ -49,3 +57,5 @@ Dash interativo, armazenado em  [GitHub](https://github.com/bramau9010)
 '''
 )
 
+registrar_render("Home", _inicio_render)
+
@@ -0,0 +1,139 @@
+"""
+Carga de trabalho projetada por membro e dia útil, com capacidade diária e excesso de alocação.
+
+As horas de cada tarefa aberta (`Horas_Rateadas`, a parte do membro no card) são distribuídas em
+partes iguais pelos dias úteis de hoje até a entrega; tarefas atrasadas ou sem data caem inteiras no
+primeiro dia útil. A distribuição é feita com um vetor de diferenças por membro (soma a taxa diária
+no primeiro dia e subtrai depois do último) acumulado ao longo dos dias, então o custo é
+proporcional a tarefas + membros × dias, sem laços por tarefa.
+
+Capacidades diferentes por membro podem ser definidas em `capacidade.json`:
+
+    {"padrao": 8, "membros": {"ANA": 6, "JOAO": 4}}
+"""
+import json
+import logging
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from diagnostico import cronometrado
+
+logger = logging.getLogger(__name__)
+
+CAPACIDADE_PATH = "capacidade.json"
+# Horas de trabalho por dia útil de quem não tem capacidade própria
+CAPACIDADE_PADRAO_H = 8.0
+# Horizonte padrão da projeção, em dias úteis
+HORIZONTE_PADRAO_DIAS = 10
+
+
+def carregar_capacidades(path: str = CAPACIDADE_PATH) -> Tuple[float, Dict[str, float]]:
+    """
+    Lê a capacidade diária padrão e as capacidades por membro (nome como aparece na coluna `Membro`).
+
+    Returns:
+        Tuple[float, Dict[str, float]]: (capacidade padrão, {membro: capacidade}); sem arquivo, (8, {}).
+    """
+    if not os.path.exists(path):
+        return CAPACIDADE_PADRAO_H, {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        membros = {str(membro).upper(): float(horas) for membro, horas in (config.get("membros") or {}).items()}
+        return float(config.get("padrao", CAPACIDADE_PADRAO_H)), membros
+    except (OSError, ValueError, TypeError, AttributeError) as exc:
+        logger.warning(f"Não foi possível ler as capacidades em '{path}': {exc}")
+        return CAPACIDADE_PADRAO_H, {}
+
+
+def dias_uteis(hoje: pd.Timestamp, dias: int, feriados: Optional[Sequence] = None) -> pd.DatetimeIndex:
+    """Os `dias` primeiros dias úteis a partir de hoje (inclusive, se for dia útil)."""
+    feriados = np.asarray(feriados if feriados is not None else [], dtype='datetime64[D]')
+    primeiro = np.busday_offset(np.datetime64(hoje.date(), 'D'), 0, roll='forward', holidays=feriados)
+    return pd.DatetimeIndex(np.busday_offset(primeiro, np.arange(dias), holidays=feriados), name='Dia')
+
+
+@cronometrado("carga_trabalho")
+def matriz_carga(df: pd.DataFrame, hoje: pd.Timestamp, dias: int = HORIZONTE_PADRAO_DIAS,
+                 feriados: Optional[Sequence] = None, coluna_horas: str = 'Horas_Rateadas') -> pd.DataFrame:
+    """
+    Horas alocadas a cada membro em cada dia útil do horizonte.
+
+    Args:
+        df (pd.DataFrame): Tarefas abertas com as colunas derivadas (uma linha por card × membro).
+        hoje (pd.Timestamp): Data de referência, normalizada e no fuso de São Paulo.
+        dias (int): Tamanho do horizonte, em dias úteis.
+        feriados (Optional[Sequence]): Datas que não contam como dia útil.
+        coluna_horas (str): Coluna com as horas de cada linha.
+
+    Returns:
+        pd.DataFrame: Membros nas linhas (em ordem alfabética), dias úteis nas colunas; a parte de
+        tarefas com entrega além do horizonte que cai depois dele não entra.
+    """
+    calendario = dias_uteis(hoje, dias, feriados)
+    if df.empty:
+        return pd.DataFrame(index=pd.Index([], name='Membro'), columns=calendario, dtype='float64')
+    feriados = np.asarray(feriados if feriados is not None else [], dtype='datetime64[D]')
+    codigos, membros = pd.factorize(df['Membro'], sort=True)
+    horas = pd.to_numeric(df[coluna_horas], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    # Sem estimativa ou sem membro: não ocupa ninguém
+    horas = np.where(codigos >= 0, np.nan_to_num(horas, nan=0.0), 0.0)
+    codigos = np.maximum(codigos, 0)
+
+    # Último dia útil até a entrega, como posição no calendário (0 = primeiro dia útil)
+    entrega = df['Data_Entrega'].dt.tz_localize(None).to_numpy(dtype='datetime64[D]')
+    com_data = ~np.isnat(entrega)
+    primeiro = calendario[0].to_datetime64().astype('datetime64[D]')
+    ultimo = np.zeros(len(df), dtype=np.int64)
+    ultimo[com_data] = np.busday_count(primeiro, entrega[com_data] + np.timedelta64(1, 'D'), holidays=feriados) - 1
+    # Atrasadas e sem data: tudo no primeiro dia
+    ultimo = np.maximum(ultimo, 0)
+    taxa = horas / (ultimo + 1)
+
+    # Vetor de diferenças achatado (membro × dia, com uma coluna extra para o fim além do horizonte)
+    largura = dias + 1
+    inicio_flat = codigos * largura
+    fim_flat = codigos * largura + np.minimum(ultimo + 1, dias)
+    diferencas = (np.bincount(inicio_flat, weights=taxa, minlength=len(membros) * largura)
+                  - np.bincount(fim_flat, weights=taxa, minlength=len(membros) * largura))
+    carga = np.cumsum(diferencas.reshape(len(membros), largura), axis=1)[:, :dias]
+    # Resíduos de ponto flutuante da subtração não devem aparecer como horas
+    carga[np.abs(carga) < 1e-9] = 0.0
+    return pd.DataFrame(carga, index=pd.Index(np.asarray(membros, dtype=object), name='Membro'), columns=calendario)
+
+
+def capacidades(membros: Sequence[str], padrao: float = CAPACIDADE_PADRAO_H,
+                por_membro: Optional[Dict[str, float]] = None) -> pd.Series:
+    """Capacidade diária (horas) de cada membro, com `padrao` para quem não tem capacidade própria."""
+    por_membro = por_membro or {}
+    return pd.Series([por_membro.get(str(membro).upper(), padrao) for membro in membros],
+                     index=pd.Index(membros, name='Membro'), dtype='float64', name='Capacidade_Diaria')
+
+
+def excesso_alocacao(carga: pd.DataFrame, capacidade: pd.Series) -> pd.DataFrame:
+    """Horas acima da capacidade em cada membro × dia (0 onde não há excesso)."""
+    return carga.sub(capacidade.reindex(carga.index), axis=0).clip(lower=0)
+
+
+def resumo_alocacao(carga: pd.DataFrame, capacidade: pd.Series) -> pd.DataFrame:
+    """
+    Resumo por membro da projeção.
+
+    Returns:
+        pd.DataFrame: `Horas`, `Capacidade` (no horizonte), `Ocupacao` (fração), `Pico_Dia` (horas),
+        `Dias_Excedidos` e `Horas_Excedentes`, do membro mais sobrecarregado para o menos.
+    """
+    capacidade = capacidade.reindex(carga.index)
+    excesso = excesso_alocacao(carga, capacidade)
+    resumo = pd.DataFrame({
+        'Horas': carga.sum(axis=1),
+        'Capacidade': capacidade * carga.shape[1],
+        'Pico_Dia': carga.max(axis=1),
+        'Dias_Excedidos': (excesso > 0).sum(axis=1),
+        'Horas_Excedentes': excesso.sum(axis=1),
+    })
+    resumo['Ocupacao'] = resumo['Horas'] / resumo['Capacidade'].where(resumo['Capacidade'] > 0)
+    return resumo.sort_values(['Horas_Excedentes', 'Ocupacao'], ascending=False)
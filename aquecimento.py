@@ -0,0 +1,98 @@
+"""
+Partida rápida do dashboard: aquecimento em segundo plano e medição do tempo até o primeiro render.
+
+A primeira execução de qualquer página chama `iniciar_aquecimento()`, que dispara (uma vez por
+processo) uma thread que importa os módulos pesados (pandas, plotly, pyarrow) e constrói o
+DataFrame mestre, as colunas derivadas e o cubo no cache compartilhado. A página inicial não
+importa nada disso e é desenhada imediatamente; a página de Performance encontra os dados prontos
+ou, se o aquecimento ainda estiver em curso, aguarda a mesma construção em vez de repeti-la.
+
+Este módulo só usa a biblioteca padrão no nível do módulo. Defina `TRELLO_AQUECIMENTO=0` para desligar.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger("aquecimento")
+
+# Aproximação do início do servidor: a primeira página executada importa este módulo
+INICIO_PROCESSO = time.monotonic()
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_pronto = threading.Event()
+_tempos: Dict[str, float] = {}
+_primeiros_renders: Dict[str, Dict[str, float]] = {}
+
+
+def _aquecer():
+    inicio = time.perf_counter()
+    try:
+        import plotly.express  # noqa: F401
+        import historico  # noqa: F401
+        import utilidades
+        _tempos['importacoes_s'] = round(time.perf_counter() - inicio, 3)
+
+        inicio_dados = time.perf_counter()
+        versao, df_mestre = utilidades.dataset_atual()
+        if versao is not None and not df_mestre.empty:
+            dados = {'df_trello': df_mestre, 'versao': versao}
+            utilidades.obter_tarefas(dados)
+            utilidades.obter_cubo(dados)
+        _tempos['dados_s'] = round(time.perf_counter() - inicio_dados, 3)
+        logger.info(json.dumps({"evento": "aquecimento", **_tempos}))
+    except Exception:
+        # O aquecimento é só uma otimização: a página refaz a carga e mostra o erro, se houver
+        logger.exception("Falha no aquecimento em segundo plano.")
+    finally:
+        _pronto.set()
+
+
+def iniciar_aquecimento() -> bool:
+    """
+    Dispara o aquecimento em segundo plano, uma única vez por processo.
+
+    Returns:
+        bool: True se esta chamada iniciou o aquecimento.
+    """
+    global _thread
+    if os.environ.get("TRELLO_AQUECIMENTO", "1") == "0":
+        return False
+    with _lock:
+        if _thread is not None:
+            return False
+        _thread = threading.Thread(target=_aquecer, name="aquecimento", daemon=True)
+        _thread.start()
+    return True
+
+
+def aquecido() -> bool:
+    """True quando o aquecimento terminou (com sucesso ou não)."""
+    return _pronto.is_set()
+
+
+def registrar_render(pagina: str, inicio_script: float):
+    """
+    Registra, na primeira execução de cada página no processo, o tempo até o fim do render.
+
+    Args:
+        pagina (str): Nome da página.
+        inicio_script (float): `time.perf_counter()` capturado no início do script da página.
+    """
+    if pagina in _primeiros_renders:
+        return
+    registro = {
+        "script_s": round(time.perf_counter() - inicio_script, 3),
+        "desde_inicio_processo_s": round(time.monotonic() - INICIO_PROCESSO, 3),
+        "aquecido": aquecido(),
+    }
+    _primeiros_renders[pagina] = registro
+    logger.info(json.dumps({"evento": "primeiro_render", "pagina": pagina, **registro}, ensure_ascii=False))
+
+
+def relatorio() -> Dict[str, object]:
+    """Tempos do aquecimento e do primeiro render de cada página."""
+    return {"aquecimento": dict(_tempos), "primeiros_renders": dict(_primeiros_renders)}
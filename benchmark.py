@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Gerador de quadros sintéticos do Trello e benchmark do pipeline de ingestão e das páginas.
+
+Gera um export no formato do Trello (determinístico para uma mesma semente), mede tempo e pico
+de memória de cada etapa (leitura, mapeamento, processamento dos cards, schema/fuso, métricas
+derivadas e agregações dos gráficos) e grava o resultado em JSON para comparar execuções.
+Não precisa do servidor Streamlit.
+
+Exemplos:
+    python benchmark.py --cards 1000 10000 100000
+    python benchmark.py --cards 100000 --comparar benchmarks/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from utilidades import (
+    MOVIMENTOS_PATH, IndiceTarefas, TrelloDataFrameBuilder, _chave_filtros, aplicar_filtros,
+    calcular_metricas_derivadas, compactar_df_mestre, construir_cubo, ler_movimentos, selecionar_tarefas,
+)
+
+RESULTADOS_DIR = "benchmarks"
+
+# Tipos dos campos personalizados gerados além do tempo de execução
+TIPOS_CAMPOS = ("text", "list", "checkbox", "date")
+
+# Data em torno da qual as datas dos cards são geradas: fixa, para que a mesma semente gere o mesmo
+# quadro em qualquer dia
+REFERENCIA_PADRAO = datetime(2024, 7, 1, 12, tzinfo=timezone.utc)
+
+# Nomes de listas reconhecidos pelo construtor, mais listas que ele ignora
+NOMES_LISTAS = ["A Fazer", "Fazendo", "Concluído", "Backlog", "Em andamento", "Done", "Ideias", "Referências"]
+
+
+def _gerar_entidades(rng, listas, membros, etiquetas, campos):
+    lists = [{"id": f"lst{i:06d}", "name": f"{NOMES_LISTAS[i % len(NOMES_LISTAS)]} {i}", "idBoard": "board0"}
+             for i in range(listas)]
+    labels = [{"id": f"lbl{i:06d}", "name": "Rotina" if i == 0 else f"Etiqueta {i}", "idBoard": "board0"}
+              for i in range(etiquetas)]
+    members = [{"id": f"mbr{i:06d}", "fullName": f"Pessoa{i} Sobrenome{rng.randint(0, 99)}"} for i in range(membros)]
+    custom_fields = [{"id": "cf000000", "name": "Tempo de execução em minutos", "type": "number"}]
+    # Os demais campos alternam entre os tipos do Trello
+    for i in range(1, campos):
+        tipo = TIPOS_CAMPOS[(i - 1) % len(TIPOS_CAMPOS)]
+        campo = {"id": f"cf{i:06d}", "name": f"Campo {i}", "type": tipo}
+        if tipo == "list":
+            campo["options"] = [{"id": f"op{i:03d}{j:03d}", "value": {"text": f"Opção {j}"}} for j in range(5)]
+        custom_fields.append(campo)
+    return lists, labels, members, custom_fields
+
+
+def _gerar_cards(rng, cards, lists, labels, members, custom_fields, referencia):
+    for i in range(cards):
+        criado = referencia - timedelta(days=rng.randint(0, 365))
+        due = None
+        if rng.random() < 0.7:
+            due = (criado + timedelta(days=rng.randint(1, 60))).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        atividade = min(referencia, criado + timedelta(days=rng.randint(0, 90)))
+        card = {
+            "id": f"crd{i:09d}",
+            "idBoard": "board0",
+            "name": f"Tarefa sintética {i}",
+            "desc": "Descrição " * rng.randint(0, 20),
+            "idList": rng.choice(lists)["id"],
+            "closed": rng.random() < 0.15,
+            "idLabels": [lbl["id"] for lbl in rng.sample(labels, min(len(labels), rng.randint(0, 3)))],
+            "idMembers": [m["id"] for m in rng.sample(members, min(len(members), rng.choice((0, 1, 1, 1, 2, 3))))],
+            "due": due,
+            "dateLastActivity": atividade.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        }
+        itens = []
+        for campo in custom_fields:
+            if rng.random() < 0.3:
+                if campo["type"] == "number":
+                    itens.append({"idCustomField": campo["id"], "value": {"number": str(rng.choice((15, 30, 45, 60, 90)))}})
+                elif campo["type"] == "list":
+                    itens.append({"idCustomField": campo["id"], "idValue": rng.choice(campo["options"])["id"]})
+                elif campo["type"] == "checkbox":
+                    itens.append({"idCustomField": campo["id"], "value": {"checked": rng.choice(("true", "false"))}})
+                elif campo["type"] == "date":
+                    data = referencia - timedelta(days=rng.randint(0, 365))
+                    itens.append({"idCustomField": campo["id"], "value": {"date": data.strftime("%Y-%m-%dT%H:%M:%S.000Z")}})
+                else:
+                    itens.append({"idCustomField": campo["id"], "value": {"text": f"valor {rng.randint(0, 9)}"}})
+        if itens:
+            card["customFieldItems"] = itens
+        yield card
+
+
+def escrever_board(caminho, cards=1000, membros=20, etiquetas=12, listas=8, campos=3, semente=42, referencia=None):
+    """
+    Grava um export sintético do Trello em `caminho`, card a card (sem montar o quadro em memória).
+
+    Args:
+        caminho (str): Arquivo JSON de saída.
+        cards (int): Número de cards (1k a 1M).
+        membros, etiquetas, listas, campos (int): Número de membros, etiquetas, listas e campos customizados.
+        semente (int): Semente do gerador; a mesma semente produz o mesmo quadro.
+        referencia (datetime): Data em torno da qual as datas são geradas (padrão: `REFERENCIA_PADRAO`).
+    """
+    rng = random.Random(semente)
+    referencia = referencia or REFERENCIA_PADRAO
+    lists, labels, members, custom_fields = _gerar_entidades(rng, listas, membros, etiquetas, campos)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write('{"id": "board0", "name": "Quadro sintético", ')
+        for chave, valor in (("lists", lists), ("labels", labels), ("members", members), ("customFields", custom_fields)):
+            f.write(f'"{chave}": {json.dumps(valor, ensure_ascii=False)}, ')
+        f.write('"cards": [')
+        for n, card in enumerate(_gerar_cards(rng, cards, lists, labels, members, custom_fields, referencia)):
+            if n:
+                f.write(", ")
+            f.write(json.dumps(card, ensure_ascii=False))
+        f.write("]}")
+
+
+def gerar_board(cards=1000, **kwargs):
+    """Retorna o quadro sintético como dicionário (para tamanhos que cabem em memória)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "board.json")
+        escrever_board(caminho, cards=cards, **kwargs)
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class _Etapas:
+    """Cronometra etapas, registrando tempo e pico de memória alocada por cada uma."""
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.resultados = {}
+
+    def medir(self, nome, funcao, *args, **kwargs):
+        if self.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        pico = None
+        if self.memoria:
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        anterior = self.resultados.get(nome)
+        # Com repetições, guarda o melhor tempo
+        if anterior is None or segundos < anterior["segundos"]:
+            self.resultados[nome] = {"segundos": round(segundos, 6), "pico_mb": None if pico is None else round(pico, 3)}
+        return resultado
+
+
+def _agregacoes_resumo(df):
+    cubo = construir_cubo(df)
+    por_membro = cubo.groupby('Membro')[['Qtd_Tarefas', 'Qtd_Atrasadas_Abertas', 'Horas_Rateadas']].sum()
+    pivot = pd.pivot_table(cubo, values='Qtd_Tarefas', index='Membro', columns='Status', aggfunc='sum',
+                           fill_value=0, observed=True)
+    return cubo, por_membro, pivot
+
+
+def _agregacoes_dia(df):
+    df_hoje = aplicar_filtros(df, status=('A FAZER', 'FAZENDO'))
+    return {membro: grupo for membro, grupo in df_hoje.groupby('Membro', sort=False)}
+
+
+def _consulta_tarefas_dia(df, indice):
+    # Mesmo recorte de `_agregacoes_dia` pelo índice por status e entrega, só com as colunas da aba
+    filtros = _chave_filtros(True, None, ('A FAZER', 'FAZENDO'), None, "any")
+    return selecionar_tarefas(df, filtros, indice, None, ('ID_Tarefa', 'Membro', 'Status', 'Data_Entrega',
+                                                          'Horas_Rateadas'))
+
+
+def executar(caminho, repeticoes=1, memoria=True, mode="auto"):
+    """Executa o pipeline sobre o export em `caminho`, medindo cada etapa."""
+    etapas = _Etapas(memoria)
+    hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    movimentos = ler_movimentos(os.path.join(os.path.dirname(caminho), MOVIMENTOS_PATH))
+    for _ in range(repeticoes):
+        builder = TrelloDataFrameBuilder(caminho, moves=movimentos)
+        etapas.medir("leitura", builder._load_data)
+        n_cards = len(builder.data.get("cards", []))
+        etapas.medir("mapeamento", builder._map_entities)
+        modo = mode if mode != "auto" else ("columnar" if n_cards >= 2000 else "rows")
+        processar = builder._process_cards_columnar if modo == "columnar" else builder._process_cards_rows
+        bruto = etapas.medir(f"cards_{modo}", processar)
+        bruto = etapas.medir("linha_do_tempo", builder._apply_status_timeline, bruto)
+        df = etapas.medir("schema_fuso", builder._finalize_dataframe, bruto)
+        derivado = etapas.medir("metricas_derivadas", calcular_metricas_derivadas, df, hoje)
+        etapas.medir("agregacoes_resumo", _agregacoes_resumo, derivado)
+        etapas.medir("agregacoes_tarefas_dia", _agregacoes_dia, derivado)
+        indice = etapas.medir("indice_tarefas", IndiceTarefas, derivado)
+        etapas.medir("consulta_tarefas_dia", _consulta_tarefas_dia, derivado, indice)
+        compacto = etapas.medir("schema_compacto", compactar_df_mestre, df)
+    memoria = {
+        "padrao_mb": round(df.memory_usage(deep=True).sum() / 2**20, 3),
+        "compacto_mb": round(compacto.memory_usage(deep=True).sum() / 2**20, 3),
+    }
+    return {"linhas": len(df), "memoria_df": memoria, "etapas": etapas.resultados}
+
+
+def comparar(atual, base, tolerancia):
+    """Imprime a variação por etapa e retorna True se alguma etapa piorou além da tolerância."""
+    regressao = False
+    base_por_cards = {r["cards"]: r for r in base["execucoes"]}
+    for execucao in atual["execucoes"]:
+        referencia = base_por_cards.get(execucao["cards"])
+        if not referencia:
+            continue
+        print(f"\n{execucao['cards']} cards (atual vs base):")
+        for etapa, medida in execucao["etapas"].items():
+            anterior = referencia["etapas"].get(etapa)
+            if not anterior:
+                continue
+            razao = medida["segundos"] / max(anterior["segundos"], 1e-9)
+            marca = ""
+            if razao > 1 + tolerancia:
+                marca = "  <-- REGRESSÃO"
+                regressao = True
+            print(f"  {etapa:24s} {anterior['segundos']:9.4f}s -> {medida['segundos']:9.4f}s  ({razao:5.2f}x){marca}")
+    return regressao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de dados do dashboard Trello.")
+    parser.add_argument("--cards", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--membros", type=int, default=20)
+    parser.add_argument("--etiquetas", type=int, default=12)
+    parser.add_argument("--listas", type=int, default=8)
+    parser.add_argument("--campos", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--referencia", type=lambda data: datetime.fromisoformat(data).replace(tzinfo=timezone.utc),
+                        default=REFERENCIA_PADRAO, help="data (AAAA-MM-DD) em torno da qual as datas são geradas")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--modo", choices=("auto", "rows", "columnar"), default="auto")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede memória (tracemalloc deixa tudo mais lento)")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (padrão: benchmarks/resultado-<data>.json)")
+    parser.add_argument("--comparar", help="resultado anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita antes de acusar regressão")
+    args = parser.parse_args()
+
+    resultado = {
+        "data": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "parametros": {k: v.isoformat() if isinstance(v, datetime) else v
+                       for k, v in vars(args).items() if k not in ("saida", "comparar")},
+        "execucoes": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for cards in args.cards:
+            caminho = os.path.join(tmp, f"board-{cards}.json")
+            escrever_board(caminho, cards=cards, membros=args.membros, etiquetas=args.etiquetas,
+                           listas=args.listas, campos=args.campos, semente=args.semente, referencia=args.referencia)
+            tamanho_mb = os.path.getsize(caminho) / 2**20
+            medida = executar(caminho, args.repeticoes, memoria=not args.sem_memoria, mode=args.modo)
+            resultado["execucoes"].append({"cards": cards, "json_mb": round(tamanho_mb, 2), **medida})
+            print(f"\n{cards} cards ({tamanho_mb:.1f} MB, {medida['linhas']} linhas):")
+            for etapa, m in medida["etapas"].items():
+                pico = "" if m["pico_mb"] is None else f"  pico {m['pico_mb']:9.1f} MB"
+                print(f"  {etapa:24s} {m['segundos']:9.4f}s{pico}")
+            memoria = medida["memoria_df"]
+            print(f"  DataFrame mestre: {memoria['padrao_mb']:.1f} MB (padrão), {memoria['compacto_mb']:.1f} MB (compacto)")
+
+    saida = args.saida or os.path.join(RESULTADOS_DIR, f"resultado-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Cliente HTTP para a API do Trello com controle de taxa de requisições.
+
+Combina um token bucket do lado do cliente com os limites informados pelo próprio Trello
+(cabeçalhos `x-rate-limit-*` e `Retry-After`) e repete GETs que falharem com 429/5xx
+usando backoff exponencial com jitter. O tempo gasto esperando fica registrado em `stats`.
+"""
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status que indicam falha transitória: o GET é repetido
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Cabeçalhos de limite devolvidos pelo Trello (por token e por chave de API)
+RATE_LIMIT_HEADERS = (
+    ("x-rate-limit-api-token-remaining", "x-rate-limit-api-token-interval-ms"),
+    ("x-rate-limit-api-key-remaining", "x-rate-limit-api-key-interval-ms"),
+)
+
+
+def _numero(valor):
+    """Valor numérico de um cabeçalho, ou None se ausente ou malformado."""
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def _segundos_retry_after(valor):
+    """Espera pedida em `Retry-After` (segundos ou data HTTP), ou None se ausente ou malformada."""
+    segundos = _numero(valor)
+    if segundos is None and valor:
+        try:
+            data = parsedate_to_datetime(valor)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        segundos = (data - datetime.now(timezone.utc)).total_seconds()
+    return None if segundos is None else max(0.0, segundos)
+
+
+class TokenBucket:
+    """Token bucket thread-safe: libera até `capacity` requisições por `interval` segundos."""
+
+    def __init__(self, capacity, interval):
+        self.capacity = capacity
+        self.rate = capacity / interval
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Consome um token, bloqueando até que haja um disponível. Retorna o tempo esperado (s)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class TrelloClient:
+    """
+    Cliente reutilizável para GETs na API do Trello.
+
+    Args:
+        key (str): Chave da API.
+        token (str): Token do usuário.
+        base_url (str): URL base da API (pode apontar para um servidor local de testes).
+        pool_size (int): Conexões keep-alive mantidas no pool da sessão.
+        requests_per_interval (int): Orçamento do token bucket (o Trello permite 100 por token a cada 10 s).
+        interval (float): Janela do orçamento, em segundos.
+        max_retries (int): Número máximo de novas tentativas por requisição.
+        backoff_base (float): Espera base do backoff exponencial, em segundos.
+        backoff_max (float): Espera máxima entre tentativas, em segundos (também limita `Retry-After` e as
+            pausas pedidas pelos cabeçalhos de limite).
+    """
+
+    def __init__(self, key, token, base_url="https://api.trello.com/1", pool_size=4,
+                 requests_per_interval=100, interval=10.0, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0):
+        self.key = key
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(requests_per_interval, interval)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttle_wait_s": 0.0, "retry_wait_s": 0.0}
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _wait_turn(self):
+        # Pausa global imposta pelo servidor (Retry-After ou orçamento esgotado) + token bucket local
+        with self._lock:
+            pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        waited = max(pause, 0.0) + self.bucket.acquire()
+        if waited:
+            self._count("throttle_wait_s", waited)
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _observe_limits(self, response):
+        # Cabeçalhos malformados são ignorados: não devem interromper a sincronização
+        for remaining_header, interval_header in RATE_LIMIT_HEADERS:
+            remaining = _numero(response.headers.get(remaining_header))
+            if remaining is not None and remaining <= 0:
+                interval_ms = _numero(response.headers.get(interval_header))
+                interval_ms = 10000 if interval_ms is None or interval_ms < 0 else interval_ms
+                self._pause(min(self.backoff_max, interval_ms / 1000))
+
+    def _backoff(self, attempt, response=None):
+        retry_after = _segundos_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Backoff exponencial com "full jitter"
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, path, params=None, allow_404=False):
+        """
+        Faz um GET em `path`, respeitando os limites de taxa e repetindo falhas transitórias.
+
+        Returns:
+            O JSON da resposta (qualquer status 2xx; None se vier sem corpo), ou None para 404 quando
+            `allow_404` é True. Os demais status levantam `requests.HTTPError`, depois das novas
+            tentativas no caso de falhas transitórias.
+        """
+        url = f"{self.base_url}{path}"
+        params = {"key": self.key, "token": self.token, **(params or {})}
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn()
+            self._count("requests")
+            try:
+                r = self.session.get(url, params=params, timeout=60)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Falha de conexão em {path} ({exc}); nova tentativa em {delay:.1f}s.")
+            else:
+                self._observe_limits(r)
+                if allow_404 and r.status_code == 404:
+                    return None
+                if 200 <= r.status_code < 300:
+                    # 204 e afins: sucesso sem corpo
+                    return r.json() if r.content else None
+                if r.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    print(f"Erro ao baixar do Trello: {r.status_code} -> {r.text}")
+                    # raise_for_status não acusa redirecionamentos (3xx) não seguidos
+                    raise requests.HTTPError(f"{r.status_code} ao baixar {path} do Trello", response=r)
+                delay = self._backoff(attempt, r)
+                if r.status_code == 429:
+                    # Limite atingido: todas as threads aguardam, não só esta
+                    self._pause(delay)
+                print(f"Trello respondeu {r.status_code} em {path}; nova tentativa em {delay:.1f}s.")
+            self._count("retries")
+            self._count("retry_wait_s", delay)
+            time.sleep(delay)
+
+    def report(self):
+        """Resumo das requisições feitas e do tempo gasto esperando."""
+        s = self.stats
+        return (f"{s['requests']} requisições, {s['retries']} novas tentativas, "
+                f"{s['throttle_wait_s']:.1f}s aguardando limite de taxa, {s['retry_wait_s']:.1f}s em backoff")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+DataFrame mestre compartilhado entre várias réplicas do Streamlit no mesmo host.
+
+Um único processo carregador (`python compartilhado.py`) observa o export, constrói o DataFrame
+mestre com as colunas derivadas do dia e o publica como Arrow IPC sem compressão no diretório
+`TRELLO_COMPARTILHADO` (de preferência em /dev/shm, que fica em memória). Cada publicação é uma
+nova geração: o arquivo `dataset-<geração>.arrow` é gravado por inteiro e só então o contador de
+8 bytes do arquivo `geracao` é incrementado.
+
+As réplicas, iniciadas com a mesma variável, leem o contador (mapeado em memória) a cada rerun e,
+quando ele muda, abrem a nova geração com memory mapping. As páginas do arquivo são as mesmas para
+todos os processos, então a memória do DataFrame não cresce com o número de réplicas; os arrays
+vindos do arquivo são somente leitura. Gerações antigas são apagadas depois de `GERACOES_MANTIDAS`
+publicações; quem ainda as usa continua com o mapeamento válido até trocar de geração.
+
+Exemplo:
+    TRELLO_COMPARTILHADO=/dev/shm/trello python compartilhado.py &
+    TRELLO_COMPARTILHADO=/dev/shm/trello streamlit run Home.py --server.port 8501
+"""
+import argparse
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from utilidades import (
+    DIRETORIO_COMPARTILHADO, INTERVALO_OBSERVADOR_S, SNAPSHOT_SCHEMA_VERSION, TRELLO_JSON_PATH, DatasetCache,
+    calcular_metricas_derivadas, carregar_df_mestre, salvar_snapshot_colunar,
+)
+
+logger = logging.getLogger("compartilhado")
+
+# Gerações mantidas no diretório (a atual e as anteriores), para as réplicas que ainda não trocaram
+GERACOES_MANTIDAS = 2
+ARQUIVO_GERACAO = "geracao"
+
+
+def _caminho_geracao(diretorio: str, geracao: int) -> str:
+    return os.path.join(diretorio, f"dataset-{geracao:010d}.arrow")
+
+
+class PublicadorCompartilhado:
+    """
+    Publica gerações do DataFrame mestre no diretório compartilhado (lado do processo carregador).
+
+    Args:
+        diretorio (str): Diretório compartilhado.
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, ARQUIVO_GERACAO)
+        # O contador nunca é recriado: se o carregador reiniciar, as gerações continuam crescendo
+        if not os.path.exists(caminho):
+            with open(caminho, "wb") as f:
+                f.write(bytes(8))
+        self._arquivo = open(caminho, "r+b")
+        self._contador = mmap.mmap(self._arquivo.fileno(), 8)
+
+    @property
+    def geracao(self) -> int:
+        return int.from_bytes(self._contador[:8], "little")
+
+    def publicar(self, df: pd.DataFrame, versao: str, hoje: pd.Timestamp) -> int:
+        """
+        Grava o DataFrame (com as colunas derivadas de `hoje`) como a próxima geração e a anuncia.
+
+        Returns:
+            int: O número da geração publicada.
+        """
+        geracao = self.geracao + 1
+        derivado = calcular_metricas_derivadas(df, hoje)
+        salvar_snapshot_colunar(derivado, _caminho_geracao(self.diretorio, geracao), versao,
+                                metadados={"geracao": str(geracao), "hoje": hoje.isoformat()})
+        # O arquivo já está completo quando o contador muda
+        self._contador[:8] = geracao.to_bytes(8, "little")
+        self._contador.flush()
+        self._remover_antigas(geracao)
+        logger.info(f"Geração {geracao} publicada: snapshot {versao[:12]}, {len(derivado)} registros, dia {hoje.date()}.")
+        return geracao
+
+    def _remover_antigas(self, geracao: int):
+        for nome in os.listdir(self.diretorio):
+            if not (nome.startswith("dataset-") and nome.endswith(".arrow")):
+                continue
+            numero = nome[len("dataset-"):-len(".arrow")]
+            if numero.isdigit() and int(numero) <= geracao - GERACOES_MANTIDAS:
+                try:
+                    os.remove(os.path.join(self.diretorio, nome))
+                except OSError as exc:
+                    logger.warning(f"Não foi possível remover a geração antiga '{nome}': {exc}")
+
+    def executar(self, json_path: str = TRELLO_JSON_PATH, intervalo: float = INTERVALO_OBSERVADOR_S):
+        """
+        Publica uma geração sempre que o export muda ou o dia vira (as colunas derivadas dependem da data).
+        """
+        cache = DatasetCache(poll_interval=0)
+        publicado: Optional[Tuple[str, pd.Timestamp]] = None
+        while True:
+            hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+            try:
+                versao, df = cache.get(json_path, carregar_df_mestre)
+                if versao is not None and not df.empty and (versao, hoje) != publicado:
+                    self.publicar(df, versao, hoje)
+                    publicado = (versao, hoje)
+            except Exception:
+                logger.exception(f"Falha ao publicar o snapshot de '{json_path}'; mantendo a geração anterior.")
+            time.sleep(max(intervalo, 0.5))
+
+
+class AnexoCompartilhado:
+    """
+    Anexa, somente leitura, a geração mais recente publicada no diretório compartilhado (lado das réplicas).
+
+    Args:
+        diretorio (str): Diretório compartilhado.
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._contador: Optional[mmap.mmap] = None
+        self._atual: Optional[Tuple[int, str, pd.DataFrame]] = None
+
+    def _geracao(self) -> int:
+        if self._contador is None:
+            try:
+                with open(os.path.join(self.diretorio, ARQUIVO_GERACAO), "rb") as f:
+                    self._contador = mmap.mmap(f.fileno(), 8, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return 0
+        return int.from_bytes(self._contador[:8], "little")
+
+    def _anexar(self, geracao: int) -> Tuple[str, pd.DataFrame]:
+        with pa.memory_map(_caminho_geracao(self.diretorio, geracao), "r") as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if metadata.get(b"trello_schema_version") != SNAPSHOT_SCHEMA_VERSION.encode():
+                raise ValueError(f"geração {geracao} publicada com outro schema")
+            table = reader.read_all()
+        df = table.to_pandas(split_blocks=True)
+        df.attrs['hoje_derivado'] = pd.Timestamp(metadata[b"trello_hoje"].decode()).tz_convert('America/Sao_Paulo')
+        # A mesma versão do export é republicada quando o dia vira: a geração entra na chave dos caches
+        return f"{metadata[b'trello_source_sha256'].decode()}-g{geracao}", df
+
+    def current(self) -> Optional[Tuple[str, pd.DataFrame]]:
+        """
+        Retorna a versão e uma visão do DataFrame da geração publicada, ou None se nada foi publicado.
+
+        Só abre um arquivo quando o contador muda; se a geração nova não puder ser aberta,
+        continua servindo a anterior.
+        """
+        geracao = self._geracao()
+        with self._lock:
+            atual = self._atual
+            if geracao and (atual is None or atual[0] != geracao):
+                try:
+                    versao, df = self._anexar(geracao)
+                    atual = self._atual = (geracao, versao, df)
+                    logger.info(f"Geração {geracao} anexada ({len(df)} registros).")
+                except (OSError, ValueError, KeyError, pa.ArrowInvalid) as exc:
+                    logger.warning(f"Não foi possível anexar a geração {geracao}: {exc}")
+        if atual is None:
+            return None
+        return atual[1], atual[2].copy(deep=False)
+
+
+_ANEXOS: Dict[str, AnexoCompartilhado] = {}
+_ANEXOS_LOCK = threading.Lock()
+
+
+def anexo_compartilhado(diretorio: str) -> AnexoCompartilhado:
+    """O anexo do processo para `diretorio`, criado na primeira chamada."""
+    with _ANEXOS_LOCK:
+        anexo = _ANEXOS.get(diretorio)
+        if anexo is None:
+            anexo = _ANEXOS[diretorio] = AnexoCompartilhado(diretorio)
+        return anexo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processo carregador do DataFrame compartilhado entre réplicas.")
+    parser.add_argument("--diretorio", default=DIRETORIO_COMPARTILHADO or None,
+                        help="diretório compartilhado (padrão: TRELLO_COMPARTILHADO)")
+    parser.add_argument("--json", default=TRELLO_JSON_PATH, help="export do Trello observado")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_OBSERVADOR_S, help="intervalo (s) de verificação")
+    args = parser.parse_args()
+    if not args.diretorio:
+        parser.error("informe --diretorio ou defina TRELLO_COMPARTILHADO")
+    PublicadorCompartilhado(args.diretorio).executar(args.json, args.intervalo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Cronometragem das etapas críticas do dashboard (carga, mapeamento, cards, schema, métricas, gráficos).
+
+Cada etapa é envolvida por `medir("etapa")` (ou pelo decorador `cronometrado`). Desativado, o custo
+é o de um `if`; ativado para o processo inteiro (variável de ambiente `TRELLO_DIAGNOSTICO=1`), cada
+medição gera um registro JSON no log, entra nos percentis acumulados do processo e na lista da
+execução (rerun) corrente. A caixa na barra lateral só decide, em cada sessão, se o painel com essas
+medições é exibido.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("diagnostico")
+
+# Quantas medições por etapa entram nos percentis acumulados
+JANELA_PERCENTIS = 500
+
+
+class _Medicao:
+    """Uma medição em andamento; `registrar(df)` anota linhas e memória do DataFrame produzido."""
+
+    __slots__ = ("etapa", "inicio", "linhas", "memoria_mb")
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        self.inicio = time.perf_counter()
+        self.linhas: Optional[int] = None
+        self.memoria_mb: Optional[float] = None
+
+    def registrar(self, df: Any):
+        if isinstance(df, pd.DataFrame):
+            self.linhas = len(df)
+            self.memoria_mb = round(float(df.memory_usage(deep=False).sum()) / 2**20, 3)
+        return df
+
+
+class _MedicaoNula:
+    __slots__ = ()
+
+    def registrar(self, df: Any):
+        return df
+
+
+_NULA = nullcontext(_MedicaoNula())
+
+
+class _Contexto:
+    __slots__ = ("diagnostico", "etapa", "medicao")
+
+    def __init__(self, diagnostico: "Diagnostico", etapa: str):
+        self.diagnostico = diagnostico
+        self.etapa = etapa
+
+    def __enter__(self) -> _Medicao:
+        self.medicao = _Medicao(self.etapa)
+        return self.medicao
+
+    def __exit__(self, *exc):
+        self.diagnostico._concluir(self.medicao)
+        return False
+
+
+class Diagnostico:
+    """
+    Acumula as medições do processo (percentis por etapa) e as da execução corrente de cada thread.
+
+    Args:
+        janela (int): Número de medições mais recentes mantidas por etapa.
+    """
+
+    def __init__(self, janela: int = JANELA_PERCENTIS):
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._historico: Dict[str, deque] = {}
+        self._local = threading.local()
+
+    def _concluir(self, medicao: _Medicao):
+        ms = (time.perf_counter() - medicao.inicio) * 1000
+        registro = {"etapa": medicao.etapa, "ms": round(ms, 3), "linhas": medicao.linhas, "memoria_mb": medicao.memoria_mb}
+        logger.info(json.dumps(registro, ensure_ascii=False))
+        with self._lock:
+            self._historico.setdefault(medicao.etapa, deque(maxlen=self.janela)).append(ms)
+        execucao = getattr(self._local, "execucao", None)
+        if execucao is not None:
+            execucao.append(registro)
+
+    def medir(self, etapa: str) -> "_Contexto":
+        return _Contexto(self, etapa)
+
+    def iniciar_execucao(self):
+        """Começa a lista de medições de um novo rerun na thread atual."""
+        self._local.execucao = []
+
+    def execucao_atual(self) -> List[Dict[str, Any]]:
+        return list(getattr(self._local, "execucao", None) or [])
+
+    def percentis(self) -> pd.DataFrame:
+        """Contagem, p50, p90, p99 e total (ms) das medições acumuladas de cada etapa."""
+        with self._lock:
+            amostras = {etapa: np.fromiter(valores, dtype=float) for etapa, valores in self._historico.items()}
+        linhas = {
+            etapa: {"n": len(v), "p50_ms": np.percentile(v, 50), "p90_ms": np.percentile(v, 90),
+                    "p99_ms": np.percentile(v, 99), "total_ms": v.sum()}
+            for etapa, v in amostras.items() if len(v)
+        }
+        return pd.DataFrame.from_dict(linhas, orient="index").rename_axis("Etapa")
+
+
+_DIAGNOSTICO = Diagnostico()
+_ativo = os.environ.get("TRELLO_DIAGNOSTICO", "") not in ("", "0")
+
+
+def ativo() -> bool:
+    return _ativo
+
+
+def ativar(valor: bool = True):
+    """Liga ou desliga as medições no processo (scripts; o dashboard segue `TRELLO_DIAGNOSTICO`)."""
+    global _ativo
+    _ativo = valor
+
+
+def medir(etapa: str):
+    """Context manager que cronometra `etapa` quando o diagnóstico está ativo (senão não faz nada)."""
+    if not _ativo:
+        return _NULA
+    return _DIAGNOSTICO.medir(etapa)
+
+
+def cronometrado(etapa: str):
+    """Decorador equivalente a `medir`; anota linhas e memória se a função retornar um DataFrame."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            with _DIAGNOSTICO.medir(etapa) as medicao:
+                return medicao.registrar(funcao(*args, **kwargs))
+        return envolvida
+    return decorador
+
+
+def iniciar_execucao():
+    if _ativo:
+        _DIAGNOSTICO.iniciar_execucao()
+
+
+def relatorio_memoria(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Memória ocupada por coluna (incluindo o conteúdo das strings e as tabelas das categorias).
+
+    Returns:
+        pd.DataFrame: `Tipo`, `MB` e `Bytes_Por_Linha` por coluna, com uma linha `TOTAL`.
+    """
+    bytes_coluna = df.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        'Tipo': df.dtypes.astype(str),
+        'MB': bytes_coluna / 2**20,
+        'Bytes_Por_Linha': bytes_coluna / max(len(df), 1),
+    })
+    relatorio.loc['TOTAL'] = ['', relatorio['MB'].sum(), relatorio['Bytes_Por_Linha'].sum()]
+    return relatorio
+
+
+def painel_sidebar(df: Optional[pd.DataFrame] = None):
+    """
+    Caixa opcional na barra lateral que mostra, nesta sessão, as medições deste rerun, os
+    percentis acumulados do processo e a memória de cada coluna de `df` (o DataFrame mestre).
+
+    A escolha fica no `st.session_state` da sessão; as medições em si só são feitas quando o
+    processo foi iniciado com `TRELLO_DIAGNOSTICO=1`, para todas as sessões.
+    """
+    import streamlit as st
+
+    if not st.sidebar.checkbox("Diagnóstico de desempenho", value=False, key="diagnostico"):
+        return
+    with st.sidebar.expander("⏱️ Diagnóstico", expanded=True):
+        if not _ativo:
+            st.caption("Medições desligadas neste processo: inicie o dashboard com `TRELLO_DIAGNOSTICO=1`.")
+            return
+        st.markdown("**Este rerun**")
+        execucao = _DIAGNOSTICO.execucao_atual()
+        if execucao:
+            st.dataframe(pd.DataFrame(execucao).set_index("etapa"), use_container_width=True)
+        else:
+            st.caption("Nenhuma etapa medida (resultados vindos do cache).")
+        st.markdown("**Acumulado no processo**")
+        st.dataframe(_DIAGNOSTICO.percentis().round(2), use_container_width=True)
+        if df is not None:
+            # Compare com TRELLO_SCHEMA_COMPACTO=1 para ver o ganho de cada coluna
+            memoria = relatorio_memoria(df)
+            st.markdown(f"**Memória do DataFrame** ({len(df)} linhas, {memoria.loc['TOTAL', 'MB']:.1f} MB)")
+            st.dataframe(memoria.round(2), use_container_width=True)
@@ -0,0 +1,228 @@
+"""
+Histórico de snapshots do quadro em formato colunar (Parquet), só de acréscimo.
+
+Cada sincronização grava um arquivo `delta-<momento>.parquet` contendo apenas os cards cujos
+campos rastreados mudaram desde o snapshot anterior (todas as linhas do card, uma por membro),
+além de marcadores de remoção. Cada versão de card vale de `Valido_Desde` até o `Valido_Desde`
+da versão seguinte, o que permite reconstruir o DataFrame mestre "como era" em qualquer momento
+sem reprocessar exports completos.
+"""
+import logging
+import os
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utilidades import DATE_COLUMNS, MASTER_COLUMNS, MASTER_SCHEMA, aplicar_filtros, calcular_metricas_derivadas
+
+logger = logging.getLogger(__name__)
+
+HISTORICO_DIR = "historico"
+
+# Colunas de controle gravadas junto com as colunas do DataFrame mestre
+COLUNAS_CONTROLE = ['Valido_Desde', 'Removido', 'Hash_Card']
+
+
+class HistoricoSnapshots:
+    """
+    Armazena e consulta o histórico de versões dos cards.
+
+    Args:
+        diretorio (str): Diretório com os arquivos delta.
+    """
+
+    def __init__(self, diretorio: str = HISTORICO_DIR):
+        self.diretorio = diretorio
+
+    def arquivos(self) -> List[str]:
+        """Arquivos delta em ordem cronológica (o nome carrega o momento da gravação)."""
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted(
+            os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio)
+            if nome.startswith("delta-") and nome.endswith(".parquet")
+        )
+
+    @staticmethod
+    def _hash_cards(df: pd.DataFrame) -> pd.Series:
+        """Hash por card, independente da ordem das linhas de membros."""
+        hash_linhas = pd.util.hash_pandas_object(df[MASTER_COLUMNS], index=False)
+        return hash_linhas.groupby(df['ID_Tarefa'].to_numpy()).sum()
+
+    def _hashes_atuais(self) -> pd.Series:
+        """Hash da versão mais recente de cada card ainda presente no histórico."""
+        arquivos = self.arquivos()
+        if not arquivos:
+            return pd.Series(dtype='uint64')
+        controle = pd.concat(
+            [pq.read_table(arquivo, columns=['ID_Tarefa'] + COLUNAS_CONTROLE).to_pandas() for arquivo in arquivos],
+            ignore_index=True,
+        )
+        ultimas = controle.drop_duplicates('ID_Tarefa', keep='last')
+        ultimas = ultimas[~ultimas['Removido']]
+        return pd.Series(ultimas['Hash_Card'].to_numpy(), index=ultimas['ID_Tarefa'].to_numpy())
+
+    def registrar(self, df: pd.DataFrame, momento: Optional[pd.Timestamp] = None) -> Optional[str]:
+        """
+        Acrescenta ao histórico os cards novos, alterados ou removidos em relação ao último snapshot.
+
+        Args:
+            df (pd.DataFrame): O DataFrame mestre do snapshot atual.
+            momento (Optional[pd.Timestamp]): Início da validade desta versão (padrão: agora, em UTC).
+
+        Returns:
+            Optional[str]: O arquivo delta gravado, ou None se nada mudou.
+        """
+        momento = pd.Timestamp.now(tz='UTC') if momento is None else pd.Timestamp(momento).tz_convert('UTC')
+        anteriores = self._hashes_atuais()
+        atuais = self._hash_cards(df) if not df.empty else pd.Series(dtype='uint64')
+
+        comuns = atuais.index.intersection(anteriores.index)
+        alterados = atuais.index.difference(anteriores.index).union(
+            comuns[atuais[comuns].to_numpy() != anteriores[comuns].to_numpy()]
+        )
+        removidos = anteriores.index.difference(atuais.index)
+        if alterados.empty and removidos.empty:
+            logger.info("Histórico: nenhum card mudou desde o último snapshot.")
+            return None
+
+        linhas = df[df['ID_Tarefa'].isin(alterados)].copy()
+        linhas['Removido'] = False
+        linhas['Hash_Card'] = atuais.loc[linhas['ID_Tarefa'].to_numpy()].to_numpy()
+        marcadores = pd.DataFrame({'ID_Tarefa': removidos, 'Removido': True, 'Hash_Card': np.zeros(len(removidos), dtype='uint64')})
+        delta = pd.concat([linhas, marcadores], ignore_index=True)
+        delta['Valido_Desde'] = momento
+        # Categorias são gravadas como texto: cada arquivo teria um dicionário diferente
+        delta = delta.astype({coluna: 'string' for coluna, tipo in MASTER_SCHEMA.items() if tipo == 'category'})
+        delta = delta.astype({'Hash_Card': 'uint64', 'Removido': 'bool'})
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, f"delta-{momento.strftime('%Y%m%dT%H%M%S%f')}.parquet")
+        pq.write_table(pa.Table.from_pandas(delta[MASTER_COLUMNS + COLUNAS_CONTROLE], preserve_index=False), caminho)
+        logger.info(f"Histórico: {len(alterados)} cards alterados e {len(removidos)} removidos gravados em '{caminho}'.")
+        return caminho
+
+    def versoes(self, ate: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Todas as versões de cards registradas, com o intervalo de validade de cada uma.
+
+        Args:
+            ate (Optional[pd.Timestamp]): Se informado, lê apenas as versões iniciadas até este momento.
+
+        Returns:
+            pd.DataFrame: Linhas do DataFrame mestre com `Valido_Desde`, `Valido_Ate` (NaT se vigente) e `Removido`.
+        """
+        filtro = None if ate is None else [('Valido_Desde', '<=', pd.Timestamp(ate).tz_convert('UTC'))]
+        tabelas = [pq.read_table(arquivo, filters=filtro) for arquivo in self.arquivos()]
+        tabelas = [tabela.to_pandas() for tabela in tabelas if tabela.num_rows]
+        if not tabelas:
+            return pd.DataFrame(columns=MASTER_COLUMNS + COLUNAS_CONTROLE + ['Valido_Ate'])
+        versoes = pd.concat(tabelas, ignore_index=True)
+
+        # Uma versão termina quando o mesmo card ganha uma versão mais nova
+        inicio_por_card = versoes[['ID_Tarefa', 'Valido_Desde']].drop_duplicates()
+        inicio_por_card = inicio_por_card.sort_values(['ID_Tarefa', 'Valido_Desde'])
+        inicio_por_card['Valido_Ate'] = inicio_por_card.groupby('ID_Tarefa')['Valido_Desde'].shift(-1)
+        return versoes.merge(inicio_por_card, on=['ID_Tarefa', 'Valido_Desde'], how='left')
+
+    @staticmethod
+    def _restaurar_schema(df: pd.DataFrame) -> pd.DataFrame:
+        categorias = [coluna for coluna, tipo in MASTER_SCHEMA.items() if tipo == 'category']
+        # Deltas gravados antes de uma coluna existir voltam com ela vazia
+        df = df.reindex(columns=MASTER_COLUMNS)
+        for coluna in DATE_COLUMNS:
+            df[coluna] = pd.to_datetime(df[coluna], utc=True).dt.tz_convert('America/Sao_Paulo')
+        df = df.astype({coluna: object for coluna in categorias}).astype(MASTER_SCHEMA)
+        return df.reset_index(drop=True)
+
+    @classmethod
+    def _vigentes_em(cls, versoes: pd.DataFrame, momento: pd.Timestamp) -> pd.DataFrame:
+        vigentes = versoes[
+            (versoes['Valido_Desde'] <= momento)
+            & (versoes['Valido_Ate'].isna() | (versoes['Valido_Ate'] > momento))
+            & ~versoes['Removido']
+        ]
+        return cls._restaurar_schema(vigentes)
+
+    def as_of(self, momento: pd.Timestamp) -> pd.DataFrame:
+        """Reconstrói o DataFrame mestre como ele era no momento informado."""
+        momento = pd.Timestamp(momento).tz_convert('UTC')
+        versoes = self.versoes(ate=momento)
+        if versoes.empty:
+            return pd.DataFrame(columns=MASTER_COLUMNS)
+        return self._vigentes_em(versoes, momento)
+
+    def serie_temporal(self, momentos: Iterable[pd.Timestamp], funcao: Callable[[pd.DataFrame, pd.Timestamp], object]) -> pd.Series:
+        """
+        Aplica `funcao(df_as_of, momento)` a cada momento, lendo o histórico uma única vez.
+
+        Returns:
+            pd.Series: Resultados indexados pelos momentos.
+        """
+        momentos = [pd.Timestamp(m) for m in momentos]
+        versoes = self.versoes(ate=max(momentos)) if momentos else pd.DataFrame()
+        resultados = {}
+        for momento in momentos:
+            if versoes.empty or versoes['Valido_Desde'].min() > momento.tz_convert('UTC'):
+                continue
+            resultados[momento] = funcao(self._vigentes_em(versoes, momento.tz_convert('UTC')), momento)
+        return pd.Series(resultados, dtype=object)
+
+
+def _atrasadas_na_data(df: pd.DataFrame, momento: pd.Timestamp, incluir_rotinas: bool,
+                       quadros: Optional[Tuple[str, ...]], etiquetas: Optional[Tuple[str, ...]] = None,
+                       modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                       periodo: Optional[Tuple] = None) -> Tuple[int, int]:
+    df = aplicar_filtros(calcular_metricas_derivadas(df, momento.normalize()), incluir_rotinas, quadros,
+                         etiquetas=etiquetas, modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo)
+    if df.empty:
+        return 0, 0
+    # Conta cards distintos entre as linhas selecionadas (o filtro de membros pode deixar só parte de um card)
+    abertas = (df['Status'] != "CONCLUÍDO").to_numpy()
+    ids = df['ID_Tarefa']
+    return int(ids[abertas & df['Atrasada'].to_numpy(dtype=bool)].nunique()), int(ids[abertas].nunique())
+
+
+@lru_cache(maxsize=8)
+def _serie_semanal(diretorio: str, arquivos: Tuple[str, ...], hoje: pd.Timestamp, semanas: int,
+                   incluir_rotinas: bool, quadros: Optional[Tuple[str, ...]],
+                   etiquetas: Optional[Tuple[str, ...]] = None, modo_etiquetas: str = "any",
+                   membros: Optional[Tuple[str, ...]] = None, periodo: Optional[Tuple] = None) -> pd.DataFrame:
+    # Fim de cada semana (domingo), da mais antiga para a atual, que é medida hoje
+    fim_semana_atual = hoje + pd.Timedelta(days=6 - hoje.dayofweek)
+    momentos = [fim_semana_atual - pd.Timedelta(weeks=n) for n in range(semanas - 1, 0, -1)] + [hoje]
+    serie = HistoricoSnapshots(diretorio).serie_temporal(
+        momentos, lambda df, momento: _atrasadas_na_data(df, momento, incluir_rotinas, quadros, etiquetas,
+                                                         modo_etiquetas, membros, periodo)
+    )
+    return pd.DataFrame(
+        serie.tolist(), index=pd.DatetimeIndex(serie.index).normalize(), columns=['Atrasadas', 'Abertas']
+    ).rename_axis('Semana')
+
+
+def serie_semanal_atrasadas(diretorio: str = HISTORICO_DIR, semanas: int = 52, incluir_rotinas: bool = True,
+                            quadros: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                            modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                            periodo: Optional[Tuple] = None) -> pd.DataFrame:
+    """
+    Tarefas abertas e atrasadas ao fim de cada semana, reconstruídas a partir do histórico.
+
+    Os filtros são os de `aplicar_filtros`; o `periodo` filtra pela data de entrega de cada versão.
+    O resultado é memoizado no dia enquanto nenhum arquivo delta novo for gravado.
+
+    Returns:
+        pd.DataFrame: Colunas `Atrasadas` e `Abertas`, indexadas pela semana (vazio sem histórico).
+    """
+    arquivos = tuple(HistoricoSnapshots(diretorio).arquivos())
+    if not arquivos:
+        return pd.DataFrame(columns=['Atrasadas', 'Abertas'])
+    hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    etiquetas = tuple(sorted(etiquetas)) if etiquetas else None
+    membros = tuple(sorted(membros)) if membros else None
+    periodo = tuple(pd.Timestamp(data).date() for data in periodo) if periodo else None
+    return _serie_semanal(diretorio, arquivos, hoje, semanas, incluir_rotinas, quadros, etiquetas, modo_etiquetas,
+                          membros, periodo)
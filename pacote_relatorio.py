@@ -0,0 +1,379 @@
+"""
+Relatório de Performance pré-calculado na sincronização.
+
+Os números, tabelas e gráficos da página de Performance só mudam quando o export muda (e quando o
+dia vira, pelas colunas derivadas). A sincronização (`trello_update.py`) roda aqui, sem o Streamlit,
+os mesmos cálculos das abas "Resumo Histórico" e "Tarefas do Dia" com os filtros no padrão e grava o
+resultado em `relatorio/`: um manifesto JSON com as métricas e as especificações Plotly serializadas
+dos gráficos, e as tabelas em Parquet. O manifesto é trocado por último e de uma vez; as tabelas
+levam a versão no nome, então quem lê nunca mistura dois pacotes.
+
+A página serve o pacote enquanto nenhum filtro sai do padrão e o pacote corresponde ao export atual
+e ao dia de hoje; qualquer outra combinação é calculada na hora, pelas mesmas funções.
+"""
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from alocacao import HORIZONTE_PADRAO_DIAS, capacidades, carregar_capacidades, resumo_alocacao
+from diagnostico import cronometrado, medir
+from utilidades import (
+    SNAPSHOT_SCHEMA_VERSION, consultar_tarefas, obter_carga_trabalho, obter_cubo, obter_indice_etiquetas,
+    obter_tarefas_por_membro, versao_export,
+)
+
+logger = logging.getLogger(__name__)
+
+RELATORIO_DIR = "relatorio"
+ARQUIVO_MANIFESTO = "manifesto.json"
+# Muda quando a estrutura do pacote muda: pacotes de outra versão são ignorados pela página
+RELATORIO_VERSAO = "2"
+
+# Colunas exibidas no detalhamento de "Tarefas do Dia" (e gravadas no pacote)
+COLUNAS_TAREFAS = {
+    'Tarefa': 'Tarefa',
+    'Status': 'Status',
+    'Data_Entrega': 'Data Limite',
+    'Tempo_Estimado_Horas': 'Horas Estimadas',
+    'Etiquetas': 'Etiqueta',
+}
+
+
+def _hoje() -> pd.Timestamp:
+    return pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+
+
+def _barras_por_membro(valores: pd.Series, rotulo: str, escala):
+    import plotly.express as px
+
+    fig = px.bar(
+        valores,
+        x=valores.values,
+        y=valores.index,
+        orientation='h',
+        labels={'x': rotulo, 'y': 'Membro'},
+        text=valores.values,
+        color=valores.values,
+        color_continuous_scale=escala
+    )
+    fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def calcular_resumo(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                    quadros: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                    modo_etiquetas: str = "any", hoje: Optional[pd.Timestamp] = None,
+                    membros: Optional[Tuple[str, ...]] = None, periodo: Optional[Tuple] = None) -> Dict[str, Any]:
+    """
+    Métricas, gráficos e tabela de status do "Resumo Histórico", a partir do cubo de agregados
+    (`dados` None consulta o snapshot colunar, sem carregar o DataFrame; ver `consultar_tarefas`).
+
+    Returns:
+        Dict[str, Any]: `metricas` (contagens de cards distintos), `figuras` (volume, atrasadas, horas e
+        evolucao; None quando não há o que mostrar) e `tabelas` (status: membro × status).
+    """
+    import plotly.express as px
+    from historico import serie_semanal_atrasadas
+
+    cubo = obter_cubo(dados, incluir_rotinas=incluir_rotinas, quadros=quadros, hoje=hoje,
+                      etiquetas=etiquetas, modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo)
+    por_membro = cubo.groupby('Membro')[['Qtd_Tarefas', 'Qtd_Atrasadas_Abertas', 'Horas_Rateadas']].sum()
+
+    # Cada card conta uma vez, mesmo com vários membros
+    metricas = {
+        'total': int(round(float(cubo['Qtd_Cards'].sum()))),
+        'concluidas': int(round(float(cubo.loc[cubo['Status'] == "CONCLUÍDO", 'Qtd_Cards'].sum()))),
+        'vencendo': int(round(float(cubo['Qtd_Cards_Vencendo_Semana'].sum()))),
+        'atrasadas': int(round(float(cubo['Qtd_Cards_Atrasados'].sum()))),
+    }
+
+    figuras = {'volume': None, 'atrasadas': None, 'horas': None, 'evolucao': None}
+    tarefas_por_membro = por_membro['Qtd_Tarefas']
+    tarefas_por_membro = tarefas_por_membro[tarefas_por_membro > 0].sort_values(ascending=False)
+    if not tarefas_por_membro.empty:
+        with medir("grafico_volume_membro"):
+            figuras['volume'] = _barras_por_membro(tarefas_por_membro, 'Quantidade de Tarefas',
+                                                   px.colors.sequential.Viridis)
+
+    atrasos_por_membro = por_membro['Qtd_Atrasadas_Abertas']
+    atrasos_por_membro = atrasos_por_membro[atrasos_por_membro > 0].sort_values(ascending=False)
+    if not atrasos_por_membro.empty:
+        with medir("grafico_atrasadas_membro"):
+            figuras['atrasadas'] = _barras_por_membro(atrasos_por_membro, 'Quantidade de Tarefas Atrasadas',
+                                                      px.colors.sequential.Reds)
+
+    carga_horaria = por_membro['Horas_Rateadas'].sort_values(ascending=False)
+    if not carga_horaria.empty and carga_horaria.sum() > 0:
+        with medir("grafico_carga_horaria"):
+            fig3 = _barras_por_membro(carga_horaria, 'Total de Horas Estimadas', px.colors.sequential.Viridis)
+            fig3.update_traces(texttemplate='%{text:.2f}h', textposition='outside')
+        figuras['horas'] = fig3
+
+    tarefas_por_status = pd.pivot_table(
+        cubo,
+        values='Qtd_Tarefas',
+        index='Membro',
+        columns='Status',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True
+    )
+
+    # Reconstruída a partir do histórico de snapshots gravado pela sincronização
+    serie_atrasos = serie_semanal_atrasadas(incluir_rotinas=incluir_rotinas, quadros=quadros,
+                                            etiquetas=etiquetas, modo_etiquetas=modo_etiquetas,
+                                            membros=membros, periodo=periodo)
+    if len(serie_atrasos) > 1:
+        with medir("grafico_evolucao_semanal"):
+            figuras['evolucao'] = px.line(
+                serie_atrasos.reset_index(),
+                x='Semana',
+                y=['Abertas', 'Atrasadas'],
+                markers=True,
+                labels={'value': 'Quantidade de Tarefas', 'variable': ''}
+            )
+
+    return {'metricas': metricas, 'figuras': figuras, 'tabelas': {'status': tarefas_por_status}}
+
+
+def calcular_tarefas_dia(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                         quadros: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                         modo_etiquetas: str = "any", hoje: Optional[pd.Timestamp] = None,
+                         membros: Optional[Tuple[str, ...]] = None, periodo: Optional[Tuple] = None) -> Dict[str, Any]:
+    """
+    Tarefas abertas (A FAZER e FAZENDO) de "Tarefas do Dia", já particionadas por membro, só com as
+    colunas exibidas.
+
+    Returns:
+        Dict[str, Any]: `total_tarefas`, `total_horas` (rateadas: cada card conta as suas horas uma vez),
+        `tarefas` (a visão filtrada) e `membros` (`{membro: posições em tarefas}`).
+    """
+    df_hoje, linhas_por_membro = obter_tarefas_por_membro(
+        dados, incluir_rotinas=incluir_rotinas, quadros=quadros, status=('A FAZER', 'FAZENDO'), hoje=hoje,
+        etiquetas=etiquetas, modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo,
+        colunas=['ID_Tarefa', 'Membro', 'Horas_Rateadas'] + list(COLUNAS_TAREFAS)
+    )
+    return {
+        'total_tarefas': int(df_hoje['ID_Tarefa'].nunique()),
+        'total_horas': float(df_hoje['Horas_Rateadas'].sum()),
+        'tarefas': df_hoje,
+        'membros': linhas_por_membro,
+    }
+
+
+def tabela_membro(tarefas: pd.DataFrame, posicoes: np.ndarray) -> pd.DataFrame:
+    """Tabela de visualização das tarefas de um membro, recortada pelas posições da partição."""
+    tabela = tarefas.iloc[posicoes][list(COLUNAS_TAREFAS)].rename(columns=COLUNAS_TAREFAS)
+    # Formata a coluna de data para melhor visualização
+    tabela['Data Limite'] = tabela['Data Limite'].dt.strftime('%d/%m/%Y')
+    return tabela.set_index('Tarefa')
+
+
+def calcular_carga(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                   quadros: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                   modo_etiquetas: str = "any", dias: int = HORIZONTE_PADRAO_DIAS,
+                   capacidade_padrao: Optional[float] = None, por_membro: Optional[Dict[str, float]] = None,
+                   hoje: Optional[pd.Timestamp] = None, membros: Optional[Tuple[str, ...]] = None,
+                   periodo: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
+    """
+    Carga de trabalho projetada contra a capacidade diária (ver `alocacao`).
+
+    Returns:
+        Optional[Dict[str, Any]]: `membros`, `excedidos`, `horas_excedentes`, `figura` (ocupação diária) e
+        `tabelas` (excesso: membros acima da capacidade, já formatada); None sem horas no horizonte.
+    """
+    import plotly.express as px
+
+    if capacidade_padrao is None:
+        capacidade_padrao, por_membro = carregar_capacidades()
+    carga = obter_carga_trabalho(dados, incluir_rotinas, quadros, dias=dias, hoje=hoje, etiquetas=etiquetas,
+                                 modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo)
+    if carga.empty:
+        return None
+    capacidade = capacidades(carga.index, capacidade_padrao, por_membro)
+    resumo = resumo_alocacao(carga, capacidade)
+    excedidos = resumo[resumo['Dias_Excedidos'] > 0]
+
+    # Ocupação de cada dia (horas / capacidade); acima de 100% o membro está sobrecarregado
+    ocupacao = carga.div(capacidade, axis=0).loc[resumo.index]
+    with medir("grafico_carga_trabalho"):
+        fig = px.imshow(
+            ocupacao * 100,
+            x=[dia.strftime('%d/%m') for dia in ocupacao.columns],
+            color_continuous_scale=[(0, "#f7fbff"), (0.5, "#6baed6"), (0.5, "#fdae61"), (1, "#b2182b")],
+            range_color=(0, 200), aspect="auto",
+            labels={"x": "Dia útil", "y": "Membro", "color": "Ocupação (%)"},
+            title="Ocupação diária por membro (%)",
+        )
+        fig.update_layout(height=min(200 + 22 * len(ocupacao), 1600))
+
+    tabela = excedidos.rename(columns={
+        'Horas': 'Horas no Horizonte', 'Capacidade': 'Capacidade no Horizonte', 'Pico_Dia': 'Pico Diário (h)',
+        'Dias_Excedidos': 'Dias Excedidos', 'Horas_Excedentes': 'Horas Excedentes', 'Ocupacao': 'Ocupação',
+    })
+    tabela['Ocupação'] = (tabela['Ocupação'] * 100).round(0).astype('Int64').astype(str) + '%'
+    return {
+        'membros': len(resumo),
+        'excedidos': len(excedidos),
+        'horas_excedentes': float(resumo['Horas_Excedentes'].sum()),
+        'figura': fig,
+        'tabelas': {'excesso': tabela.round(1)},
+    }
+
+
+@cronometrado("relatorio_padrao")
+def gerar_relatorio(dados: Dict[str, Any], hoje: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Calcula as duas abas com os filtros no padrão (rotinas incluídas, todos os quadros e membros, sem
+    etiquetas nem período, horizonte e capacidades de `alocacao`), além das opções dos filtros da barra lateral.
+    """
+    hoje = _hoje() if hoje is None else hoje
+    padrao, por_membro = carregar_capacidades()
+    df = consultar_tarefas(dados, ['Board', 'Membro'], hoje=hoje)
+    return {
+        'opcoes': {
+            'quadros': sorted(df['Board'].dropna().unique().tolist()),
+            'membros': sorted(df['Membro'].dropna().unique().tolist()),
+            'etiquetas': list(obter_indice_etiquetas(dados).nomes),
+        },
+        'resumo': calcular_resumo(dados, hoje=hoje),
+        'tarefas': calcular_tarefas_dia(dados, hoje=hoje),
+        'carga': {
+            'parametros': {'dias': HORIZONTE_PADRAO_DIAS, 'capacidade_padrao': float(padrao), 'por_membro': por_membro},
+            'resultado': calcular_carga(dados, hoje=hoje, capacidade_padrao=padrao, por_membro=por_membro),
+        },
+    }
+
+
+def _serializar(valor: Any, diretorio: str, nome: str, sufixo: str) -> Any:
+    """Figuras viram especificações Plotly em JSON e tabelas viram arquivos Parquet ao lado do manifesto."""
+    if isinstance(valor, dict):
+        return {chave: _serializar(item, diretorio, chave, sufixo) for chave, item in valor.items()}
+    if isinstance(valor, pd.DataFrame):
+        arquivo = f"{nome}-{sufixo}.parquet"
+        # Rótulos de coluna categóricos (o pivot por status) não voltam do Parquet: gravados como texto
+        colunas = pd.Index([str(coluna) for coluna in valor.columns], name=valor.columns.name)
+        valor.set_axis(colunas, axis=1).to_parquet(os.path.join(diretorio, arquivo))
+        return {'tabela': arquivo}
+    if hasattr(valor, 'to_json') and hasattr(valor, 'to_plotly_json'):
+        return {'figura': valor.to_json()}
+    return valor
+
+
+def _restaurar(valor: Any, diretorio: str) -> Any:
+    import plotly.io as pio
+
+    if isinstance(valor, dict):
+        if set(valor) == {'tabela'}:
+            return pd.read_parquet(os.path.join(diretorio, valor['tabela']))
+        if set(valor) == {'figura'}:
+            return pio.from_json(valor['figura'])
+        return {chave: _restaurar(item, diretorio) for chave, item in valor.items()}
+    return valor
+
+
+def salvar_relatorio(relatorio: Dict[str, Any], versao: str, hoje: Optional[pd.Timestamp] = None,
+                     diretorio: str = RELATORIO_DIR) -> str:
+    """
+    Grava o pacote de `gerar_relatorio` para a versão `versao` (SHA-256 do export) e o dia `hoje`.
+
+    Returns:
+        str: O caminho do manifesto.
+    """
+    hoje = _hoje() if hoje is None else hoje
+    os.makedirs(diretorio, exist_ok=True)
+    sufixo = f"{versao[:12]}-{hoje:%Y%m%d}"
+
+    # As tarefas vão contíguas por membro: no pacote, cada membro é só um intervalo de linhas
+    tarefas = relatorio['tarefas']
+    ordem = [posicoes for posicoes in tarefas['membros'].values()]
+    ordem = np.concatenate(ordem) if ordem else np.array([], dtype=np.int64)
+    tarefas = {
+        **tarefas,
+        'tarefas': tarefas['tarefas'].iloc[ordem][['Membro'] + list(COLUNAS_TAREFAS)].reset_index(drop=True),
+        'membros': {str(membro): len(posicoes) for membro, posicoes in tarefas['membros'].items()},
+    }
+
+    manifesto = {
+        'versao_relatorio': RELATORIO_VERSAO,
+        'versao_schema': SNAPSHOT_SCHEMA_VERSION,
+        'versao_origem': versao,
+        'hoje': hoje.date().isoformat(),
+        'gerado_em': pd.Timestamp.now(tz='UTC').isoformat(),
+        **_serializar({**relatorio, 'tarefas': tarefas}, diretorio, "relatorio", sufixo),
+    }
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+    # Tabelas de pacotes anteriores: o manifesto novo já não aponta para elas
+    for nome in os.listdir(diretorio):
+        if nome.endswith(".parquet") and not nome.endswith(f"-{sufixo}.parquet"):
+            try:
+                os.remove(os.path.join(diretorio, nome))
+            except OSError as exc:
+                logger.warning(f"Não foi possível remover a tabela antiga '{nome}': {exc}")
+    logger.info(f"Relatório pré-calculado salvo em '{caminho}' (snapshot {versao[:12]}, dia {hoje.date()}).")
+    return caminho
+
+
+def relatorio_atualizado(versao: str, hoje: Optional[pd.Timestamp] = None, diretorio: str = RELATORIO_DIR) -> bool:
+    """
+    True se o pacote em `diretorio` foi gravado para a versão `versao` do export e para o dia `hoje`,
+    nas versões atuais do pacote e do schema (só o manifesto é lido).
+    """
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        return False
+    hoje = _hoje() if hoje is None else hoje
+    return (manifesto.get('versao_relatorio'), manifesto.get('versao_schema'), manifesto.get('versao_origem'),
+            manifesto.get('hoje')) == (RELATORIO_VERSAO, SNAPSHOT_SCHEMA_VERSION, versao, hoje.date().isoformat())
+
+
+@lru_cache(maxsize=2)
+def _ler_relatorio(caminho: str, mtime_ns: int, tamanho: int) -> Dict[str, Any]:
+    with open(caminho, "r", encoding="utf-8") as f:
+        manifesto = json.load(f)
+    if (manifesto.get('versao_relatorio'), manifesto.get('versao_schema')) != (RELATORIO_VERSAO, SNAPSHOT_SCHEMA_VERSION):
+        raise ValueError("pacote gravado com outra versão")
+    relatorio = _restaurar(manifesto, os.path.dirname(caminho))
+    # Volta à forma calculada na hora: posições de cada membro nas tarefas
+    tarefas = relatorio['tarefas']
+    fins = np.cumsum(list(tarefas['membros'].values()), dtype=np.int64)
+    tarefas['membros'] = {membro: np.arange(fim - n, fim) for (membro, n), fim in zip(tarefas['membros'].items(), fins)}
+    return relatorio
+
+
+def carregar_relatorio(diretorio: str = RELATORIO_DIR, hoje: Optional[pd.Timestamp] = None) -> Optional[Dict[str, Any]]:
+    """
+    O pacote pré-calculado, se ele corresponder ao export atual e ao dia de hoje.
+
+    A leitura é memoizada pela data de modificação do manifesto; o export não é carregado (só o seu hash,
+    também memoizado).
+
+    Returns:
+        Optional[Dict[str, Any]]: Como `gerar_relatorio`, ou None se não houver pacote válido.
+    """
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    try:
+        stat = os.stat(caminho)
+        with medir("leitura_relatorio"):
+            relatorio = _ler_relatorio(caminho, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning(f"Não foi possível ler o relatório pré-calculado '{caminho}': {exc}")
+        return None
+    hoje = _hoje() if hoje is None else hoje
+    if relatorio['versao_origem'] != versao_export() or relatorio['hoje'] != hoje.date().isoformat():
+        return None
+    return relatorio
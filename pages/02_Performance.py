@@ -1,75 +1,66 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-from datetime import datetime, timedelta
-from io import StringIO
-
-# A função `leitura_dados` é importada do seu arquivo utilidades.py.
-# Certifique-se de que o arquivo 'utilidades.py' está no mesmo diretório.
-from utilidades import leitura_dados
-# set page to be wider
-st.set_page_config(layout="wide", page_title="Relatório de Produtividade")
-leitura_dados()
-
+import time
+_inicio_render = time.perf_counter()
 
+import streamlit as st
 
+from aquecimento import iniciar_aquecimento, registrar_render
 
-def resumo_historico():
-    """
-    Função principal que constrói a aplicação Streamlit.
-    """
-        
-    df=st.session_state['dados']['df_trello']
-
-
-    hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
-    
-    inicio_semana = hoje - pd.to_timedelta(hoje.dayofweek, unit='d')
-    
-    fim_semana = inicio_semana + pd.to_timedelta(6, unit='d')
+# set page to be wider
+st.set_page_config(layout="wide", page_title="Relatório de Produtividade")
+# Acessando esta página direto, a carga aproveita o aquecimento (se já em curso) em vez de repeti-lo
+iniciar_aquecimento()
 
-    # Tratando as colunas  Data_entrega e Data_Conclusao como date  'yyyy-mm-dd'
-    df['Data_Entrega'] = pd.to_datetime(df['Data_Entrega'], format='%Y-%m-%d', errors='coerce')
-    df['Data_Conclusao'] = pd.to_datetime(df['Data_Conclusao'], format='%Y-%m-%d', errors='coerce')
-    
+# Os módulos abaixo importam pandas, numpy e pyarrow: a página já está desenhada (configuração e
+# aviso de carga) enquanto eles são importados, o que é imediato se o aquecimento já os importou
+with st.spinner("Carregando..."):
+    # A função `leitura_dados` é importada do seu arquivo utilidades.py.
+    # Certifique-se de que o arquivo 'utilidades.py' está no mesmo diretório.
+    from utilidades import consultar_tarefas, leitura_dados, obter_indice_etiquetas, obter_tarefas
+    from pacote_relatorio import (
+        calcular_carga, calcular_resumo, calcular_tarefas_dia, carregar_relatorio, tabela_membro,
+    )
+    from diagnostico import iniciar_execucao, medir, painel_sidebar
 
-    # Coluna "Vencendo_Esta_Semana"
-    df['Vencendo_Esta_Semana'] = (df['Data_Entrega'].dt.normalize() >= inicio_semana) & (df['Data_Entrega'].dt.normalize() <= fim_semana)
+# Membros exibidos por página em "Tarefas do Dia"
+MEMBROS_POR_PAGINA = 10
+# Horizontes (em dias úteis) oferecidos na projeção de carga de trabalho
+HORIZONTES_CARGA = [5, 10, 20, 60, 130, 260]
 
-    # Coluna "Atrasada"
-    condicao_a = (df['Data_Conclusao'].isna()) & (df['Data_Entrega'].notna()) & (df['Data_Entrega']< hoje)
-    condicao_b = (df['Status'] != "CONCLUÍDO") & (df['Data_Entrega'] > df['Data_Conclusao'])
-    df['Atrasada'] = np.where(condicao_b | condicao_a, True, False)
-    # convert   df['Atrasada'].value_counts()  to dataframe 
-    
-    
 
-    
 
-    # Coluna "Tempo_Estimado_Horas"
-    df['Tempo_Estimado_Min'] = pd.to_numeric(df['Tempo_Estimado_Min'], errors='coerce')
-    df['Tempo_Estimado_Horas'] = df['Tempo_Estimado_Min'] / 60
 
+def resumo_historico(dados, quadros=None, etiquetas=None, modo_etiquetas="any", membros=None, periodo=None,
+                     relatorio=None):
+    """
+    Função principal que constrói a aplicação Streamlit.
 
+    `relatorio` é o pacote pré-calculado, passado quando os filtros comuns estão no padrão; com `dados`
+    None, o que for calculado na hora é consultado direto no snapshot colunar.
+    """
     st.title("Relatório de Produtividade da Equipe")
     st.markdown("Use esta ferramenta para analisar a produtividade da equipe com base nos dados de tarefas.")
 
     # Filtro de rotina
     incluir_rotinas = st.sidebar.checkbox('Incluir tarefas de rotina na análise', value=True, key='resumo_rotinas')
     if not incluir_rotinas:
-        df = df[df['Is_Rotina'] == False].copy()
         st.sidebar.info("Excluindo tarefas de rotina da análise.")
+    # Métricas e gráficos são respondidos pelo cubo de agregados (membro × status × rotina × semana)
+    if relatorio is not None and incluir_rotinas:
+        resumo = relatorio['resumo']
+    else:
+        resumo = calcular_resumo(dados, incluir_rotinas=incluir_rotinas, quadros=quadros, etiquetas=etiquetas,
+                                 modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo)
+    metricas, figuras = resumo['metricas'], resumo['figuras']
 
     # --- ANÁLISE DESCRITIVA E VISUALIZAÇÃO ---
     st.header("Resumo Geral da Produtividade")
 
-    # Métricas principais
+    # Métricas principais (cada card conta uma vez, mesmo com vários membros)
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total de Tarefas", len(df))
-    col2.metric("Tarefas Concluídas", df['Status'].value_counts().get("CONCLUÍDO", 0))
-    col3.metric("Vencendo esta Semana", int(df['Vencendo_Esta_Semana'].sum()))
-    col4.metric("Total de Tarefas Atrasadas", int(df['Atrasada'].sum()))
+    col1.metric("Total de Tarefas", metricas['total'])
+    col2.metric("Tarefas Concluídas", metricas['concluidas'])
+    col3.metric("Vencendo esta Semana", metricas['vencendo'])
+    col4.metric("Total de Tarefas Atrasadas", metricas['atrasadas'])
 
     st.markdown("---")
 
@@ -77,36 +68,15 @@ def resumo_historico():
 
     with col_grafico1:
         st.subheader("Volume Total de Tarefas por Membro")
-        tarefas_por_membro = df['Membro'].value_counts()
-        fig1 = px.bar(
-            tarefas_por_membro,
-            x=tarefas_por_membro.values,
-            y=tarefas_por_membro.index,
-            orientation='h',
-            labels={'x': 'Quantidade de Tarefas', 'y': 'Membro'},
-            text=tarefas_por_membro.values,
-            color=tarefas_por_membro.values,
-            color_continuous_scale=px.colors.sequential.Viridis
-        )
-        fig1.update_layout(showlegend=False, yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig1, use_container_width=True)
+        if figuras['volume'] is not None:
+            st.plotly_chart(figuras['volume'], use_container_width=True)
+        else:
+            st.info("Nenhuma tarefa encontrada com os filtros selecionados.")
 
     with col_grafico2:
         st.subheader("Tarefas Atrasadas por Membro")
-        atrasos_por_membro = df[(df['Status'] != "CONCLUÍDO") & (df['Atrasada'] == True)]['Membro'].value_counts()
-        if not atrasos_por_membro.empty:
-            fig2 = px.bar(
-                atrasos_por_membro,
-                x=atrasos_por_membro.values,
-                y=atrasos_por_membro.index,
-                orientation='h',
-                labels={'x': 'Quantidade de Tarefas Atrasadas', 'y': 'Membro'},
-                text=atrasos_por_membro.values,
-                color=atrasos_por_membro.values,
-                color_continuous_scale=px.colors.sequential.Reds
-            )
-            fig2.update_layout(showlegend=False, yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig2, use_container_width=True)
+        if figuras['atrasadas'] is not None:
+            st.plotly_chart(figuras['atrasadas'], use_container_width=True)
         else:
             st.success("🎉 Parabéns! Nenhuma tarefa atrasada no período analisado.")
 
@@ -117,43 +87,37 @@ def resumo_historico():
 
     with col_detalhe1:
         st.subheader("Carga Horária Estimada por Membro (horas)")
-        carga_horaria = df.groupby('Membro')['Tempo_Estimado_Horas'].sum().sort_values(ascending=False)
-        if not carga_horaria.empty and carga_horaria.sum() > 0:
-            fig3 = px.bar(
-                carga_horaria,
-                x=carga_horaria.values,
-                y=carga_horaria.index,
-                orientation='h',
-                labels={'x': 'Total de Horas Estimadas', 'y': 'Membro'},
-                text=carga_horaria.values,
-                color=carga_horaria.values,
-                color_continuous_scale=px.colors.sequential.Viridis
-            )
-            fig3.update_layout(showlegend=False, yaxis={'categoryorder':'total ascending'})
-            fig3.update_traces(texttemplate='%{text:.2f}h', textposition='outside')
-            st.plotly_chart(fig3, use_container_width=True)
+        st.caption("As horas de um card com vários membros são divididas igualmente entre eles.")
+        if figuras['horas'] is not None:
+            st.plotly_chart(figuras['horas'], use_container_width=True)
         else:
             st.info("Não há dados de tempo estimado para exibir.")
 
     with col_detalhe2:
         st.subheader("Distribuição de Tarefas por Status")
-        tarefas_por_status = pd.pivot_table(
-            df,
-            values='ID_Tarefa',
-            index='Membro',
-            columns='Status',
-            aggfunc='count',
-            fill_value=0
-        )
-        st.dataframe(tarefas_por_status, use_container_width=True)
+        st.dataframe(resumo['tabelas']['status'], use_container_width=True)
+
+    st.markdown("---")
+
+    st.header("Evolução Histórica")
+    # Reconstruída a partir do histórico de snapshots gravado pela sincronização
+    if figuras['evolucao'] is not None:
+        st.subheader("Tarefas Abertas e Atrasadas por Semana")
+        st.plotly_chart(figuras['evolucao'], use_container_width=True)
+    else:
+        st.info("O histórico ainda não tem snapshots suficientes para mostrar a evolução semanal.")
 
     if st.checkbox("Mostrar dados brutos processados", key='resumo_brutos'):
         st.subheader("Dados Processados")
-        st.dataframe(df)
+        st.dataframe(obter_tarefas(dados, incluir_rotinas=incluir_rotinas, quadros=quadros, etiquetas=etiquetas,
+                                   modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo))
 
-def tarefas_do_dia(df):
+def tarefas_do_dia(dados, quadros=None, etiquetas=None, modo_etiquetas="any", membros=None, periodo=None,
+                   relatorio=None):
     """
     Função que constrói a nova aba de 'Tarefas do Dia e Alocação da Equipe'.
+
+    `relatorio` e `dados` como em `resumo_historico`.
     """
    
     
@@ -162,17 +126,21 @@ def tarefas_do_dia(df):
     st.markdown("Uma visão detalhada das tarefas planejadas para hoje e a alocação de tempo de cada membro da equipe.")
 
     # --- Filtros e Preparação de Dados ---
-    hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
 
     # O filtro de rotina na sidebar agora é unificado, mas pode ser separado
     # por aba se preferir. Usamos uma 'key' para evitar conflitos.
     incluir_rotinas = st.sidebar.checkbox('Incluir tarefas de rotina na análise', value=True, key='dia_rotinas')
     if not incluir_rotinas:
-        df = df[df['Is_Rotina'] == False].copy()
         st.sidebar.info("Excluindo tarefas de rotina da análise.")
+        relatorio = None
 
-    # Filtra o DataFrame para incluir apenas tarefas 'A FAZER' e 'FAZENDO'
-    df_hoje = df[df['Status'].isin(['A FAZER', 'FAZENDO'])].copy()
+    # Apenas tarefas 'A FAZER' e 'FAZENDO', já particionadas por membro
+    if relatorio is not None:
+        tarefas = relatorio['tarefas']
+    else:
+        tarefas = calcular_tarefas_dia(dados, incluir_rotinas=incluir_rotinas, quadros=quadros, etiquetas=etiquetas,
+                                       modo_etiquetas=modo_etiquetas, membros=membros, periodo=periodo)
+    df_hoje, linhas_por_membro = tarefas['tarefas'], tarefas['membros']
 
     if df_hoje.empty:
         st.success("🎉 A equipe está com as tarefas do dia em dia!")
@@ -183,11 +151,13 @@ def tarefas_do_dia(df):
     st.header("Resumo da Jornada de Trabalho")
     
     col1, col2 = st.columns(2)
-    total_tarefas = len(df_hoje)
-    total_horas_estimadas = total_tarefas
+    # Horas rateadas entre os membros: cada card conta as suas horas uma única vez
+    col1.metric("Total de Tarefas Ativas", tarefas['total_tarefas'])
+    col2.metric("Total de Horas Estimadas", f"{tarefas['total_horas']:.2f}h")
+
+    st.markdown("---")
 
-    col1.metric("Total de Tarefas Ativas", total_tarefas)
-    col2.metric("Total de Horas Estimadas", f"{total_horas_estimadas:.2f}h")
+    carga_trabalho(dados, incluir_rotinas, quadros, etiquetas, modo_etiquetas, membros, periodo, relatorio)
 
     st.markdown("---")
 
@@ -196,87 +166,136 @@ def tarefas_do_dia(df):
     st.header("Detalhamento das Tarefas de Hoje")
     st.markdown("Aqui você encontra a lista completa de tarefas de cada membro, com detalhes importantes para o acompanhamento diário.")
 
-    membros_com_tarefas = df_hoje['Membro'].unique()
-
-    for membro in membros_com_tarefas:
-        with st.expander(f"✨ Tarefas de **{membro}**"):
-            # Filtra o dataframe para o membro atual
-            df_membro = df_hoje[df_hoje['Membro'] == membro].copy()
-
-            # Prepara a tabela de visualização
-            tabela_membro = df_membro[[
-                'Tarefa',
-                'Status',
-                'Data_Entrega',
-                'Tempo_Estimado_Horas',
-                'Etiquetas'
-            ]].rename(columns={
-                'Tarefa': 'Tarefa',
-                'Status': 'Status',
-                'Data_Entrega': 'Data Limite',
-                'Tempo_Estimado_Horas': 'Horas Estimadas',
-                'Etiquetas': 'Etiqueta'
-            })
-
-            # Formata a coluna de data para melhor visualização
-            tabela_membro['Data Limite'] = tabela_membro['Data Limite'].dt.strftime('%d/%m/%Y')
-            
-            # Exibe a tabela
-            st.dataframe(tabela_membro.set_index('Tarefa'), use_container_width=True)
-
-
-def main():
-    """
-    Função principal que gerencia a navegação entre as páginas.
-    """
+    # Busca e paginação: só os membros da página atual são desenhados, e a tabela de cada um
+    # só é montada quando aberta
+    col_busca, col_pagina = st.columns([3, 1])
+    busca = col_busca.text_input("Buscar membro", key='dia_busca').strip().upper()
+    encontrados = [membro for membro in linhas_por_membro if busca in str(membro).upper()]
+    if not encontrados:
+        st.info("Nenhum membro encontrado.")
+        return
+    total_paginas = -(-len(encontrados) // MEMBROS_POR_PAGINA)
+    pagina = col_pagina.number_input(
+        f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, key='dia_pagina'
+    )
+    inicio = (int(pagina) - 1) * MEMBROS_POR_PAGINA
 
+    for membro in encontrados[inicio:inicio + MEMBROS_POR_PAGINA]:
+        posicoes = linhas_por_membro[membro]
+        if not st.toggle(f"✨ Tarefas de **{membro}** ({len(posicoes)})", key=f"dia_membro_{membro}"):
+            continue
 
-    st.set_page_config(layout="wide", page_title="Relatório de Produtividade")
-    leitura_dados()
-    df = st.session_state['dados']['df_trello']
+        # Recorta as linhas do membro pelas posições da partição e exibe a tabela
+        st.dataframe(tabela_membro(df_hoje, posicoes), use_container_width=True)
 
 
-    
-    hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
-    inicio_semana = hoje - pd.to_timedelta(hoje.dayofweek, unit='d')
-    fim_semana = inicio_semana + pd.to_timedelta(6, unit='d')
+def carga_trabalho(dados, incluir_rotinas, quadros=None, etiquetas=None, modo_etiquetas="any", membros=None,
+                   periodo=None, relatorio=None):
+    """
+    Seção de carga de trabalho projetada: horas de cada membro por dia útil contra a capacidade diária.
+    """
+    from alocacao import carregar_capacidades
+
+    st.header("Carga de Trabalho Projetada")
+    st.markdown("As horas das tarefas abertas são distribuídas pelos dias úteis até a entrega; "
+                "tarefas atrasadas ou sem data contam no primeiro dia.")
+
+    padrao, por_membro = carregar_capacidades()
+    col_horizonte, col_capacidade = st.columns(2)
+    dias = col_horizonte.select_slider("Horizonte (dias úteis)", options=HORIZONTES_CARGA, value=10, key='carga_dias')
+    capacidade_padrao = col_capacidade.number_input(
+        "Capacidade diária padrão (h)", min_value=0.5, max_value=24.0, value=float(padrao), step=0.5, key='carga_capacidade'
+    )
+
+    # O pacote só serve se horizonte e capacidades forem os mesmos com que foi calculado
+    parametros = {'dias': dias, 'capacidade_padrao': float(capacidade_padrao), 'por_membro': por_membro}
+    if relatorio is not None and relatorio['carga']['parametros'] == parametros:
+        carga = relatorio['carga']['resultado']
+    else:
+        carga = calcular_carga(dados, incluir_rotinas, quadros, etiquetas, modo_etiquetas, dias=dias,
+                               capacidade_padrao=capacidade_padrao, por_membro=por_membro,
+                               membros=membros, periodo=periodo)
+    if carga is None:
+        st.info("Nenhuma tarefa aberta com horas estimadas no horizonte.")
+        return
 
-    # Tratando as colunas Data_Entrega e Data_Conclusao como data
-    df['Data_Entrega'] = pd.to_datetime(df['Data_Entrega'], errors='coerce')
-    df['Data_Conclusao'] = pd.to_datetime(df['Data_Conclusao'], errors='coerce')
+    col1, col2 = st.columns(2)
+    col1.metric("Membros com excesso de alocação", f"{carga['excedidos']} de {carga['membros']}")
+    col2.metric("Horas acima da capacidade", f"{carga['horas_excedentes']:.1f}h")
 
-    # Coluna "Vencendo_Esta_Semana"
-    df['Vencendo_Esta_Semana'] = (df['Data_Entrega'].dt.normalize() >= inicio_semana) & (df['Data_Entrega'].dt.normalize() <= fim_semana)
+    # Ocupação de cada dia (horas / capacidade); acima de 100% o membro está sobrecarregado
+    st.plotly_chart(carga['figura'], use_container_width=True)
 
-    # Coluna "Atrasada"
-    condicao_a = (df['Data_Conclusao'].isna()) & (df['Data_Entrega'].notna()) & (df['Data_Entrega'] < hoje)
-    condicao_b = (df['Status'] != "CONCLUÍDO") & (df['Data_Entrega'] < df['Data_Conclusao'])
-    df['Atrasada'] = np.where(condicao_b | condicao_a, True, False)
+    if carga['excedidos']:
+        st.markdown("**Membros acima da capacidade**")
+        st.dataframe(carga['tabelas']['excesso'], use_container_width=True)
 
-    # Coluna "Tempo_Estimado_Horas"
-    df['Tempo_Estimado_Min'] = pd.to_numeric(df['Tempo_Estimado_Min'], errors='coerce')
-    df['Tempo_Estimado_Horas'] = df['Tempo_Estimado_Min'] / 60
 
+def main():
+    """
+    Função principal que gerencia a navegação entre as páginas.
+    """
 
-    
-    
-    st.write(df['Tempo_Estimado_Horas'].value_counts())
-    # Se o DataFrame estiver vazio, exibe uma mensagem de erro e interrompe a execução
-    if df.empty:
-        st.error("Não foi possível carregar os dados do Trello. Verifique o arquivo JSON.")
-        return
 
-    # Se o DataFrame não tiver a coluna 'Tempo_Estimado_Horas', a cria para evitar erros
-    if 'Tempo_Estimado_Horas' not in df.columns:
-        df['Tempo_Estimado_Horas'] = pd.to_numeric(df['Tempo_Estimado_Min'], errors='coerce') / 60
+    st.set_page_config(layout="wide", page_title="Relatório de Produtividade")
+    iniciar_execucao()
+    # Relatório pré-calculado pela sincronização (None se não corresponder ao export atual e ao dia)
+    relatorio = carregar_relatorio()
+    if relatorio is not None:
+        # As opções dos filtros também vêm do pacote. O DataFrame não é carregado: o que sair do padrão
+        # é consultado direto no snapshot colunar, só com as linhas e colunas necessárias
+        dados = None
+        quadros = relatorio['opcoes']['quadros']
+        nomes_membros = relatorio['opcoes']['membros']
+        nomes_etiquetas = relatorio['opcoes']['etiquetas']
+    else:
+        leitura_dados()
+        dados = st.session_state['dados']
+        # Só as colunas das opções dos filtros (as derivadas são calculadas uma vez por snapshot e dia)
+        df = consultar_tarefas(dados, ['Board', 'Membro'])
+
+        # Se o DataFrame estiver vazio, exibe uma mensagem de erro e interrompe a execução
+        if df.empty:
+            st.error("Não foi possível carregar os dados do Trello. Verifique o arquivo JSON.")
+            return
+        quadros = sorted(df['Board'].dropna().unique())
+        nomes_membros = sorted(df['Membro'].dropna().unique())
+        nomes_etiquetas = obter_indice_etiquetas(dados).nomes
+
+    # Filtro de quadro (apenas quando o snapshot combina mais de um quadro)
+    quadros_selecionados = None
+    if len(quadros) > 1:
+        quadros_selecionados = tuple(st.sidebar.multiselect('Quadros', quadros, default=quadros, key='quadros'))
+
+    # Filtro de etiquetas, respondido pelo índice card × etiqueta (sem varrer as strings)
+    etiquetas = tuple(st.sidebar.multiselect('Etiquetas', nomes_etiquetas, key='etiquetas'))
+    modo_etiquetas = "any"
+    if len(etiquetas) > 1:
+        opcao = st.sidebar.radio('Tarefas com', ["Qualquer uma das etiquetas", "Todas as etiquetas"], key='modo_etiquetas')
+        modo_etiquetas = "all" if opcao == "Todas as etiquetas" else "any"
+
+    # Filtros de membros e de período de entrega (vazios: todos os membros, qualquer data)
+    membros = tuple(st.sidebar.multiselect('Membros', nomes_membros, key='membros'))
+    periodo = st.sidebar.date_input('Entrega entre', value=(), format="DD/MM/YYYY", key='periodo')
+    periodo = tuple(periodo) if len(periodo) == 2 else None
+
+    # Fora do padrão (algum quadro desmarcado, etiquetas, membros ou período escolhidos), tudo é calculado na hora
+    if quadros_selecionados is not None and set(quadros_selecionados) != set(quadros) or etiquetas or membros or periodo:
+        relatorio = None
 
     # Navegação entre as abas na sidebar
     pagina_selecionada = st.sidebar.radio("Selecione a página", ["Resumo Histórico", "Tarefas do Dia"])
     
     if pagina_selecionada == "Resumo Histórico":
-        resumo_historico()
+        with medir("pagina_resumo_historico"):
+            resumo_historico(dados, quadros_selecionados, etiquetas, modo_etiquetas, membros, periodo, relatorio)
     elif pagina_selecionada == "Tarefas do Dia":
-        tarefas_do_dia(df)
+        with medir("pagina_tarefas_do_dia"):
+            tarefas_do_dia(dados, quadros_selecionados, etiquetas, modo_etiquetas, membros, periodo, relatorio)
+
+    # Painel opcional com os tempos de cada etapa (este rerun e acumulado)
+    painel_sidebar(dados['df_trello'] if dados is not None else None)
+    registrar_render("Performance", _inicio_render)
 
 
 # --- Bloco de execução principal do Streamlit ---
@@ -0,0 +1,93 @@
+"""
+Fixtures compartilhadas pelos testes: um servidor HTTP local que faz o papel da API do Trello.
+"""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(RAIZ, "tests", "fixtures")
+sys.path.insert(0, RAIZ)
+
+
+def carregar_fixture(nome):
+    with open(os.path.join(FIXTURES_DIR, nome), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ServidorTrello:
+    """
+    Servidor local que responde como a API do Trello (`http://127.0.0.1:<porta>/1`).
+
+    Cada rota é registrada com `responder(caminho, resposta)`; a resposta pode ser o JSON a devolver
+    ou uma função que recebe os parâmetros da query e devolve o JSON ou (status, JSON, cabeçalhos).
+    Rotas sem resposta devolvem 404. As requisições recebidas ficam em `requisicoes`.
+    """
+
+    def __init__(self):
+        self.rotas = {}
+        self.requisicoes = []
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                partes = urlsplit(self.path)
+                caminho = partes.path[len("/1"):] if partes.path.startswith("/1/") else partes.path
+                params = dict(parse_qsl(partes.query))
+                params.pop("key", None)
+                params.pop("token", None)
+                with servidor._lock:
+                    servidor.requisicoes.append((caminho, params))
+                status, corpo, cabecalhos = servidor._resolver(caminho, params)
+                dados = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}/1"
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+
+    def responder(self, caminho, resposta):
+        self.rotas[caminho] = resposta
+
+    def _resolver(self, caminho, params):
+        if caminho not in self.rotas:
+            return 404, "not found", {}
+        resposta = self.rotas[caminho]
+        if callable(resposta):
+            resposta = resposta(params)
+        if isinstance(resposta, tuple):
+            return resposta
+        return 200, resposta, {}
+
+    def chamadas(self, caminho):
+        """Parâmetros das requisições recebidas em `caminho`, na ordem."""
+        return [params for rota, params in self.requisicoes if rota == caminho]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+@pytest.fixture
+def servidor_trello():
+    with ServidorTrello() as servidor:
+        yield servidor
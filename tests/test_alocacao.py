@@ -0,0 +1,67 @@
+"""
+Carga de trabalho por membro e dia útil (`alocacao.py`) contra uma distribuição feita dia a dia.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alocacao import dias_uteis, matriz_carga
+
+FERIADOS = ["2024-03-29", "2024-04-01", "2024-04-21"]
+
+
+def _tarefas(n, semente):
+    rng = np.random.default_rng(semente)
+    base = pd.Timestamp("2024-03-20", tz="America/Sao_Paulo")
+    entregas = base + pd.to_timedelta(rng.integers(-15 * 24, 60 * 24, n), unit="h")
+    return pd.DataFrame({
+        'Membro': rng.choice(np.array(["ANA", "JOAO", "BIA", None], dtype=object), n, p=[0.4, 0.3, 0.2, 0.1]),
+        'Data_Entrega': pd.Series(entregas).where(rng.random(n) > 0.15),
+        'Horas_Rateadas': pd.Series(rng.integers(1, 40, n) / 4).where(rng.random(n) > 0.1),
+    })
+
+
+def _carga_dia_a_dia(df, hoje, dias, feriados):
+    # Referência ingênua: cada tarefa, dia por dia, do primeiro dia útil até a entrega
+    feriados = {pd.Timestamp(dia).date() for dia in feriados}
+    calendario = [dia.date() for dia in dias_uteis(hoje, dias, sorted(feriados))]
+    carga = {}
+    for membro, entrega, horas in df[['Membro', 'Data_Entrega', 'Horas_Rateadas']].itertuples(index=False):
+        if pd.isna(membro):
+            continue
+        linha = carga.setdefault(membro, [0.0] * dias)
+        uteis = []
+        if not pd.isna(entrega):
+            dia = calendario[0]
+            while dia <= entrega.date():
+                if dia.weekday() < 5 and dia not in feriados:
+                    uteis.append(dia)
+                dia += timedelta(days=1)
+        # Atrasada ou sem data: tudo no primeiro dia útil
+        uteis = uteis or [calendario[0]]
+        for dia in uteis:
+            if dia in calendario:
+                linha[calendario.index(dia)] += (0.0 if pd.isna(horas) else horas) / len(uteis)
+    return pd.DataFrame.from_dict(dict(sorted(carga.items())), orient="index")
+
+
+@pytest.mark.parametrize("hoje, feriados", [
+    ("2024-03-20", []),
+    ("2024-03-23", []),          # sábado: o horizonte começa na segunda
+    ("2024-03-27", FERIADOS),
+], ids=["quarta", "sabado", "feriados"])
+@pytest.mark.parametrize("dias", [5, 20])
+def test_matriz_de_carga_igual_a_distribuicao_dia_a_dia(hoje, feriados, dias):
+    hoje = pd.Timestamp(hoje, tz="America/Sao_Paulo")
+    df = _tarefas(300, semente=dias)
+
+    carga = matriz_carga(df, hoje, dias, feriados)
+
+    esperado = _carga_dia_a_dia(df, hoje, dias, feriados)
+    assert list(carga.columns) == list(dias_uteis(hoje, dias, feriados))
+    assert carga.index.tolist() == esperado.index.tolist() == ["ANA", "BIA", "JOAO"]
+    np.testing.assert_allclose(carga.to_numpy(), esperado.to_numpy(), atol=1e-9)
+    # Nenhuma hora se perde dentro do horizonte: só a parte depois dele fica de fora
+    assert carga.to_numpy().sum() <= df.loc[df['Membro'].notna(), 'Horas_Rateadas'].sum() + 1e-9
@@ -0,0 +1,121 @@
+"""
+Controle de taxa e novas tentativas do cliente contra um servidor local que devolve 429.
+"""
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from cliente_trello import TrelloClient
+
+
+def _cliente(servidor, **kwargs):
+    return TrelloClient("chave", "token", base_url=servidor.url, **{"backoff_base": 0.0, **kwargs})
+
+
+def _falha_antes(vezes, status=429, cabecalhos=None, corpo=None):
+    # Responde `status` nas primeiras `vezes` chamadas e 200 depois
+    chamadas = []
+
+    def responder(params):
+        chamadas.append(time.monotonic())
+        if len(chamadas) <= vezes:
+            return status, "API rate limit exceeded", dict(cabecalhos or {})
+        return corpo if corpo is not None else {"ok": True}
+    return responder
+
+
+def test_429_e_repetido_ate_dar_certo(servidor_trello):
+    servidor_trello.responder("/boards/x", _falha_antes(2, cabecalhos={"Retry-After": "0.2"}))
+    cliente = _cliente(servidor_trello)
+
+    assert cliente.get("/boards/x") == {"ok": True}
+
+    assert cliente.stats["requests"] == 3
+    assert cliente.stats["retries"] == 2
+    assert cliente.stats["retry_wait_s"] == pytest.approx(0.4)
+    assert cliente.report().startswith("3 requisições, 2 novas tentativas")
+
+
+def test_429_pausa_todas_as_threads(servidor_trello):
+    servidor_trello.responder("/boards/limitado", _falha_antes(1, cabecalhos={"Retry-After": "0.5"}))
+    servidor_trello.responder("/boards/livre", {"ok": True})
+    cliente = _cliente(servidor_trello)
+
+    outra = threading.Thread(target=cliente.get, args=("/boards/limitado",))
+    outra.start()
+    while not cliente._paused_until:
+        time.sleep(0.01)
+    inicio = time.monotonic()
+    # Outra rota, outra thread: aguarda a mesma pausa
+    assert cliente.get("/boards/livre") == {"ok": True}
+    outra.join()
+
+    assert time.monotonic() - inicio >= 0.4
+    assert cliente.stats["throttle_wait_s"] >= 0.4
+    assert cliente.stats["retries"] == 1
+
+
+def test_retry_after_e_limitado_por_backoff_max(servidor_trello):
+    servidor_trello.responder("/boards/x", _falha_antes(1, cabecalhos={"Retry-After": "3600"}))
+    cliente = _cliente(servidor_trello, backoff_max=0.2)
+
+    inicio = time.monotonic()
+    assert cliente.get("/boards/x") == {"ok": True}
+
+    assert time.monotonic() - inicio < 2
+    assert cliente.stats["retry_wait_s"] == pytest.approx(0.2)
+
+
+def test_retry_after_como_data_http(servidor_trello):
+    data = formatdate(time.time() + 2, usegmt=True)
+    servidor_trello.responder("/boards/x", _falha_antes(1, cabecalhos={"Retry-After": data}))
+    cliente = _cliente(servidor_trello)
+
+    assert cliente.get("/boards/x") == {"ok": True}
+
+    # A data tem resolução de segundos: entre 1 e 2 s, e não o jitter (zero com backoff_base 0)
+    assert 0.9 <= cliente.stats["retry_wait_s"] <= 2.1
+
+
+@pytest.mark.parametrize("cabecalhos", [
+    {"Retry-After": "logo", "x-rate-limit-api-token-remaining": "muitos"},
+    {"x-rate-limit-api-key-remaining": "0", "x-rate-limit-api-key-interval-ms": "dez segundos"},
+], ids=["retry_after_e_restante", "intervalo"])
+def test_cabecalhos_malformados_nao_interrompem(servidor_trello, cabecalhos):
+    servidor_trello.responder("/boards/x", _falha_antes(1, cabecalhos=cabecalhos))
+    cliente = _cliente(servidor_trello, backoff_max=0.1)
+
+    assert cliente.get("/boards/x") == {"ok": True}
+    assert cliente.stats["retries"] == 1
+    assert cliente.stats["retry_wait_s"] <= 0.1
+
+
+def test_erro_permanente_nao_e_repetido(servidor_trello):
+    servidor_trello.responder("/boards/x", _falha_antes(5, status=401))
+    cliente = _cliente(servidor_trello)
+
+    with pytest.raises(requests.HTTPError):
+        cliente.get("/boards/x")
+    assert cliente.stats["requests"] == 1
+
+
+@pytest.mark.parametrize("status", [201, 203, 204])
+def test_qualquer_2xx_e_sucesso(servidor_trello, status):
+    servidor_trello.responder("/boards/x", (status, {"ok": True}, {}))
+
+    # 204 não leva corpo
+    assert _cliente(servidor_trello).get("/boards/x") == (None if status == 204 else {"ok": True})
+
+
+@pytest.mark.parametrize("status", [304, 400, 403])
+def test_status_fora_de_2xx_e_erro(servidor_trello, status):
+    servidor_trello.responder("/boards/x", (status, {"ok": True}, {}))
+    cliente = _cliente(servidor_trello)
+
+    with pytest.raises(requests.HTTPError) as erro:
+        cliente.get("/boards/x")
+    assert erro.value.response.status_code == status
+    assert cliente.stats["requests"] == 1
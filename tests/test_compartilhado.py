@@ -0,0 +1,85 @@
+"""
+Publicação do DataFrame mestre no diretório compartilhado e anexo pelas réplicas (`compartilhado.py`).
+"""
+import copy
+import os
+
+import pandas as pd
+import pytest
+
+import utilidades
+from compartilhado import AnexoCompartilhado, PublicadorCompartilhado
+from conftest import carregar_fixture
+from utilidades import TrelloDataFrameBuilder, calcular_metricas_derivadas
+
+QUADRO = carregar_fixture("trello_quadro.json")
+HOJE = pd.Timestamp("2024-03-06", tz="America/Sao_Paulo")
+
+
+@pytest.fixture
+def df():
+    return TrelloDataFrameBuilder(data=copy.deepcopy(QUADRO)).build_master_dataframe()
+
+
+def _geracoes(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.startswith("dataset-"))
+
+
+def test_replica_anexa_cada_geracao_publicada(tmp_path, df, monkeypatch):
+    diretorio = str(tmp_path / "compartilhado")
+    anexo = AnexoCompartilhado(diretorio)
+    # Nada publicado: nem o contador existe ainda
+    assert anexo.current() is None
+    publicador = PublicadorCompartilhado(diretorio)
+    assert anexo.current() is None
+
+    assert publicador.publicar(df, "a" * 64, HOJE) == 1
+    versao, vista = anexo.current()
+    assert versao == "a" * 64 + "-g1"
+    assert vista.attrs['hoje_derivado'] == HOJE
+    pd.testing.assert_frame_equal(vista, calcular_metricas_derivadas(df, HOJE))
+
+    # Mesma geração: nenhum arquivo é reaberto
+    monkeypatch.setattr(anexo, "_anexar", lambda geracao: pytest.fail("a geração não mudou"))
+    assert anexo.current()[0] == versao
+    monkeypatch.undo()
+
+    # O mesmo export republicado no dia seguinte: a geração entra na versão
+    amanha = HOJE + pd.Timedelta(days=1)
+    assert publicador.publicar(df, "a" * 64, amanha) == 2
+    versao, vista = anexo.current()
+    assert versao == "a" * 64 + "-g2" and vista.attrs['hoje_derivado'] == amanha
+
+    assert publicador.publicar(df.iloc[:1], "b" * 64, amanha) == 3
+    assert _geracoes(diretorio) == ["dataset-0000000002.arrow", "dataset-0000000003.arrow"]
+    versao, vista = anexo.current()
+    assert versao == "b" * 64 + "-g3" and len(vista) == 1
+
+
+def test_geracao_ilegivel_mantem_a_anterior(tmp_path, df):
+    diretorio = str(tmp_path)
+    PublicadorCompartilhado(diretorio).publicar(df, "a" * 64, HOJE)
+    anexo = AnexoCompartilhado(diretorio)
+    assert anexo.current()[0] == "a" * 64 + "-g1"
+
+    # Um carregador reiniciado continua a contagem; a geração 2 anunciada está corrompida
+    publicador = PublicadorCompartilhado(diretorio)
+    assert publicador.geracao == 1
+    (tmp_path / "dataset-0000000002.arrow").write_bytes(b"incompleto")
+    publicador._contador[:8] = (2).to_bytes(8, "little")
+
+    assert anexo.current()[0] == "a" * 64 + "-g1"
+    assert publicador.publicar(df, "a" * 64, HOJE) == 3
+    assert anexo.current()[0] == "a" * 64 + "-g3"
+
+
+def test_colunas_derivadas_publicadas_nao_sao_recalculadas(tmp_path, df, monkeypatch):
+    PublicadorCompartilhado(str(tmp_path)).publicar(df, "a" * 64, HOJE)
+    versao, vista = AnexoCompartilhado(str(tmp_path)).current()
+    monkeypatch.setattr(utilidades, "_METRICAS_CACHE", utilidades.DerivedMetricsCache())
+    monkeypatch.setattr(utilidades, "calcular_metricas_derivadas", lambda *args: pytest.fail("já derivado"))
+
+    tarefas = utilidades.consultar_tarefas({'df_trello': vista, 'versao': versao}, ['ID_Tarefa', 'Atrasada'],
+                                           membros=("ANA",), hoje=HOJE)
+
+    assert tarefas['ID_Tarefa'].tolist() == [card["id"] for card in QUADRO["cards"][:2]]
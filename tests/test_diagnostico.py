@@ -0,0 +1,58 @@
+"""
+Painel de diagnóstico: a caixa da barra lateral vale só para a sessão que a marcou.
+"""
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import diagnostico
+
+
+def _pagina():
+    from diagnostico import medir, iniciar_execucao, painel_sidebar
+
+    iniciar_execucao()
+    with medir("etapa_teste"):
+        pass
+    painel_sidebar()
+
+
+@pytest.mark.parametrize("ativo", [False, True])
+def test_caixa_de_uma_sessao_nao_muda_o_processo_nem_as_outras(monkeypatch, ativo):
+    monkeypatch.setattr(diagnostico, "_ativo", ativo)
+    marcada, outra = AppTest.from_function(_pagina).run(), AppTest.from_function(_pagina).run()
+
+    marcada.sidebar.checkbox(key="diagnostico").check().run()
+    outra.run()
+
+    assert diagnostico.ativo() is ativo
+    assert len(marcada.sidebar.expander) == 1 and not outra.sidebar.expander
+    # Com as medições desligadas no processo, o painel só explica como ligá-las
+    assert bool(marcada.sidebar.dataframe) is ativo
+    assert any("TRELLO_DIAGNOSTICO" in legenda.value for legenda in marcada.sidebar.caption) is not ativo
+
+
+def test_relatorio_memoria_soma_as_colunas():
+    import pandas as pd
+
+    df = pd.DataFrame({"Membro": pd.Series(["ANA", "JOAO"] * 50, dtype="category"), "Horas": [1.5] * 100})
+
+    relatorio = diagnostico.relatorio_memoria(df)
+
+    assert list(relatorio.index) == ["Membro", "Horas", "TOTAL"]
+    assert relatorio.loc["Horas", "Bytes_Por_Linha"] == 8
+    assert relatorio.loc["TOTAL", "MB"] == pytest.approx(df.memory_usage(deep=True, index=False).sum() / 2**20)
+
+
+def test_painel_mostra_a_memoria_do_dataframe(monkeypatch):
+    monkeypatch.setattr(diagnostico, "_ativo", True)
+
+    def pagina():
+        import pandas as pd
+        from diagnostico import painel_sidebar
+
+        painel_sidebar(pd.DataFrame({"Membro": ["ANA", "JOAO"]}))
+
+    app = AppTest.from_function(pagina).run()
+    app.sidebar.checkbox(key="diagnostico").check().run()
+
+    assert any("Memória do DataFrame" in texto.value for texto in app.sidebar.markdown)
@@ -0,0 +1,79 @@
+"""
+Histórico de snapshots: gravação dos deltas e reconstrução do DataFrame mestre em qualquer momento.
+"""
+import copy
+
+import pandas as pd
+import pytest
+
+from conftest import carregar_fixture
+from historico import HistoricoSnapshots
+from utilidades import TrelloDataFrameBuilder
+
+QUADRO = carregar_fixture("trello_quadro.json")
+SEGUNDA = pd.Timestamp("2024-03-04 12:00", tz="UTC")
+
+
+def _df(quadro):
+    return TrelloDataFrameBuilder(data=copy.deepcopy(quadro)).build_master_dataframe()
+
+
+def _ordenado(df):
+    # O histórico devolve os cards na ordem em que as versões foram gravadas
+    return df.sort_values(['ID_Tarefa', 'ID_Membro']).reset_index(drop=True)
+
+
+def _igual(obtido, esperado):
+    pd.testing.assert_frame_equal(_ordenado(obtido), _ordenado(esperado), check_categorical=False)
+
+
+@pytest.fixture
+def versoes():
+    """Três versões do quadro: a gravada, uma com um card editado e um removido, e a de volta ao início."""
+    editado = copy.deepcopy(QUADRO)
+    editado["cards"][0]["name"] = "Relatório mensal (v2)"
+    editado["cards"][1]["idMembers"] = editado["cards"][1]["idMembers"][:1]
+    del editado["cards"][2]
+    return [_df(QUADRO), _df(editado), _df(QUADRO)]
+
+
+def test_as_of_reconstroi_cada_versao(tmp_path, versoes):
+    historico = HistoricoSnapshots(str(tmp_path))
+    momentos = [SEGUNDA + pd.Timedelta(days=dia) for dia in range(3)]
+    for df, momento in zip(versoes, momentos):
+        assert historico.registrar(df, momento) is not None
+
+    # Depois do primeiro delta, só as linhas dos cards que mudaram e os marcadores de remoção
+    deltas = [pd.read_parquet(arquivo) for arquivo in historico.arquivos()]
+    assert [sorted(delta['ID_Tarefa']) for delta in deltas[1:]] == [
+        sorted(versoes[0]['ID_Tarefa'].unique()),
+        sorted(versoes[2]['ID_Tarefa']),
+    ]
+    assert deltas[1]['Removido'].sum() == 1 and not deltas[2]['Removido'].any()
+
+    assert historico.as_of(momentos[0] - pd.Timedelta(seconds=1)).empty
+    for df, momento in zip(versoes, momentos):
+        _igual(historico.as_of(momento), df)
+        _igual(historico.as_of(momento + pd.Timedelta(hours=23)), df)
+
+
+def test_registrar_sem_mudancas_nao_grava(tmp_path, versoes):
+    historico = HistoricoSnapshots(str(tmp_path))
+    historico.registrar(versoes[0], SEGUNDA)
+
+    # Outra ordem de linhas, mesmo conteúdo
+    assert historico.registrar(versoes[0].iloc[::-1], SEGUNDA + pd.Timedelta(days=1)) is None
+    assert len(historico.arquivos()) == 1
+
+
+def test_serie_temporal_le_o_historico_uma_vez(tmp_path, versoes):
+    historico = HistoricoSnapshots(str(tmp_path))
+    for dia, df in enumerate(versoes):
+        historico.registrar(df, SEGUNDA + pd.Timedelta(days=dia))
+
+    momentos = [SEGUNDA - pd.Timedelta(days=1)] + [SEGUNDA + pd.Timedelta(days=dia, hours=1) for dia in range(3)]
+    serie = historico.serie_temporal(momentos, lambda df, momento: df['ID_Tarefa'].nunique())
+
+    # Antes do primeiro snapshot não há o que medir
+    assert serie.tolist() == [3, 2, 3]
+    assert list(serie.index) == momentos[1:]
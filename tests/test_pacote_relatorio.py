@@ -0,0 +1,139 @@
+"""
+Relatório pré-calculado (`pacote_relatorio.py`): gravação, validade e leitura do pacote.
+"""
+import copy
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import pacote_relatorio
+import utilidades
+from conftest import carregar_fixture
+from pacote_relatorio import (
+    ARQUIVO_MANIFESTO, calcular_resumo, carregar_relatorio, gerar_relatorio, relatorio_atualizado, salvar_relatorio,
+    tabela_membro,
+)
+from utilidades import TrelloDataFrameBuilder
+
+QUADRO = carregar_fixture("trello_quadro.json")
+HOJE = pd.Timestamp("2024-03-06", tz="America/Sao_Paulo")
+VERSAO = "a" * 64
+
+
+@pytest.fixture
+def relatorio(tmp_path, monkeypatch):
+    # Sem export, histórico nem capacidade.json no diretório de trabalho
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utilidades, "_METRICAS_CACHE", utilidades.DerivedMetricsCache())
+    df = TrelloDataFrameBuilder(data=copy.deepcopy(QUADRO)).build_master_dataframe()
+    return gerar_relatorio({'df_trello': df, 'versao': VERSAO}, HOJE)
+
+
+def _especificacao(figura):
+    # A ordem das chaves do JSON muda na volta; o conteúdo não
+    return json.loads(figura.to_json())
+
+
+def _tabelas(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.endswith(".parquet"))
+
+
+def test_pacote_gravado_e_lido_de_volta(tmp_path, relatorio, monkeypatch):
+    diretorio = str(tmp_path / "relatorio")
+    salvar_relatorio(relatorio, VERSAO, HOJE, diretorio)
+    monkeypatch.setattr(pacote_relatorio, "versao_export", lambda: VERSAO)
+
+    assert relatorio_atualizado(VERSAO, HOJE, diretorio)
+    lido = carregar_relatorio(diretorio, HOJE)
+
+    assert lido['opcoes'] == relatorio['opcoes']
+    assert lido['resumo']['metricas'] == relatorio['resumo']['metricas']
+    # Os status das colunas voltam como texto, não como categoria
+    status = relatorio['resumo']['tabelas']['status']
+    pd.testing.assert_frame_equal(lido['resumo']['tabelas']['status'], status.set_axis(status.columns.astype(str), axis=1),
+                                  check_index_type=False)
+    for nome, figura in relatorio['resumo']['figuras'].items():
+        assert (lido['resumo']['figuras'][nome] is None) == (figura is None)
+        if figura is not None:
+            assert _especificacao(lido['resumo']['figuras'][nome]) == _especificacao(figura)
+
+    tarefas, gravadas = relatorio['tarefas'], lido['tarefas']
+    assert (gravadas['total_tarefas'], gravadas['total_horas']) == (tarefas['total_tarefas'], tarefas['total_horas'])
+    assert list(gravadas['membros']) == list(tarefas['membros'])
+    for membro, posicoes in tarefas['membros'].items():
+        pd.testing.assert_frame_equal(tabela_membro(gravadas['tarefas'], gravadas['membros'][membro]),
+                                      tabela_membro(tarefas['tarefas'], posicoes), check_dtype=False)
+
+    assert lido['carga']['parametros'] == relatorio['carga']['parametros']
+    carga, carga_lida = relatorio['carga']['resultado'], lido['carga']['resultado']
+    assert {chave: carga_lida[chave] for chave in ('membros', 'excedidos', 'horas_excedentes')} == \
+           {chave: carga[chave] for chave in ('membros', 'excedidos', 'horas_excedentes')}
+    assert _especificacao(carga_lida['figura']) == _especificacao(carga['figura'])
+    pd.testing.assert_frame_equal(carga_lida['tabelas']['excesso'], carga['tabelas']['excesso'], check_dtype=False)
+
+
+def test_pacote_invalidado_pelo_export_pelo_dia_e_pela_versao(tmp_path, relatorio, monkeypatch):
+    diretorio = str(tmp_path / "relatorio")
+    salvar_relatorio(relatorio, VERSAO, HOJE, diretorio)
+    tabelas = _tabelas(diretorio)
+    amanha = HOJE + pd.Timedelta(days=1)
+    versao_atual = {'valor': VERSAO}
+    monkeypatch.setattr(pacote_relatorio, "versao_export", lambda: versao_atual['valor'])
+
+    # Outro export ou outro dia: as colunas derivadas já não são as do pacote
+    assert not relatorio_atualizado("b" * 64, HOJE, diretorio)
+    assert not relatorio_atualizado(VERSAO, amanha, diretorio)
+    assert carregar_relatorio(diretorio, amanha) is None
+    versao_atual['valor'] = "b" * 64
+    assert carregar_relatorio(diretorio, HOJE) is None
+    versao_atual['valor'] = VERSAO
+    assert carregar_relatorio(diretorio, HOJE) is not None
+
+    # Regravado para o dia seguinte: as tabelas do pacote anterior são apagadas
+    salvar_relatorio(relatorio, VERSAO, amanha, diretorio)
+    assert relatorio_atualizado(VERSAO, amanha, diretorio)
+    assert len(_tabelas(diretorio)) == len(tabelas) and not set(_tabelas(diretorio)) & set(tabelas)
+
+    # Pacote de outra versão do schema: ignorado
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    with open(caminho, encoding="utf-8") as f:
+        manifesto = json.load(f)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({**manifesto, 'versao_schema': "antigo"}, f)
+    assert not relatorio_atualizado(VERSAO, amanha, diretorio)
+    assert carregar_relatorio(diretorio, amanha) is None
+
+    # Sem pacote
+    assert carregar_relatorio(str(tmp_path / "vazio"), HOJE) is None
+
+
+def _quadro_compartilhado():
+    # Todos os cards com os dois membros
+    quadro = copy.deepcopy(QUADRO)
+    membros = [membro["id"] for membro in quadro["members"]]
+    for card in quadro["cards"]:
+        card["idMembers"] = list(membros)
+    return quadro
+
+
+def test_filtro_de_membros_conta_cada_card_uma_vez(tmp_path, monkeypatch):
+    from historico import _atrasadas_na_data
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utilidades, "_METRICAS_CACHE", utilidades.DerivedMetricsCache())
+    df = TrelloDataFrameBuilder(data=_quadro_compartilhado()).build_master_dataframe()
+    dados = {'df_trello': df, 'versao': VERSAO}
+    # "Ajustar planilha" venceu ontem e "Revisar contrato", sem entrega, ficou para o dia seguinte à última atividade
+    esperado = {'total': 3, 'concluidas': 0, 'vencendo': 2, 'atrasadas': 2}
+
+    for membros in (None, ("ANA",), ("JOAO",), ("ANA", "JOAO")):
+        assert calcular_resumo(dados, hoje=HOJE, membros=membros)['metricas'] == esperado
+        assert _atrasadas_na_data(df, HOJE, True, None, membros=membros) == (2, 3)
+
+    # Consultado direto do snapshot colunar, sem o DataFrame carregado
+    utilidades.salvar_snapshot_colunar(df, "trello.arrow", VERSAO)
+    monkeypatch.setattr(utilidades, "versao_export", lambda *args: VERSAO)
+    monkeypatch.setattr(utilidades, "SNAPSHOT_PATH", "trello.arrow")
+    assert calcular_resumo(None, hoje=HOJE, membros=("JOAO",))['metricas'] == esperado
@@ -0,0 +1,286 @@
+"""
+Sincronização com o Trello contra um servidor local que reproduz respostas gravadas da API.
+
+`trello_quadro.json` é o quadro na última sincronização, `trello_acoes.json` o log de ações do quadro
+(da mais recente para a mais antiga) e `trello_depois.json` os cards e listas como a API os devolve
+depois das ações mais novas: o card 1 foi editado (inclusive os campos personalizados) e concluído, o card 3
+excluído e uma lista criada.
+"""
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import trello_update
+from cliente_trello import TrelloClient
+from conftest import carregar_fixture
+from pacote_relatorio import relatorio_atualizado
+from utilidades import hash_arquivo
+
+QUADRO = carregar_fixture("trello_quadro.json")
+ACOES = carregar_fixture("trello_acoes.json")
+DEPOIS = carregar_fixture("trello_depois.json")
+BOARD_ID = QUADRO["id"]
+CARD_EDITADO, CARD_MANTIDO, CARD_EXCLUIDO = (card["id"] for card in QUADRO["cards"])
+# Última ação já aplicada ao snapshot local
+ULTIMA_SINCRONIZADA = ACOES[3]["id"]
+
+
+def _acoes(params, acoes=ACOES):
+    # Mesma semântica da API: filtro por tipo (e campo alterado), since/before por ID e limite por página
+    filtros = params.get("filter", "").split(",") if params.get("filter") else None
+    selecionadas = []
+    for acao in acoes:
+        if filtros is not None and not any(
+            acao["type"] == tipo and (not campo or campo in acao["data"].get("old", {}))
+            for tipo, _, campo in (filtro.partition(":") for filtro in filtros)
+        ):
+            continue
+        if "since" in params and acao["id"] <= params["since"]:
+            continue
+        if "before" in params and acao["id"] >= params["before"]:
+            continue
+        selecionadas.append(acao)
+    return selecionadas[:int(params.get("limit", 50))]
+
+
+def _quadro_remoto():
+    quadro = copy.deepcopy(QUADRO)
+    quadro["lists"] += DEPOIS["lists"]
+    quadro["cards"] = [DEPOIS["cards"].get(card["id"], card) for card in quadro["cards"]
+                       if card["id"] != CARD_EXCLUIDO]
+    return quadro
+
+
+def _sem_campos(card, params, parametro):
+    # Como a API: os valores dos campos personalizados só vêm quando pedidos
+    if params.get(parametro) == "true":
+        return card
+    return {chave: valor for chave, valor in card.items() if chave != "customFieldItems"}
+
+
+def _board(params):
+    quadro = _quadro_remoto()
+    if params.get("customFields") != "true":
+        quadro.pop("customFields")
+    if params.get("cards") == "none":
+        quadro.pop("cards")
+    else:
+        quadro["cards"] = [_sem_campos(card, params, "card_customFieldItems") for card in quadro["cards"]]
+    return quadro
+
+
+@pytest.fixture
+def api(servidor_trello, monkeypatch):
+    """A API depois das ações novas, com o cliente do módulo apontado para o servidor local."""
+    servidor_trello.responder(f"/boards/{BOARD_ID}", _board)
+    servidor_trello.responder(f"/boards/{BOARD_ID}/actions", _acoes)
+    for card in _quadro_remoto()["cards"]:
+        servidor_trello.responder(f"/cards/{card['id']}", lambda params, card=card: _sem_campos(card, params, "customFieldItems"))
+    cliente = TrelloClient("chave", "token", base_url=servidor_trello.url, backoff_base=0.01, backoff_max=0.05)
+    monkeypatch.setattr(trello_update, "CLIENT", cliente)
+    monkeypatch.setattr(trello_update, "BOARD_IDS", [BOARD_ID])
+    return servidor_trello
+
+
+def _estado(horas_desde_completa=1):
+    completa = datetime.utcnow() - timedelta(hours=horas_desde_completa)
+    return {"last_action_id": ULTIMA_SINCRONIZADA, "last_full_sync": completa.isoformat() + "Z",
+            "last_move_id": ULTIMA_SINCRONIZADA}
+
+
+def _sincronizar(estado):
+    """Sincroniza o quadro por `sync_boards` a partir do snapshot local; devolve o estado só desse quadro."""
+    board, novo_estado, movimentos = trello_update.sync_boards(
+        {BOARD_ID: estado}, trello_update.merge_boards([copy.deepcopy(QUADRO)])
+    )
+    return board, novo_estado[BOARD_ID], movimentos
+
+
+def _downloads_completos(api):
+    return [params for params in api.chamadas(f"/boards/{BOARD_ID}") if params.get("cards") == "all"]
+
+
+def test_incremental_aplica_so_as_acoes_novas(api):
+    inicial = _estado()
+    board, estado, movimentos = _sincronizar(inicial)
+
+    cards = {card["id"]: card for card in board["cards"]}
+    assert cards[CARD_EDITADO]["name"] == "Relatório mensal (v2)"
+    # O card baixado traz os valores dos campos personalizados
+    assert cards[CARD_EDITADO]["customFieldItems"] == DEPOIS["cards"][CARD_EDITADO]["customFieldItems"]
+    assert [params.get("customFieldItems") for params in api.chamadas(f"/cards/{CARD_EDITADO}")] == ["true"]
+    assert cards[CARD_MANTIDO] == QUADRO["cards"][1]
+    assert CARD_EXCLUIDO not in cards
+    assert estado["last_action_id"] == ACOES[0]["id"]
+    assert estado["last_full_sync"] == inicial["last_full_sync"]
+    # Só o card editado é baixado, e o quadro inteiro não
+    assert not _downloads_completos(api)
+    assert [rota for rota, _ in api.requisicoes if rota.startswith("/cards/")] == [f"/cards/{CARD_EDITADO}"]
+    # Apenas a movimentação feita depois da última execução
+    concluido = DEPOIS["cards"][CARD_EDITADO]["idList"]
+    assert [(tarefa, lista) for _, tarefa, lista, _ in movimentos] == [(CARD_EDITADO, concluido)]
+    assert estado["last_move_id"] == ACOES[2]["id"]
+
+
+def test_mudanca_de_estrutura_atualiza_listas_e_mantem_cards(api):
+    board, _, _ = _sincronizar(_estado())
+
+    assert [lista["name"] for lista in board["lists"]] == ["A Fazer", "Fazendo", "Concluído", "Bloqueado"]
+    # A estrutura é baixada sem os cards
+    assert [params.get("cards") for params in api.chamadas(f"/boards/{BOARD_ID}")] == ["none"]
+    assert len(board["cards"]) == 2
+
+
+def test_card_excluido_ou_movido_para_outro_quadro_sai_do_snapshot(api):
+    movido = {**QUADRO["cards"][1], "idBoard": "outroquadro"}
+    acao = {**ACOES[1], "id": ACOES[0]["id"][:8] + "f" * 16, "type": "updateCard",
+            "data": {"card": {"id": CARD_MANTIDO}}}
+    api.responder(f"/boards/{BOARD_ID}/actions", lambda params: _acoes(params, [acao] + ACOES))
+    api.responder(f"/cards/{CARD_MANTIDO}", movido)
+    api.responder(f"/cards/{CARD_EDITADO}", (404, "card not found", {}))
+
+    board, estado, _ = _sincronizar(_estado())
+
+    # Excluído (deleteCard), movido (idBoard de outro quadro) e sumido (404): nenhum fica
+    assert board["cards"] == []
+    assert estado["last_action_id"] == acao["id"]
+
+
+def test_muitos_cards_alterados_usa_sincronizacao_completa(api, monkeypatch):
+    monkeypatch.setattr(trello_update, "MAX_INCREMENTAL_CARDS", 0)
+
+    board, estado, _ = _sincronizar(_estado())
+
+    assert board == trello_update.merge_boards([_quadro_remoto()])
+    assert len(_downloads_completos(api)) == 1
+    assert estado["last_action_id"] == ACOES[0]["id"]
+    assert estado["last_full_sync"] > _estado()["last_full_sync"]
+
+
+@pytest.mark.parametrize("estado", [{}, _estado(horas_desde_completa=48)], ids=["sem_estado", "resync_periodico"])
+def test_sincronizacao_completa_sem_estado_ou_apos_o_intervalo(api, estado):
+    board, novo_estado, movimentos = _sincronizar(estado)
+
+    assert board == trello_update.merge_boards([_quadro_remoto()])
+    assert len(_downloads_completos(api)) == 1
+    # Definições e valores dos campos personalizados vêm no download completo
+    assert {(p["customFields"], p["card_customFieldItems"]) for p in _downloads_completos(api)} == {("true", "true")}
+    # O log de ações não é percorrido: só a marca d'água mais recente
+    assert [params.get("limit") for params in api.chamadas(f"/boards/{BOARD_ID}/actions")
+            if "filter" not in params] == ["1"]
+    assert novo_estado["last_action_id"] == ACOES[0]["id"]
+    # As movimentações continuam de onde pararam (todas, sem estado)
+    esperadas = 5 if not estado else 1
+    assert len(movimentos) == esperadas
+
+
+@pytest.fixture
+def repositorio(api, tmp_path, monkeypatch):
+    """Arquivos da sincronização num diretório temporário, com o commit/push registrado em vez de executado."""
+    for nome in ("JSON_FILE", "SNAPSHOT_FILE", "FIELDS_SNAPSHOT_FILE", "LABELS_SNAPSHOT_FILE", "STATE_FILE", "MOVES_FILE",
+                 "REPORT_DIR", "HISTORY_DIR"):
+        monkeypatch.setattr(trello_update, nome, tmp_path / getattr(trello_update, nome).name)
+    monkeypatch.setattr(trello_update, "BOARD_IDS", [BOARD_ID])
+    monkeypatch.setattr(trello_update, "TRELLO_KEY", "chave")
+    monkeypatch.setattr(trello_update, "TRELLO_TOKEN", "token")
+    commits = []
+    monkeypatch.setattr(trello_update, "git_commit_and_push",
+                        lambda paths=None, title="Atualização Trello": commits.append((paths, title)))
+    return tmp_path, commits
+
+
+def _gravar_local(quadro, estado):
+    trello_update.write_json_atomic(trello_update.JSON_FILE, trello_update.merge_boards([quadro]), indent=2)
+    trello_update.save_state({BOARD_ID: estado})
+
+
+def test_sem_mudanca_relevante_avanca_o_estado_sem_publicar_o_snapshot(repositorio):
+    _, commits = repositorio
+    # O snapshot local já tem o conteúdo atual, mas o estado ainda aponta para ações antigas
+    _gravar_local(_quadro_remoto(), {**_estado(), "last_move_id": ACOES[0]["id"]})
+    json_antes = trello_update.JSON_FILE.read_bytes()
+
+    trello_update.main()
+
+    estado = trello_update.load_state()[BOARD_ID]
+    assert estado["last_action_id"] == ACOES[0]["id"]
+    assert trello_update.JSON_FILE.read_bytes() == json_antes
+    assert not trello_update.SNAPSHOT_FILE.exists()
+    # Sem relatório de hoje, ele é recalculado do snapshot mantido e vai junto com o estado
+    assert commits == [([str(trello_update.STATE_FILE), str(trello_update.REPORT_DIR)], "Estado da sincronização Trello")]
+    assert relatorio_atualizado(hash_arquivo(str(trello_update.JSON_FILE)), diretorio=str(trello_update.REPORT_DIR))
+
+    # Na execução seguinte do mesmo dia, o relatório já vale: só o estado é gravado
+    trello_update.main()
+    assert commits[1] == ([str(trello_update.STATE_FILE)], "Estado da sincronização Trello")
+
+
+def test_mudanca_relevante_publica_o_snapshot(repositorio):
+    _, commits = repositorio
+    _gravar_local(copy.deepcopy(QUADRO), _estado())
+
+    trello_update.main()
+
+    publicado = trello_update.load_local_board()
+    assert [card["name"] for card in publicado["cards"]] == ["Relatório mensal (v2)", "Ajustar planilha"]
+    assert trello_update.SNAPSHOT_FILE.exists() and trello_update.LABELS_SNAPSHOT_FILE.exists()
+    assert trello_update.load_state()[BOARD_ID]["last_action_id"] == ACOES[0]["id"]
+    assert commits == [(None, "Atualização Trello")]
+
+
+def test_janelas_de_movimentacoes_respeitam_o_limite_de_conexoes(api, monkeypatch):
+    # Conta as requisições em andamento no servidor (cada resposta demora um pouco)
+    lock = threading.Lock()
+    concorrencia = {"atual": 0, "maximo": 0}
+
+    def lento(resposta):
+        def responder(params):
+            with lock:
+                concorrencia["atual"] += 1
+                concorrencia["maximo"] = max(concorrencia["maximo"], concorrencia["atual"])
+            time.sleep(0.1)
+            with lock:
+                concorrencia["atual"] -= 1
+            return resposta(params)
+        return responder
+
+    api.responder(f"/boards/{BOARD_ID}", lento(_board))
+    api.responder(f"/boards/{BOARD_ID}/actions", lento(_acoes))
+    monkeypatch.setattr(trello_update, "MAX_WORKERS", 2)
+    # O mesmo quadro duas vezes basta: cada um tem duas janelas de movimentações
+    monkeypatch.setattr(trello_update, "BOARD_IDS", [BOARD_ID, BOARD_ID])
+
+    _, _, movimentos = trello_update.sync_boards({}, None)
+
+    assert len(movimentos) == 10
+    assert concorrencia["maximo"] <= 2
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ("Prioridade", lambda quadro: {"idValue": quadro["customFields"][1]["options"][0]["id"]}),
+    ("Tempo de execução em minutos", lambda quadro: {"value": {"number": "15"}}),
+], ids=["lista", "numero"])
+def test_edicao_so_de_campo_personalizado_nao_e_ignorada(campo, valor):
+    # Card comum (sem a etiqueta de rotina): só o campo personalizado muda
+    editado = copy.deepcopy(QUADRO)
+    campo_id = next(c["id"] for c in editado["customFields"] if c["name"] == campo)
+    card = editado["cards"][1]
+    card["customFieldItems"] = [item for item in card["customFieldItems"] if item["idCustomField"] != campo_id]
+    card["customFieldItems"].append({"id": "item", "idCustomField": campo_id, **valor(editado)})
+
+    mudancas = trello_update.describe_changes(copy.deepcopy(QUADRO), editado)
+
+    assert mudancas == [f"~ {CARD_MANTIDO} Ajustar planilha: customFields"]
+
+
+def test_campos_volateis_continuam_ignorados():
+    editado = copy.deepcopy(QUADRO)
+    # A última atividade só conta em cards concluídos ou sem entrega (fallback da data de entrega)
+    for card in (card for card in editado["cards"] if card["due"]):
+        card["dateLastActivity"] = "2024-03-02T08:00:00.000Z"
+        card["customFieldItems"] = [{**item, "id": item["id"][::-1]} for item in card["customFieldItems"]]
+
+    assert trello_update.describe_changes(copy.deepcopy(QUADRO), editado) is None
@@ -0,0 +1,262 @@
+"""
+Construção do DataFrame mestre a partir de quadros gravados (`tests/fixtures/trello_quadro.json`).
+"""
+import copy
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utilidades
+from benchmark import escrever_board
+from conftest import carregar_fixture
+from trello_update import merge_boards
+from utilidades import TrelloDataFrameBuilder
+
+QUADRO = carregar_fixture("trello_quadro.json")
+
+
+def _outro_quadro(quadro, minutos):
+    # O mesmo quadro com outros IDs (outro squad), e o tempo de execução da rotina alterado
+    itens = [quadro] + [item for chave in ("lists", "labels", "customFields", "cards") for item in quadro[chave]]
+    troca = {item["id"]: "f" + item["id"][1:] for item in itens}
+
+    def renomear(valor):
+        if isinstance(valor, dict):
+            return {chave: renomear(item) for chave, item in valor.items()}
+        if isinstance(valor, list):
+            return [renomear(item) for item in valor]
+        return troca.get(valor, valor) if isinstance(valor, str) else valor
+
+    outro = renomear(quadro)
+    outro["name"] = "Outro Squad"
+    outro["cards"][0]["customFieldItems"][0]["value"] = {"number": str(minutos)}
+    return outro
+
+
+@pytest.fixture(params=["sintetico", "fixture"])
+def export(request, tmp_path):
+    """Um export em disco: o quadro sintético do benchmark (listas ignoradas, cards arquivados e sem
+    membros, rotinas com e sem tempo informado) ou o quadro gravado, com IDs e campos reais."""
+    caminho = tmp_path / "trello.json"
+    if request.param == "sintetico":
+        escrever_board(str(caminho), cards=400, membros=8, campos=5, semente=7,
+                       referencia=datetime(2024, 3, 1, tzinfo=timezone.utc))
+    else:
+        caminho.write_text(json.dumps(QUADRO, ensure_ascii=False), encoding="utf-8")
+    return str(caminho)
+
+
+def test_modos_de_construcao_produzem_o_mesmo_dataframe(export, monkeypatch):
+    # Referência: linha a linha, com o JSON carregado inteiro
+    referencia = TrelloDataFrameBuilder(export, streaming=False).build_master_dataframe("rows")
+    assert not referencia.empty
+
+    for streaming in (False, True):
+        for modo in ("rows", "columnar"):
+            df = TrelloDataFrameBuilder(export, streaming=streaming).build_master_dataframe(modo)
+            pd.testing.assert_frame_equal(df, referencia)
+
+    # "auto" troca de modo pelo número de cards
+    for limite in (0, 10**9):
+        monkeypatch.setattr(utilidades, "COLUMNAR_MIN_CARDS", limite)
+        pd.testing.assert_frame_equal(TrelloDataFrameBuilder(export).build_master_dataframe(), referencia)
+
+
+@pytest.mark.parametrize("modo", ["rows", "columnar"])
+def test_tempo_de_execucao_da_rotina_em_quadros_combinados(modo):
+    combinado = merge_boards([copy.deepcopy(QUADRO), _outro_quadro(QUADRO, 90)])
+
+    df = TrelloDataFrameBuilder(data=combinado).build_master_dataframe(modo)
+
+    rotinas = df[df['Is_Rotina']].set_index('Board')['Tempo_Estimado_Min']
+    # Cada quadro tem o seu campo "Tempo de execução em minutos"; nenhum cai no padrão
+    assert rotinas.to_dict() == {"Equipe": 45, "Outro Squad": 90}
+
+
+def test_consulta_confere_o_snapshot_sem_ler_a_tabela(tmp_path, monkeypatch):
+    df = TrelloDataFrameBuilder(data=copy.deepcopy(QUADRO)).build_master_dataframe()
+    caminho = str(tmp_path / "trello.arrow")
+    utilidades.salvar_snapshot_colunar(df, caminho, "a" * 64)
+    monkeypatch.setattr(utilidades, "SNAPSHOT_PATH", caminho)
+    monkeypatch.setattr(utilidades, "versao_export", lambda: "a" * 64)
+    monkeypatch.setattr(utilidades, "_tabela_snapshot", lambda *args: pytest.fail("a tabela não deve ser lida"))
+
+    assert utilidades.dados_consulta(None) == {'df_trello': None, 'versao': "a" * 64}
+    assert not utilidades.snapshot_valido(caminho, "b" * 64)
+
+    # Trocado por um snapshot de outro export: a memoização acompanha o arquivo
+    utilidades.salvar_snapshot_colunar(df.iloc[:1], caminho, "b" * 64)
+    assert utilidades.snapshot_valido(caminho, "b" * 64)
+    assert not utilidades.snapshot_valido(caminho, "a" * 64)
+
+
+# Strings com escapes (aspas, barras, \uXXXX e pares substitutos), números e literais em todas as posições
+DOCUMENTO = {
+    "id": "q\"uadro\\1",
+    "name": "Equipe \u00e9 \\u00e9 \t\n fim",
+    "actions": [{"data": {"text": "ignorado \U0001F600 " * 3, "n": [1, -2.5e-3, None, True, False]}}] * 4,
+    "lists": [{"id": f"l{i}", "name": f"Lista \"{i}\" \u2013 \\", "idBoard": "q", "pos": 16384.5 * i}
+              for i in range(5)],
+    "cards": [{"id": f"c{i}", "name": "Tarefa \U0001F680 \\n\"" * (i % 3), "closed": i % 4 == 0,
+               "idLabels": [], "due": None, "desc": "x" * i, "badges": {"votes": i}} for i in range(12)],
+    "vazio": {}, "lista_vazia": [],
+}
+
+
+def test_leitor_em_streaming_equivale_ao_json_load(tmp_path):
+    caminho = tmp_path / "export.json"
+    caminho.write_text(json.dumps(DOCUMENTO, indent=1), encoding="utf-8")
+    esperado = json.loads(caminho.read_text(encoding="utf-8"))
+
+    # Blocos minúsculos: todo escape, número e literal acaba cortado na borda de algum bloco
+    for tamanho in (1, 2, 3, 5, 7, 16, 1 << 20):
+        with open(caminho, "r", encoding="utf-8") as f:
+            assert utilidades._JsonStreamReader(f, chunk_size=tamanho).read_value() == esperado
+
+        with open(caminho, "r", encoding="utf-8") as f:
+            leitor = utilidades._JsonStreamReader(f, chunk_size=tamanho)
+            lido = {}
+            for chave in leitor.iter_object_keys():
+                if chave == "actions":
+                    leitor.skip_value()
+                elif leitor._peek() == "[":
+                    lido[chave] = list(leitor.iter_array())
+                else:
+                    lido[chave] = leitor.read_value()
+        assert lido == {chave: valor for chave, valor in esperado.items() if chave != "actions"}
+
+
+def test_leitura_em_streaming_mantem_so_os_campos_usados(tmp_path, monkeypatch):
+    caminho = tmp_path / "export.json"
+    caminho.write_text(json.dumps(DOCUMENTO), encoding="utf-8")
+    # Blocos de 3 caracteres: as chaves descartadas e os valores mantidos cruzam as bordas dos blocos
+    original = utilidades._JsonStreamReader.__init__
+    monkeypatch.setattr(utilidades._JsonStreamReader, "__init__", lambda self, file: original(self, file, 3))
+
+    with open(caminho, "r", encoding="utf-8") as f:
+        lido = TrelloDataFrameBuilder._stream_data(f)
+
+    campos = utilidades.STREAM_FIELDS
+    assert lido == {
+        "id": DOCUMENTO["id"],
+        "name": DOCUMENTO["name"],
+        "lists": [{campo: lista[campo] for campo in campos["lists"] if campo in lista} for lista in DOCUMENTO["lists"]],
+        "cards": [{campo: card[campo] for campo in campos["cards"] if campo in card}
+                  for card in DOCUMENTO["cards"] if not card["closed"]],
+    }
+
+
+def test_schema_compacto_mantem_os_valores():
+    df = TrelloDataFrameBuilder(data=copy.deepcopy(QUADRO)).build_master_dataframe()
+
+    compacto = utilidades.compactar_df_mestre(df)
+
+    assert compacto['ID_Tarefa'].dtype == 'category' and compacto['Is_Rotina'].dtype == bool
+    pd.testing.assert_frame_equal(compacto.astype(df.dtypes.to_dict()), df)
+
+
+def test_indice_de_etiquetas_igual_nos_dois_modos(export):
+    indices = {}
+    for modo in ("rows", "columnar"):
+        construtor = TrelloDataFrameBuilder(export)
+        df = construtor.build_master_dataframe(modo)
+        indices[modo] = indice = construtor.label_index
+        # A rotina sai do índice nos dois modos
+        rotina = pd.Series(indice.rotina(), index=indice.ids_tarefa)
+        assert df['Is_Rotina'].tolist() == rotina.reindex(df['ID_Tarefa'].astype(object)).tolist()
+
+    assert indices["rows"].nomes == indices["columnar"].nomes
+    pd.testing.assert_index_equal(indices["rows"].ids_tarefa, indices["columnar"].ids_tarefa)
+    np.testing.assert_array_equal(indices["rows"].bits, indices["columnar"].bits)
+
+
+def _quadro_com_virgulas():
+    # "Cliente, urgente" é uma etiqueta só; "urgente" é outra
+    quadro = copy.deepcopy(QUADRO)
+    quadro["labels"][1]["name"] = "Cliente, urgente"
+    quadro["labels"].append({"id": "6594075e0000000000000003", "name": "urgente", "color": "red"})
+    rotina, cliente, urgente = (etiqueta["id"] for etiqueta in quadro["labels"])
+    for card, etiquetas in zip(quadro["cards"], ([rotina, cliente], [cliente], [urgente])):
+        card["idLabels"] = etiquetas
+    return quadro
+
+
+@pytest.mark.parametrize("modo", ["rows", "columnar"])
+def test_mascara_de_etiquetas_com_virgula_no_nome(modo):
+    construtor = TrelloDataFrameBuilder(data=_quadro_com_virgulas())
+    construtor.build_master_dataframe(modo)
+    indice = construtor.label_index
+    ids = [card["id"] for card in QUADRO["cards"]]
+
+    def cards(etiquetas, modo_etiquetas):
+        return [i for i, marcado in zip(ids, indice.mascara(etiquetas, modo_etiquetas)) if marcado]
+
+    assert indice.nomes == ["Cliente, urgente", "Rotina", "urgente"]
+    assert cards(["urgente"], "any") == ids[2:]
+    assert cards(["Cliente, urgente"], "any") == ids[:2]
+    assert cards(["Rotina", "urgente"], "any") == [ids[0], ids[2]]
+    assert cards(["Rotina", "Cliente, urgente"], "all") == ids[:1]
+    assert cards(["Cliente, urgente", "urgente"], "all") == []
+    assert cards(["Cliente"], "any") == cards(["Rotina", "Cliente"], "all") == []
+    # Linhas do DataFrame (uma por card × membro) e cards fora do índice
+    linhas = pd.Series([ids[1], ids[1], ids[2], "outro"])
+    assert indice.mascara_linhas(linhas, ["urgente"]).tolist() == [False, False, True, False]
+
+    # A tabela longa gravada no snapshot reconstrói o mesmo índice
+    tabela = indice.tabela()
+    assert tabela['Etiqueta'].tolist() == ["Cliente, urgente", "Rotina", "Cliente, urgente", "urgente"]
+    refeito = utilidades.IndiceEtiquetas.from_tabela(tabela)
+    assert refeito.nomes == indice.nomes and refeito.ids_tarefa.tolist() == ids
+    np.testing.assert_array_equal(refeito.bits, indice.bits)
+
+
+def test_filtro_de_etiquetas_do_dashboard_usa_os_ids_das_etiquetas(tmp_path, monkeypatch):
+    export = tmp_path / "trello.json"
+    export.write_text(json.dumps(_quadro_com_virgulas(), ensure_ascii=False), encoding="utf-8")
+    versao = utilidades.hash_arquivo(str(export))
+    etiquetas = str(tmp_path / "trello_etiquetas.arrow")
+    monkeypatch.setattr(utilidades, "TRELLO_JSON_PATH", str(export))
+    monkeypatch.setattr(utilidades, "ETIQUETAS_SNAPSHOT_PATH", etiquetas)
+    monkeypatch.setattr(utilidades, "_METRICAS_CACHE", utilidades.DerivedMetricsCache())
+    df = TrelloDataFrameBuilder(str(export)).build_master_dataframe()
+    dados = {'df_trello': df, 'versao': versao}
+
+    # Sem snapshot de etiquetas, o índice vem do export
+    assert utilidades.obter_indice_etiquetas(dados).nomes == ["Cliente, urgente", "Rotina", "urgente"]
+    tarefas = utilidades.consultar_tarefas(dados, ['ID_Tarefa'], etiquetas=("urgente",))
+    assert tarefas['ID_Tarefa'].tolist() == [QUADRO["cards"][2]["id"]]
+
+    # Com o snapshot gravado pela sincronização, o export não é relido
+    indice = utilidades.construir_indice_etiquetas(str(export))
+    utilidades.salvar_snapshot_colunar(indice.tabela(), etiquetas, versao)
+    monkeypatch.setattr(utilidades, "_METRICAS_CACHE", utilidades.DerivedMetricsCache())
+    monkeypatch.setattr(utilidades, "construir_indice_etiquetas", lambda *args: pytest.fail("o export não deve ser lido"))
+    tarefas = utilidades.consultar_tarefas(dados, ['ID_Tarefa'], etiquetas=("Cliente, urgente",), modo_etiquetas="all")
+    assert tarefas['ID_Tarefa'].unique().tolist() == [card["id"] for card in QUADRO["cards"][:2]]
+
+
+@pytest.mark.parametrize("intervalo", [0, 0.05])
+def test_cache_do_processo_acompanha_o_export(tmp_path, intervalo):
+    caminho = tmp_path / "trello.json"
+    caminho.write_text("1", encoding="utf-8")
+    cache = utilidades.DatasetCache(poll_interval=intervalo)
+
+    def carregar(path, versao):
+        return pd.DataFrame({'valor': [int(open(path).read())]})
+
+    versao, df = cache.current(str(caminho), carregar)
+    assert df['valor'].tolist() == [1]
+    caminho.write_text("22", encoding="utf-8")
+
+    # Com o observador, a versão nova é publicada em segundo plano; sem ele, cada chamada confere o arquivo
+    for _ in range(100):
+        nova, df = cache.current(str(caminho), carregar)
+        if nova != versao:
+            break
+        time.sleep(0.02)
+    assert nova == utilidades.hash_arquivo(str(caminho)) and df['valor'].tolist() == [22]
+    assert bool(cache._watchers) == (intervalo > 0)
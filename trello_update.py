@@ -1,51 +1,429 @@
 #!/usr/bin/env python3
 import os
-import requests
 import json
 from pathlib import Path
 import subprocess
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from cliente_trello import TrelloClient
+from historico import HISTORICO_DIR, HistoricoSnapshots
+from pacote_relatorio import RELATORIO_DIR, gerar_relatorio, relatorio_atualizado, salvar_relatorio
+from utilidades import (
+    CAMPOS_SNAPSHOT_PATH, ETIQUETAS_SNAPSHOT_PATH, MOVIMENTOS_PATH, SNAPSHOT_PATH, TrelloDataFrameBuilder,
+    carregar_indice_etiquetas, construir_campos_personalizados, construir_df_mestre, construir_indice_etiquetas,
+    hash_arquivo, hash_forma_canonica, ler_snapshot_colunar, resumo_mudancas, salvar_snapshot_colunar,
+)
 
 # Variáveis via env (serão providas pelo GitHub Actions como secrets)
 TRELLO_KEY = os.environ.get("TRELLO_KEY")
 TRELLO_TOKEN = os.environ.get("TRELLO_TOKEN")
 BOARD_ID = os.environ.get("BOARD_ID")
+# Lista de quadros separada por vírgulas (um por squad); BOARD_ID continua aceito para um único quadro
+BOARD_IDS = [b.strip() for b in (os.environ.get("BOARD_IDS") or BOARD_ID or "").split(",") if b.strip()]
 GITHUB_BRANCH = os.environ.get("GITHUB_BRANCH", "main")
 
-if not (TRELLO_KEY and TRELLO_TOKEN and BOARD_ID):
-    raise SystemExit("ERRO: faltam variáveis de ambiente (TRELLO_KEY, TRELLO_TOKEN, BOARD_ID)")
+# URL base da API (pode apontar para um servidor local que reproduz respostas gravadas)
+TRELLO_API_URL = os.environ.get("TRELLO_API_URL", "https://api.trello.com/1").rstrip("/")
+
+# Modo de sincronização: "auto" (incremental com resync completo periódico), "full" ou "incremental"
+SYNC_MODE = os.environ.get("SYNC_MODE", "auto")
+# Intervalo máximo entre duas sincronizações completas (rede de segurança do modo incremental)
+FULL_SYNC_INTERVAL_HOURS = int(os.environ.get("FULL_SYNC_INTERVAL_HOURS", "24"))
+# Acima deste número de cards alterados, baixar o quadro inteiro é mais barato
+MAX_INCREMENTAL_CARDS = 200
+ACTIONS_PAGE_SIZE = 1000
+# Número máximo de quadros baixados em paralelo
+MAX_WORKERS = int(os.environ.get("SYNC_MAX_WORKERS", "4"))
+# Ações que levam um card a uma lista: dão as datas reais de entrada em cada status
+MOVE_ACTION_FILTER = "createCard,updateCard:idList"
+# Abaixo deste intervalo o histórico de movimentações é buscado numa única janela
+MIN_MOVE_WINDOW_DAYS = 7
 
 REPO_DIR = Path('.').resolve()
 JSON_FILE = REPO_DIR / "trello.json"
+SNAPSHOT_FILE = REPO_DIR / SNAPSHOT_PATH
+FIELDS_SNAPSHOT_FILE = REPO_DIR / CAMPOS_SNAPSHOT_PATH
+LABELS_SNAPSHOT_FILE = REPO_DIR / ETIQUETAS_SNAPSHOT_PATH
+STATE_FILE = REPO_DIR / "trello_sync_state.json"
+MOVES_FILE = REPO_DIR / MOVIMENTOS_PATH
+REPORT_DIR = REPO_DIR / RELATORIO_DIR
+HISTORY_DIR = REPO_DIR / HISTORICO_DIR
+
+# Cliente compartilhado entre as threads: sessão keep-alive, limite de taxa e novas tentativas.
+# Criado na primeira requisição (ver `get_client`); os testes podem trocá-lo por um apontado para
+# um servidor local
+CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client():
+    global CLIENT
+    with _CLIENT_LOCK:
+        if CLIENT is None:
+            CLIENT = TrelloClient(TRELLO_KEY, TRELLO_TOKEN, base_url=TRELLO_API_URL, pool_size=MAX_WORKERS)
+        return CLIENT
+
+def check_env():
+    if not (TRELLO_KEY and TRELLO_TOKEN and BOARD_IDS):
+        raise SystemExit("ERRO: faltam variáveis de ambiente (TRELLO_KEY, TRELLO_TOKEN, BOARD_ID ou BOARD_IDS)")
+    if SYNC_MODE not in ("auto", "full", "incremental"):
+        raise SystemExit(f"ERRO: SYNC_MODE inválido: {SYNC_MODE!r} (use auto, full ou incremental)")
 
-def get_board():
-    url = f"https://api.trello.com/1/boards/{BOARD_ID}"
+def trello_get(path, params=None, allow_404=False):
+    return get_client().get(path, params, allow_404=allow_404)
+
+def get_board(board_id, include_cards=True):
     params = {
-        "key": TRELLO_KEY,
-        "token": TRELLO_TOKEN,
         "lists": "all",
-        "cards": "all",
+        "cards": "all" if include_cards else "none",
         "card_fields": "all",
         "fields": "all",
         "members": "all",
         "labels": "all",       # <-- add this
-        "label_fields": "all"  # <-- optional, ensures full label details
+        "label_fields": "all",  # <-- optional, ensures full label details
+        # Definições dos campos personalizados e os valores de cada card (só vêm quando pedidos)
+        "customFields": "true",
+        "card_customFieldItems": "true",
+    }
+    return trello_get(f"/boards/{board_id}", params)
+
+def get_card(card_id):
+    # None se o card foi excluído
+    return trello_get(f"/cards/{card_id}", {"fields": "all", "customFieldItems": "true"}, allow_404=True)
+
+def get_actions(board_id, since=None, limit=ACTIONS_PAGE_SIZE):
+    # Ações do quadro, da mais recente para a mais antiga, paginadas com `before`
+    actions = []
+    params = {"limit": limit}
+    if since:
+        params["since"] = since
+    while True:
+        page = trello_get(f"/boards/{board_id}/actions", params)
+        actions.extend(page)
+        if len(page) < limit or not since:
+            return actions
+        params["before"] = page[-1]["id"]
+
+def id_timestamp(object_id):
+    # Os 8 primeiros caracteres de um ID do Trello são o momento da criação, em segundos (hexadecimal)
+    return int(object_id[:8], 16)
+
+def id_at(timestamp):
+    # ID sintético do momento informado; serve de limite para `since`/`before`
+    return f"{int(timestamp):08x}" + "0" * 16
+
+def get_move_actions(board_id, since=None, before=None, limit=ACTIONS_PAGE_SIZE):
+    # Movimentações numa janela (since, before), da mais recente para a mais antiga, paginadas com `before`
+    actions = []
+    params = {"limit": limit, "filter": MOVE_ACTION_FILTER}
+    if since:
+        params["since"] = since
+    while True:
+        if before:
+            params["before"] = before
+        page = trello_get(f"/boards/{board_id}/actions", params)
+        actions.extend(page)
+        if len(page) < limit:
+            return actions
+        before = page[-1]["id"]
+
+def move_windows(start, end):
+    # Divide (start, end) em até MAX_WORKERS janelas de pelo menos MIN_MOVE_WINDOW_DAYS dias
+    span = max(0, end - start)
+    count = max(1, min(MAX_WORKERS, span // (MIN_MOVE_WINDOW_DAYS * 86400)))
+    bounds = [start + span * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def fetch_moves(board_id, since=None, executor=None):
+    """
+    Busca as movimentações de cards desde a ação `since` (ou desde a criação do quadro), com as
+    janelas de tempo consultadas em paralelo no `executor` (em sequência, sem ele). Retorna as linhas
+    (ID_Acao, ID_Tarefa, ID_Lista, Data) e o ID da movimentação mais recente.
+    """
+    try:
+        start = id_timestamp(since or board_id)
+    except ValueError:
+        # Quadro informado pelo link curto: o ID não carrega a data de criação
+        start = 0
+    windows = move_windows(start, int(time.time()) + 1)
+    limits = [(since if pos == 0 and since else id_at(start), id_at(end)) for pos, (start, end) in enumerate(windows)]
+    # A última janela fica aberta, para não perder ações feitas durante a busca
+    limits[-1] = (limits[-1][0], None)
+    fetch = lambda limit: get_move_actions(board_id, *limit)
+    pages = list(executor.map(fetch, limits)) if executor is not None else [fetch(limit) for limit in limits]
+
+    rows = {}
+    for action in (action for page in pages for action in page):
+        data = action.get("data", {})
+        card = data.get("card")
+        lista = data.get("listAfter") or data.get("list")
+        if card and lista:
+            rows[action["id"]] = (action["id"], card["id"], lista["id"], action["date"])
+    latest = max(rows, default=since)
+    print(f"[{board_id}] Movimentações: {len(rows)} novas em {len(limits)} janelas.")
+    return list(rows.values()), latest
+
+def load_state():
+    if not STATE_FILE.exists():
+        return {}
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json_atomic(path, data, publish=True, **dump_kwargs):
+    # Grava num temporário ao lado do destino; os.replace troca o arquivo de uma vez,
+    # então quem lê nunca encontra um JSON pela metade
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    if publish:
+        os.replace(tmp, path)
+    return tmp
+
+def save_state(state):
+    write_json_atomic(STATE_FILE, state, indent=2, sort_keys=True)
+
+def load_local_board():
+    if not JSON_FILE.exists():
+        return None
+    with open(JSON_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def full_sync(board_id):
+    # A marca d'água é lida antes do download para não perder ações feitas durante ele
+    latest = get_actions(board_id, limit=1)
+    board = get_board(board_id)
+    board_state = {
+        "last_action_id": latest[0]["id"] if latest else None,
+        "last_full_sync": datetime.utcnow().isoformat() + "Z",
     }
-    r = requests.get(url, params=params)
-    if r.status_code != 200:
-        print(f"Erro ao baixar do Trello: {r.status_code} -> {r.text}")
-        r.raise_for_status()
-    return r.json()
+    print(f"[{board_id}] Sincronização completa: {len(board.get('cards', []))} cards.")
+    return board, board_state
 
+def incremental_sync(board_id, board, board_state):
+    """
+    Aplica ao snapshot local as ações registradas desde a última execução.
+    Retorna None quando o volume de mudanças torna a sincronização completa mais barata.
+    """
+    actions = get_actions(board_id, since=board_state["last_action_id"])
+    if not actions:
+        print(f"[{board_id}] Sincronização incremental: nenhuma ação nova.")
+        return board, board_state
 
+    changed_cards = []
+    deleted_cards = set()
+    structure_changed = False
+    for action in actions:
+        card = action.get("data", {}).get("card")
+        if not card:
+            # Listas, membros, etiquetas ou o próprio quadro mudaram
+            structure_changed = True
+        elif action.get("type") == "deleteCard":
+            deleted_cards.add(card["id"])
+        elif card["id"] not in changed_cards:
+            changed_cards.append(card["id"])
+
+    if len(changed_cards) > MAX_INCREMENTAL_CARDS:
+        print(f"[{board_id}] {len(changed_cards)} cards alterados; usando sincronização completa.")
+        return None
+
+    if structure_changed:
+        structure = get_board(board_id, include_cards=False)
+        structure["cards"] = board.get("cards", [])
+        board = structure
+
+    card_index = {card["id"]: pos for pos, card in enumerate(board.get("cards", []))}
+    for card_id in changed_cards:
+        if card_id in deleted_cards:
+            continue
+        card = get_card(card_id)
+        if card is None or card.get("idBoard") != board_id:
+            # Excluído ou movido para outro quadro
+            deleted_cards.add(card_id)
+        elif card_id in card_index:
+            board["cards"][card_index[card_id]] = card
+        else:
+            card_index[card_id] = len(board["cards"])
+            board["cards"].append(card)
+
+    if deleted_cards:
+        board["cards"] = [card for card in board["cards"] if card["id"] not in deleted_cards]
+
+    print(f"[{board_id}] Sincronização incremental: {len(actions)} ações, {len(changed_cards)} cards atualizados, "
+          f"{len(deleted_cards)} removidos{', estrutura atualizada' if structure_changed else ''}.")
+    return board, {**board_state, "last_action_id": actions[0]["id"]}
+
+def needs_full_sync(board_state):
+    if SYNC_MODE == "full" or not board_state.get("last_action_id"):
+        return True
+    if SYNC_MODE == "incremental":
+        return False
+    last_full = datetime.fromisoformat(board_state["last_full_sync"].rstrip("Z"))
+    return datetime.utcnow() - last_full >= timedelta(hours=FULL_SYNC_INTERVAL_HOURS)
+
+def sync_snapshot(board_id, local_board, board_state):
+    board = None if needs_full_sync(board_state) else local_board
+    result = incremental_sync(board_id, board, board_state) if board is not None else None
+    if result is None:
+        result = full_sync(board_id)
+    return result
+
+def split_board(merged, board_id):
+    """Extrai de um snapshot combinado a parte de um quadro (None se ele não estiver no snapshot)."""
+    if merged is None:
+        return None
+    if "boards" not in merged:
+        # Snapshot antigo, de um único quadro
+        return merged if merged.get("id") == board_id else None
+    info = next((b for b in merged["boards"] if b["id"] == board_id), None)
+    if info is None:
+        return None
+    part = {"id": board_id, "name": info["name"]}
+    for key in ("lists", "labels", "customFields", "cards"):
+        part[key] = [item for item in merged.get(key, []) if item.get("idBoard") == board_id]
+    part["members"] = [m for m in merged.get("members", []) if board_id in m.get("idBoards", [])]
+    return part
+
+def merge_boards(boards):
+    """Combina os quadros em um único snapshot, marcando cada item com o quadro de origem."""
+    merged = {
+        "id": ",".join(b["id"] for b in boards),
+        "name": " + ".join(b.get("name", b["id"]) for b in boards),
+        "boards": [{"id": b["id"], "name": b.get("name", b["id"])} for b in boards],
+        "lists": [], "labels": [], "customFields": [], "cards": [], "members": [],
+    }
+    members = {}
+    for board in boards:
+        for key in ("lists", "labels", "customFields", "cards"):
+            for item in board.get(key, []):
+                merged[key].append({**item, "idBoard": board["id"]})
+        for member in board.get("members", []):
+            entry = members.setdefault(member["id"], {**member, "idBoards": []})
+            entry["idBoards"].append(board["id"])
+    merged["members"] = list(members.values())
+    return merged
+
+def sync_boards(state, local):
+    """
+    Sincroniza todos os quadros em paralelo; o tempo total acompanha o quadro mais lento.
+
+    Um único pool atende os quadros e, depois deles, as janelas de movimentações de cada quadro:
+    nunca há mais que MAX_WORKERS requisições simultâneas (o tamanho do pool HTTP do cliente).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS)) as pool:
+        futures = [
+            pool.submit(sync_snapshot, board_id, split_board(local, board_id), state.get(board_id, {}))
+            for board_id in BOARD_IDS
+        ]
+        snapshots = [future.result() for future in futures]
+        results = []
+        for board_id, (board, board_state) in zip(BOARD_IDS, snapshots):
+            # As movimentações só crescem: mesmo após uma sincronização completa, basta buscar as novas
+            moves, last_move_id = fetch_moves(board_id, since=state.get(board_id, {}).get("last_move_id"),
+                                              executor=pool)
+            results.append((board, {**board_state, "last_move_id": last_move_id}, moves))
+    boards = [board for board, _, _ in results]
+    new_state = {**state, **{board_id: board_state for board_id, (_, board_state, _) in zip(BOARD_IDS, results)}}
+    moves = [row for _, _, board_moves in results for row in board_moves]
+    return merge_boards(boards), new_state, moves
+
+def describe_changes(previous, board):
+    """
+    Compara as formas canônicas (apenas campos usados pelo dashboard) do snapshot anterior e do novo.
+    Retorna None quando nada relevante mudou, ou a lista de mudanças por card.
+    """
+    current = TrelloDataFrameBuilder(data=board).canonical_form()
+    if previous is None:
+        return [f"Snapshot inicial: {len(current['cards'])} cards."]
+    before = TrelloDataFrameBuilder(data=previous).canonical_form()
+    if hash_forma_canonica(before) == hash_forma_canonica(current):
+        return None
+    return resumo_mudancas(before, current)
 
 def save_json(board_json):
-    with open(JSON_FILE, "w", encoding="utf-8") as f:
-        json.dump(board_json, f, ensure_ascii=False, indent=2)
+    # O snapshot colunar é publicado antes do JSON: quando o dashboard percebe o JSON novo,
+    # o snapshot correspondente já está no lugar e a recarga não precisa ler o JSON
+    tmp = write_json_atomic(JSON_FILE, board_json, publish=False, indent=2)
+    save_snapshot(tmp)
+    os.replace(tmp, JSON_FILE)
     print(f"Saved {JSON_FILE}")
 
-def git_commit_and_push():
-    status = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True)
+def save_moves(moves):
+    # Acrescenta as movimentações novas às já gravadas (sem duplicar ações) e troca o arquivo de uma vez
+    import pyarrow.parquet as pq
+    new = pd.DataFrame(moves, columns=["ID_Acao", "ID_Tarefa", "ID_Lista", "Data"])
+    new["Data"] = pd.to_datetime(new["Data"], utc=True)
+    if MOVES_FILE.exists():
+        new = pd.concat([pq.read_table(MOVES_FILE).to_pandas(), new], ignore_index=True)
+    new = new.drop_duplicates("ID_Acao", keep="last").sort_values(["ID_Tarefa", "Data"], ignore_index=True)
+    new = new.astype({"ID_Acao": "string", "ID_Tarefa": "string", "ID_Lista": "string"})
+    tmp = MOVES_FILE.with_name(f".{MOVES_FILE.name}.tmp")
+    new.to_parquet(tmp, index=False)
+    os.replace(tmp, MOVES_FILE)
+    print(f"Saved {MOVES_FILE} ({len(new)} movimentações)")
+
+def save_snapshot(json_path=JSON_FILE):
+    # Snapshot colunar do DataFrame mestre, aberto diretamente pelo dashboard
+    df = construir_df_mestre(str(json_path))
+    source_hash = hash_arquivo(str(json_path))
+    salvar_snapshot_colunar(df, str(SNAPSHOT_FILE), source_hash)
+    print(f"Saved {SNAPSHOT_FILE}")
+    # Campos personalizados tipados, uma linha por card
+    fields = construir_campos_personalizados(str(json_path)).reset_index()
+    salvar_snapshot_colunar(fields, str(FIELDS_SNAPSHOT_FILE), source_hash)
+    print(f"Saved {FIELDS_SNAPSHOT_FILE}")
+    # Etiquetas de cada card pelos idLabels (nomes com vírgula continuam inteiros no filtro)
+    labels = construir_indice_etiquetas(str(json_path))
+    salvar_snapshot_colunar(labels.tabela(), str(LABELS_SNAPSHOT_FILE), source_hash)
+    print(f"Saved {LABELS_SNAPSHOT_FILE}")
+    # Histórico só de acréscimo: apenas os cards que mudaram desde a última execução
+    delta = HistoricoSnapshots(str(HISTORY_DIR)).registrar(df)
+    if delta:
+        print(f"Saved {delta}")
+    # Relatório da página de Performance com os filtros no padrão, servido sem recalcular
+    # (depois do histórico: a evolução semanal já inclui este snapshot)
+    save_report(df, source_hash, labels)
+
+def save_report(df, source_hash, labels=None):
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").normalize()
+    dados = {"df_trello": df, "versao": source_hash, "indice_etiquetas": labels}
+    path = salvar_relatorio(gerar_relatorio(dados, hoje), source_hash, hoje, str(REPORT_DIR))
+    print(f"Saved {path}")
+
+def refresh_report():
+    """
+    Recalcula o relatório do snapshot atual se o gravado não for de hoje (as colunas derivadas
+    dependem da data). Retorna True se o relatório foi regravado.
+    """
+    if not JSON_FILE.exists():
+        return False
+    source_hash = hash_arquivo(str(JSON_FILE))
+    if relatorio_atualizado(source_hash, diretorio=str(REPORT_DIR)):
+        return False
+    # O snapshot colunar evita reler o JSON; sem ele (ou desatualizado), o DataFrame é reconstruído
+    df = ler_snapshot_colunar(str(SNAPSHOT_FILE), source_hash)
+    labels = carregar_indice_etiquetas(str(JSON_FILE), source_hash, str(LABELS_SNAPSHOT_FILE))
+    save_report(df if df is not None else construir_df_mestre(str(JSON_FILE)), source_hash, labels)
+    return True
+
+def snapshot_paths():
+    paths = [str(JSON_FILE), str(SNAPSHOT_FILE), str(FIELDS_SNAPSHOT_FILE), str(LABELS_SNAPSHOT_FILE), str(STATE_FILE)]
+    if MOVES_FILE.exists():
+        paths.append(str(MOVES_FILE))
+    if HISTORY_DIR.exists():
+        paths.append(str(HISTORY_DIR))
+    if REPORT_DIR.exists():
+        paths.append(str(REPORT_DIR))
+    return paths
+
+def git_commit_and_push(paths=None, title="Atualização Trello"):
+    paths = paths or snapshot_paths()
+    status = subprocess.run(["git", "status", "--porcelain", "--", *paths], capture_output=True, text=True)
     if not status.stdout.strip():
         print("Nenhuma mudança para commitar.")
         return
@@ -54,15 +432,43 @@ def git_commit_and_push():
     subprocess.run(["git", "config", "user.name", "github-actions[bot]"], check=True)
     subprocess.run(["git", "config", "user.email", "41898282+github-actions[bot]@users.noreply.github.com"], check=True)
 
-    subprocess.run(["git", "add", str(JSON_FILE)], check=True)
-    commit_msg = f"Atualização Trello {datetime.utcnow().isoformat()}Z"
+    subprocess.run(["git", "add", *paths], check=True)
+    commit_msg = f"{title} {datetime.utcnow().isoformat()}Z"
     subprocess.run(["git", "commit", "-m", commit_msg], check=True)
     subprocess.run(["git", "push", "origin", GITHUB_BRANCH], check=True)
     print("Push concluído.")
 
 def main():
-    board = get_board()
+    check_env()
+    previous = load_local_board()
+    board, state, moves = sync_boards(load_state(), previous)
+    print(f"API do Trello: {get_client().report()}")
+
+    # Sem mudanças nos campos usados pelo dashboard: o snapshot não é regravado nem publicado
+    changes = describe_changes(previous, board)
+    if changes is None and moves:
+        # Movimentações novas mudam as datas reais de início e conclusão
+        changes = [f"{len(moves)} movimentações novas."]
+    if changes is None:
+        print("Nenhuma mudança relevante no quadro; snapshot mantido.")
+        # As marcas d'água avançam mesmo assim: sem elas, a próxima execução reprocessaria as mesmas
+        # ações e, passado o intervalo, cairia numa sincronização completa
+        save_state(state)
+        paths = [str(STATE_FILE)]
+        # O relatório pré-calculado vale para um dia: num dia sem mudanças, é recalculado do snapshot atual
+        if refresh_report():
+            paths.append(str(REPORT_DIR))
+        git_commit_and_push(paths, "Estado da sincronização Trello")
+        return
+    print(f"{len(changes)} mudanças:")
+    for line in changes[:50]:
+        print(f"  {line}")
+    if len(changes) > 50:
+        print(f"  ... e mais {len(changes) - 50}.")
+    # As movimentações vêm antes do JSON: o snapshot gerado em save_json já usa as datas reais
+    save_moves(moves)
     save_json(board)
+    save_state(state)
     git_commit_and_push()
 
 if __name__ == "__main__":
@@ -1,234 +1,2046 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import streamlit as st
+import pyarrow as pa
 from datetime import datetime
 
 import json
+import math
+import re
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
 
-def leitura_dados():
-    if not 'dados' in st.session_state:
+from alocacao import HORIZONTE_PADRAO_DIAS, matriz_carga
+from diagnostico import cronometrado
+
+
+# --- CONFIGURAÇÃO DO LOGGING ---
+# Configura o logger para exibir mensagens informativas, incluindo data e hora.
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Palavras-chave para identificar as listas de forma flexível (use minúsculas)
+KEYWORDS_TODO = ['fazer', 'to-do', 'backlog']
+KEYWORDS_DOING = ['fazendo', 'doing', 'em andamento', 'in progress']
+KEYWORDS_DONE = ['concluído', 'done', 'feito']
+
+# Nome exato do campo customizado e valor padrão
+CUSTOM_FIELD_NAME = 'Tempo de execução em minutos'
+DEFAULT_EXECUTION_TIME_MIN = 30
+
+# Tipo da coluna gerada para cada tipo de campo personalizado do Trello e a chave do valor no item
+CUSTOM_FIELD_DTYPES = {
+    "number": "Float64", "date": "datetime64[us, America/Sao_Paulo]", "checkbox": "boolean",
+    "text": "string", "list": "category",
+}
+CUSTOM_FIELD_VALUE_KEYS = {"number": "number", "date": "date", "checkbox": "checked", "text": "text"}
+
+# Caminho do export do Trello lido pelo dashboard
+TRELLO_JSON_PATH = "trello.json"
+# Intervalo (s) com que o dashboard verifica se o export mudou; 0 desliga o observador (cada rerun confere o arquivo)
+INTERVALO_OBSERVADOR_S = float(os.environ.get("TRELLO_OBSERVAR_INTERVALO", "5"))
+
+# Snapshot colunar (Arrow IPC) do DataFrame mestre, gerado pelo trello_update.py
+SNAPSHOT_PATH = "trello.arrow"
+# Snapshot da tabela de campos personalizados (uma linha por card), gerado junto com o anterior
+CAMPOS_SNAPSHOT_PATH = "trello_campos.arrow"
+# Snapshot das etiquetas de cada card (uma linha por card × etiqueta), gerado junto com os anteriores
+ETIQUETAS_SNAPSHOT_PATH = "trello_etiquetas.arrow"
+# Incrementar sempre que o schema do DataFrame mestre mudar, invalidando snapshots antigos
+SNAPSHOT_SCHEMA_VERSION = "4"
+
+# Movimentações de cards entre listas (ações `updateCard:idList`), gravadas pelo trello_update.py
+# ao lado do export; dão as datas reais de início e conclusão
+MOVIMENTOS_PATH = "trello_movimentos.parquet"
+
+# Diretório (de preferência em /dev/shm) onde o processo carregador publica o DataFrame para
+# várias réplicas do Streamlit no mesmo host; vazio, cada processo carrega a sua cópia (ver compartilhado.py)
+DIRETORIO_COMPARTILHADO = os.environ.get("TRELLO_COMPARTILHADO", "")
+
+# A partir deste número de cards o modo "auto" usa a construção colunar
+COLUMNAR_MIN_CARDS = 2000
+
+# Campos do export que o construtor realmente usa; o restante é descartado na leitura em streaming
+STREAM_FIELDS = {
+    "boards": ("id", "name"),
+    "lists": ("id", "name", "idBoard"),
+    "labels": ("id", "name", "idBoard"),
+    "members": ("id", "fullName"),
+    "customFields": ("id", "name", "type", "options"),
+    "cards": ("id", "idBoard", "name", "idList", "closed", "idLabels", "idMembers", "due", "dateLastActivity", "customFieldItems"),
+}
+STREAM_SCALARS = ("id", "name")
+
+# --- Definição do Schema e Tipos de Dados ---
+MASTER_SCHEMA = {
+    "Board": "category", "ID_Tarefa": "string", "Tarefa": "string", "ID_Membro": "string", "Membro": "string",
+    "ID_Lista": "string", "Status": "category", "Etiquetas": "string",
+    "Is_Rotina": "boolean", "Tempo_Estimado_Min": "Int64",
+    "Lead_Time_Dias": "float64", "Cycle_Time_Dias": "float64"
+}
+
+MASTER_COLUMNS = [
+    'Board', 'ID_Tarefa', 'Tarefa', 'ID_Membro', 'Membro', 'ID_Lista', 'Status',
+    'Data_Entrega', 'Data_Conclusao', 'Etiquetas', 'Is_Rotina', 'Tempo_Estimado_Min',
+    'Data_Criacao', 'Data_Inicio', 'Lead_Time_Dias', 'Cycle_Time_Dias'
+]
+
+# Colunas de data, convertidas para o fuso de São Paulo
+DATE_COLUMNS = ['Data_Entrega', 'Data_Conclusao', 'Data_Criacao', 'Data_Inicio']
+
+# Tabelas intermediárias da construção colunar: uma linha por card e uma por atribuição (card, membro)
+CARD_COLUMNS = [coluna for coluna in MASTER_COLUMNS if coluna not in ('ID_Membro', 'Membro')]
+ASSIGNMENT_COLUMNS = ['ID_Tarefa', 'ID_Membro', 'Membro']
+
+# Schema compacto opcional (TRELLO_SCHEMA_COMPACTO=1): como cada card se repete uma vez por membro,
+# IDs, títulos e etiquetas viram categorias (códigos inteiros + tabela de valores únicos em Arrow)
+SCHEMA_COMPACTO = os.environ.get("TRELLO_SCHEMA_COMPACTO", "") not in ("", "0")
+COMPACT_SCHEMA = {
+    "ID_Tarefa": "category", "Tarefa": "category", "ID_Membro": "category", "Membro": "category",
+    "ID_Lista": "category", "Etiquetas": "category", "Is_Rotina": "bool", "Tempo_Estimado_Min": "Int32"
+}
+
+
+class _JsonStreamReader:
+    """
+    Leitor incremental de JSON: percorre objetos e arrays item a item, decodificando
+    apenas um valor de cada vez a partir de um buffer lido em blocos do arquivo.
+    """
+
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, file, chunk_size: int = 1 << 20):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """Descarta o trecho já consumido e acrescenta até `size` caracteres ao buffer."""
+        if self._eof:
+            return False
+        chunk = self._file.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Pula espaços em branco e retorna o próximo caractere ('' no fim do arquivo)."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._chunk_size):
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Esperado {char!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def read_value(self) -> Any:
+        """Decodifica o próximo valor completo, lendo mais blocos enquanto ele estiver truncado."""
+        self._peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # Um número no fim do buffer pode estar truncado: só aceita com um caractere depois
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def iter_array(self):
+        """Itera sobre os itens do array na posição atual."""
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise json.JSONDecodeError("Esperado ',' ou ']'", self._buf, self._pos - 1)
+
+    def iter_object_keys(self):
+        """Itera sobre as chaves do objeto na posição atual; o chamador deve consumir cada valor."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise json.JSONDecodeError("Esperado ',' ou '}'", self._buf, self._pos - 1)
+
+    def skip_value(self):
+        """Consome o próximo valor sem mantê-lo em memória além de um item por vez."""
+        char = self._peek()
+        if char == "[":
+            for _ in self.iter_array():
+                pass
+        elif char == "{":
+            for _ in self.iter_object_keys():
+                self.skip_value()
+        else:
+            self.read_value()
+
+
+class IndiceEtiquetas:
+    """
+    Matriz card × etiqueta em bits (uma linha de bytes por card, um bit por nome de etiqueta).
+
+    Consultas "qualquer uma" / "todas" das etiquetas viram operações de bits sobre a matriz,
+    sem varrer as strings de `Etiquetas`. Etiquetas de quadros diferentes com o mesmo nome
+    ocupam o mesmo bit.
+
+    Args:
+        ids_tarefa (pd.Index): ID de cada card, na ordem das linhas da matriz.
+        nomes (List[str]): Nome da etiqueta de cada bit.
+        bits (np.ndarray): Matriz `uint8` empacotada (cards × ceil(etiquetas / 8)).
+    """
+
+    def __init__(self, ids_tarefa: pd.Index, nomes: List[str], bits: np.ndarray):
+        self.ids_tarefa = ids_tarefa
+        self.nomes = nomes
+        self.bits = bits
+        self._coluna = {nome: i for i, nome in enumerate(nomes)}
+
+    @classmethod
+    def from_label_lists(cls, ids_tarefa, listas_etiquetas: List[List[str]]) -> "IndiceEtiquetas":
+        """Constrói o índice em uma passada a partir da lista de nomes de etiquetas de cada card."""
+        nomes = sorted({nome for nomes_card in listas_etiquetas for nome in nomes_card if nome})
+        coluna = {nome: i for i, nome in enumerate(nomes)}
+        linhas, colunas = [], []
+        for linha, nomes_card in enumerate(listas_etiquetas):
+            for nome in nomes_card:
+                if nome:
+                    linhas.append(linha)
+                    colunas.append(coluna[nome])
+        matriz = np.zeros((len(listas_etiquetas), len(nomes)), dtype=bool)
+        matriz[linhas, colunas] = True
+        return cls(pd.Index(ids_tarefa), nomes, np.packbits(matriz, axis=1))
+
+    @classmethod
+    def from_tabela(cls, tabela: pd.DataFrame) -> "IndiceEtiquetas":
+        """Reconstrói o índice a partir da tabela longa de `tabela` (ex.: o snapshot de etiquetas)."""
+        codigos, ids_tarefa = pd.factorize(tabela['ID_Tarefa'].astype(object))
+        listas_etiquetas: List[List[str]] = [[] for _ in ids_tarefa]
+        for codigo, nome in zip(codigos, tabela['Etiqueta'].astype(object)):
+            if isinstance(nome, str):
+                listas_etiquetas[codigo].append(nome)
+        return cls.from_label_lists(ids_tarefa, listas_etiquetas)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "IndiceEtiquetas":
+        """
+        Reconstrói o índice a partir da coluna `Etiquetas` de um DataFrame mestre, separando os nomes
+        por ", ". Aproximação para quando não há os `idLabels` dos cards (ex.: versões do histórico):
+        um nome de etiqueta com vírgula vira dois.
+        """
+        cartoes = df.drop_duplicates('ID_Tarefa')
+        etiquetas = cartoes['Etiquetas'].astype(object).fillna("")
+        return cls.from_label_lists(cartoes['ID_Tarefa'].astype(object), [e.split(", ") if e else [] for e in etiquetas])
+
+    def tabela(self) -> pd.DataFrame:
+        """
+        O índice como tabela longa, uma linha por card × etiqueta (`ID_Tarefa`, `Etiqueta`), na ordem dos
+        cards; cards sem etiqueta entram numa linha com `Etiqueta` nula.
+        """
+        matriz = np.unpackbits(self.bits, axis=1, count=len(self.nomes)).astype(bool)
+        linhas, colunas = np.nonzero(matriz)
+        sem_etiqueta = np.flatnonzero(~matriz.any(axis=1))
+        posicoes = np.concatenate([linhas, sem_etiqueta])
+        nomes = np.concatenate([np.array(self.nomes, dtype=object)[colunas], np.full(len(sem_etiqueta), None, dtype=object)])
+        ordem = np.argsort(posicoes, kind='stable')
+        return pd.DataFrame({
+            'ID_Tarefa': pd.array(self.ids_tarefa.take(posicoes[ordem]), dtype="string"),
+            'Etiqueta': pd.array(nomes[ordem], dtype="string"),
+        })
 
-        '''
-        Esta primeirra parte carrega o histórico de atingimento de metas, ele procura na mpasta caminho, a qual deve ser atualizada a cada
-        fechamento de mês, os arquivos que terminam com 'V5 - ajuste das dinamicas.xlsx' ou 'V5 - ajuste das dinamicas.xlsm'. Ajustar para que isto siga sendo assim
+    def _consulta(self, etiquetas) -> np.ndarray:
+        marcadas = np.zeros(len(self.nomes), dtype=bool)
+        marcadas[[self._coluna[nome] for nome in etiquetas if nome in self._coluna]] = True
+        return np.packbits(marcadas)
 
-        '''
+    def mascara(self, etiquetas, modo: str = "any") -> np.ndarray:
+        """
+        Cards que têm qualquer uma (`modo="any"`) ou todas (`modo="all"`) as etiquetas informadas.
 
+        Returns:
+            np.ndarray: Máscara booleana alinhada a `ids_tarefa`.
+        """
+        if modo not in ("any", "all"):
+            raise ValueError(f"Modo de filtro de etiquetas inválido: {modo!r}")
+        consulta = self._consulta(etiquetas)
+        comuns = self.bits & consulta
+        if modo == "any":
+            return comuns.any(axis=1)
+        if any(nome not in self._coluna for nome in etiquetas):
+            return np.zeros(len(self.ids_tarefa), dtype=bool)
+        return (comuns == consulta).all(axis=1)
 
+    def mascara_linhas(self, ids_tarefa: pd.Series, etiquetas, modo: str = "any") -> np.ndarray:
+        """A mesma consulta de `mascara`, projetada para as linhas de um DataFrame (uma por card × membro)."""
+        posicoes = self.ids_tarefa.get_indexer(ids_tarefa)
+        por_card = self.mascara(etiquetas, modo)
+        return np.where(posicoes >= 0, por_card[posicoes], False)
 
-        # --- CONFIGURAÇÃO DO LOGGING ---
-        # Configura o logger para exibir mensagens informativas, incluindo data e hora.
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+    def rotina(self) -> np.ndarray:
+        """Cards com alguma etiqueta cujo nome contém 'rotina'."""
+        return self.mascara([nome for nome in self.nomes if 'rotina' in nome.lower()], "any")
+
+
+class IndiceTarefas:
+    """
+    Ordem das linhas do DataFrame derivado por status e data de entrega.
+
+    Cada status ocupa um bloco contíguo da ordem, com as entregas crescentes dentro dele (sem data
+    no fim do bloco), então "status em S e entrega no período" é resolvido com uma busca binária por
+    status, sem varrer o DataFrame. Membros, quadros e rotina ficam como códigos inteiros e só são
+    testados nas linhas já selecionadas.
+
+    Args:
+        df (pd.DataFrame): O DataFrame derivado (ver `calcular_metricas_derivadas`).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_linhas = len(df)
+        # Código 0 para status ausente, para que ele também tenha o seu bloco
+        codigos, nomes = pd.factorize(df['Status'])
+        codigos = codigos + 1
+        self._status = {nome: i + 1 for i, nome in enumerate(nomes)}
+        entrega = _instantes_ns(df['Data_Entrega'])
+        self.ordem = np.lexsort((entrega, codigos))
+        self.entregas = entrega[self.ordem]
+        self.limites = np.searchsorted(codigos[self.ordem], np.arange(len(nomes) + 2))
+        self.membros, self._membros = pd.factorize(df['Membro'])
+        self.quadros, self._quadros = pd.factorize(df['Board'])
+        self.rotina = df['Is_Rotina'].fillna(False).to_numpy(dtype=bool)
+
+    def linhas(self, status: Optional[Tuple[str, ...]] = None,
+               periodo: Optional[Tuple] = None) -> Optional[np.ndarray]:
+        """
+        Posições (em ordem crescente) das linhas com status em `status` e entrega em `periodo`;
+        None se nenhum dos dois restringe as linhas.
+        """
+        if status is None and periodo is None:
+            return None
+        blocos = range(len(self.limites) - 1) if status is None else sorted(
+            self._status[nome] for nome in set(status) if nome in self._status
         )
-        logger = logging.getLogger(__name__)
-
-        # --- CONSTANTES DE CONFIGURAÇÃO ---
-        # Palavras-chave para identificar as listas de forma flexível (use minúsculas)
-        KEYWORDS_TODO = ['fazer', 'to-do', 'backlog']
-        KEYWORDS_DOING = ['fazendo', 'doing', 'em andamento', 'in progress']
-        KEYWORDS_DONE = ['concluído', 'done', 'feito']
-
-        # Nome exato do campo customizado e valor padrão
-        CUSTOM_FIELD_NAME = 'Tempo de execução em minutos'
-        DEFAULT_EXECUTION_TIME_MIN = 30
-
-        class TrelloDataFrameBuilder:
-            """
-            Classe para carregar, processar e estruturar dados de um export JSON do Trello
-            em um DataFrame do Pandas, pronto para análise.
-            """
-
-            def __init__(self, json_path: str):
-                """
-                Inicializa o construtor do DataFrame.
-
-                Args:
-                    json_path (str): O caminho para o arquivo JSON do Trello.
-                """
-                self.json_path = json_path
-                self.data: Optional[Dict[str, Any]] = None
-                self._id_to_member: Dict[str, Dict] = {}
-                self._id_to_label: Dict[str, str] = {}
-                self._id_to_list: Dict[str, Dict] = {}
-                self._custom_field_id: Optional[str] = None
-
-            def _load_data(self) -> bool:
-                """
-                Método privado para carregar os dados do arquivo JSON.
-
-                Returns:
-                    bool: True se os dados foram carregados com sucesso, False caso contrário.
-                """
-                logger.info(f"Carregando dados de: {self.json_path}")
-                try:
-                    with open(self.json_path, "r", encoding="utf-8") as file:
-                        self.data = json.load(file)
-                    return True
-                except FileNotFoundError:
-                    logger.error(f"Arquivo JSON não encontrado em '{self.json_path}'.")
-                    return False
-                except json.JSONDecodeError:
-                    logger.error(f"O arquivo JSON '{self.json_path}' está malformado ou corrompido.")
-                    return False
-
-            def _map_entities(self):
-                """Método privado para mapear entidades do Trello (membros, etiquetas, listas)."""
-                if not self.data:
-                    logger.warning("Não há dados para mapear. Carregue os dados primeiro.")
-                    return
-
-                self._id_to_member = {m["id"]: {"name": m["fullName"]} for m in self.data.get("members", [])}
-                self._id_to_label = {lbl["id"]: lbl["name"] for lbl in self.data.get("labels", [])}
-
-                for lst in self.data.get("lists", []):
-                    name_lower = lst["name"].lower().strip()
-                    status = None
-                    if any(keyword in name_lower for keyword in KEYWORDS_TODO):
-                        status = "A FAZER"
-                    elif any(keyword in name_lower for keyword in KEYWORDS_DOING):
-                        status = "FAZENDO"
-                    elif any(keyword in name_lower for keyword in KEYWORDS_DONE):
-                        status = "CONCLUÍDO"
-                    
-                    if status:
-                        self._id_to_list[lst["id"]] = {"name": lst["name"], "status": status}
-                
-                self._custom_field_id = next((f["id"] for f in self.data.get("customFields", []) if f.get("name") == CUSTOM_FIELD_NAME), None)
-                
-                logger.info(f"Mapeamento concluído. Listas identificadas: {list(l['status'] for l in self._id_to_list.values())}")
-
-
-            def build_master_dataframe(self) -> pd.DataFrame:
-                """
-                Orquestra o processo de criação do DataFrame mestre.
-
-                Carrega os dados, mapeia as entidades, processa cada card aplicando as regras de
-                negócio e retorna um DataFrame final com o schema definido.
-
-                Returns:
-                    pd.DataFrame: Um DataFrame Pandas estruturado e pronto para análise.
-                """
-                if not self._load_data():
-                    return pd.DataFrame() # Retorna DF vazio se o carregamento falhar
-
-                self._map_entities()
-                
-                logger.info("Iniciando processamento dos cards para construção do DataFrame...")
-                processed_tasks: List[Dict] = []
-                for card in self.data.get("cards", []):
-                    if card.get("closed") or card.get("idList") not in self._id_to_list:
-                        continue
-
-                    list_info = self._id_to_list[card["idList"]]
-                    
-                    label_ids = card.get("idLabels", [])
-                    labels = [self._id_to_label.get(lid, "") for lid in label_ids]
-                    is_routine = any('rotina' in lbl.lower() for lbl in labels)
-
-                    # --- Aplicação das Regras de Negócio ---
-                    execution_time = pd.NA
-                    due_date = pd.to_datetime(card.get("due"), errors='coerce', utc=True)
-                    
-                    if is_routine:
-                        execution_time = DEFAULT_EXECUTION_TIME_MIN
-                        if self._custom_field_id and 'customFieldItems' in card:
-                            for item in card["customFieldItems"]:
-                                if item.get("idCustomField") == self._custom_field_id and 'value' in item:
-                                    time_val = item['value'].get('number')
-                                    if time_val and str(time_val).isdigit():
-                                        execution_time = int(time_val)
-                                    break
-                    elif pd.isna(due_date):
-                        last_activity_date = pd.to_datetime(card.get("dateLastActivity"), errors='coerce', utc=True)
-                        if pd.notna(last_activity_date):
-                            due_date = last_activity_date + timedelta(days=1)
-                    
-                    conclusion_date = pd.to_datetime(card.get("dateLastActivity"), errors='coerce', utc=True) if list_info["status"] == "CONCLUÍDO" else pd.NaT
-
-                    member_ids = card.get("idMembers", [])
-                    if not member_ids:
-                        member_ids.append("UNASSIGNED")
-                        self._id_to_member["UNASSIGNED"] = {"name": "Não Atribuído"}
-
-                    for member_id in member_ids:
-                        member_info = self._id_to_member.get(member_id)
-                        if not member_info: continue
-
-                        processed_tasks.append({
-                            'ID_Tarefa': card.get("id"),
-                            'Tarefa': card.get("name", "Sem Título"),
-                            'ID_Membro': member_id,
-                            'Membro': str(member_info["name"]).strip().split()[0].upper(),
-                            'ID_Lista': card.get("idList"),
-                            'Status': list_info["status"],
-                            'Data_Entrega': due_date,
-                            'Data_Conclusao': conclusion_date,
-                            'Etiquetas': ", ".join(filter(None, labels)),
-                            'Is_Rotina': is_routine,
-                            'Tempo_Estimado_Min': execution_time
-                        })
-
-                if not processed_tasks:
-                    logger.warning("Nenhum card foi processado. Verifique o conteúdo do JSON.")
-                    return pd.DataFrame()
-
-                df = pd.DataFrame(processed_tasks)
-                
-                # --- Definição do Schema e Tipos de Dados ---
-                schema = {
-                    "ID_Tarefa": "string", "Tarefa": "string", "ID_Membro": "string", "Membro": "string",
-                    "ID_Lista": "string", "Status": "category", "Etiquetas": "string",
-                    "Is_Rotina": "boolean", "Tempo_Estimado_Min": "Int64"
-                }
-                df = df.astype(schema)
-                df['Data_Entrega'] = df['Data_Entrega'].dt.tz_convert('America/Sao_Paulo')
-                df['Data_Conclusao'] = df['Data_Conclusao'].dt.tz_convert('America/Sao_Paulo')
-                
-                final_columns_order = [
-                    'ID_Tarefa', 'Tarefa', 'ID_Membro', 'Membro', 'ID_Lista', 'Status',
-                    'Data_Entrega', 'Data_Conclusao', 'Etiquetas', 'Is_Rotina', 'Tempo_Estimado_Min'
+        de, ate = limites_periodo(periodo) if periodo is not None else (None, None)
+        partes = []
+        for bloco in blocos:
+            inicio, fim = self.limites[bloco], self.limites[bloco + 1]
+            if periodo is not None:
+                entregas = self.entregas[inicio:fim]
+                inicio, fim = inicio + np.searchsorted(entregas, de.value), inicio + np.searchsorted(entregas, ate.value)
+            partes.append(self.ordem[inicio:fim])
+        return np.sort(np.concatenate(partes)) if partes else np.array([], dtype=np.int64)
+
+    @staticmethod
+    def _codigos(valores: pd.Index, selecionados) -> np.ndarray:
+        return np.flatnonzero(valores.isin(list(selecionados)))
+
+    def selecionar(self, incluir_rotinas: bool = True, quadros: Optional[Tuple[str, ...]] = None,
+                   status: Optional[Tuple[str, ...]] = None, membros: Optional[Tuple[str, ...]] = None,
+                   periodo: Optional[Tuple] = None) -> Optional[np.ndarray]:
+        """
+        Posições das linhas que passam pelos predicados (os mesmos de `aplicar_filtros`), ou None se
+        nenhum deles restringe as linhas.
+        """
+        posicoes = self.linhas(status, periodo)
+        mascaras = []
+        if not incluir_rotinas:
+            mascaras.append(lambda p: ~self.rotina[p])
+        if quadros is not None:
+            mascaras.append(lambda p: np.isin(self.quadros[p], self._codigos(self._quadros, quadros)))
+        if membros is not None:
+            mascaras.append(lambda p: np.isin(self.membros[p], self._codigos(self._membros, membros)))
+        if not mascaras:
+            return posicoes
+        if posicoes is None:
+            posicoes = np.arange(self.n_linhas)
+        for mascara in mascaras:
+            posicoes = posicoes[mascara(posicoes)]
+        return posicoes
+
+
+class TrelloDataFrameBuilder:
+    """
+    Classe para carregar, processar e estruturar dados de um export JSON do Trello
+    em um DataFrame do Pandas, pronto para análise.
+    """
+
+    def __init__(self, json_path: Optional[str] = None, streaming: bool = True, data: Optional[Dict[str, Any]] = None,
+                 moves: Optional[pd.DataFrame] = None):
+        """
+        Inicializa o construtor do DataFrame.
+
+        Args:
+            json_path (Optional[str]): O caminho para o arquivo JSON do Trello.
+            streaming (bool): Se True, lê o arquivo em streaming mantendo apenas os campos usados.
+            data (Optional[Dict[str, Any]]): Quadro já carregado em memória; dispensa a leitura do arquivo.
+            moves (Optional[pd.DataFrame]): Movimentações dos cards entre listas (`ID_Tarefa`, `ID_Lista`, `Data`),
+                ver `ler_movimentos`. Sem elas, a conclusão é aproximada pela última atividade do card.
+        """
+        self.json_path = json_path
+        self.streaming = streaming
+        self.data: Optional[Dict[str, Any]] = data
+        self.moves = moves
+        self._id_to_member: Dict[str, Dict] = {}
+        self._id_to_label: Dict[str, str] = {}
+        self._id_to_list: Dict[str, Dict] = {}
+        self._id_to_board: Dict[str, str] = {}
+        self._custom_field_ids: Set[str] = set()
+        self._custom_fields: Dict[str, Dict[str, Any]] = {}
+        self.label_index: Optional[IndiceEtiquetas] = None
+        self.custom_fields: Optional[pd.DataFrame] = None
+
+    @cronometrado("carga_json")
+    def _load_data(self) -> bool:
+        """
+        Método privado para carregar os dados do arquivo JSON.
+
+        Returns:
+            bool: True se os dados foram carregados com sucesso, False caso contrário.
+        """
+        if self.data is not None:
+            return True
+        logger.info(f"Carregando dados de: {self.json_path}")
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as file:
+                self.data = self._stream_data(file) if self.streaming else json.load(file)
+            return True
+        except FileNotFoundError:
+            logger.error(f"Arquivo JSON não encontrado em '{self.json_path}'.")
+            return False
+        except json.JSONDecodeError:
+            logger.error(f"O arquivo JSON '{self.json_path}' está malformado ou corrompido.")
+            return False
+
+    @staticmethod
+    def _stream_data(file) -> Dict[str, Any]:
+        """
+        Lê o export em streaming: percorre `lists`, `labels`, `members`, `customFields` e `cards`
+        um item por vez, mantendo apenas os campos de `STREAM_FIELDS` e descartando cards
+        arquivados. As demais chaves (como `actions`) são consumidas sem serem materializadas.
+        """
+        reader = _JsonStreamReader(file)
+        data: Dict[str, Any] = {}
+        for key in reader.iter_object_keys():
+            fields = STREAM_FIELDS.get(key)
+            if fields and reader._peek() == "[":
+                data[key] = [
+                    {field: item[field] for field in fields if field in item}
+                    for item in reader.iter_array()
+                    if not (key == "cards" and item.get("closed"))
                 ]
-                
-                logger.info(f"DataFrame mestre construído com sucesso, contendo {len(df)} registros.")
-                return df[final_columns_order]
-
-
-        # --- Bloco Principal de Execução ---
-        
-        # --- Configuração ---
-        TRELLO_JSON_PATH = "trello.json"  # Coloque o caminho para o seu arquivo aqui
-        
-        # 1. Instanciar a classe
-        builder = TrelloDataFrameBuilder(json_path=TRELLO_JSON_PATH)
-        
-        # 2. Chamar o método principal para construir o DataFrame
-        df_mestre = builder.build_master_dataframe()
-        df_mestre = df_mestre[df_mestre['Membro']!='NÃO']
-        
-
-        # 3. Exibir resultados para verificação
-        if not df_mestre.empty:
-
-            pass
-        
-        else:
-            st.error("Não foi possível carregar os dados do Trello. Verifique o arquivo JSON.")
-            
+            elif key in STREAM_SCALARS:
+                data[key] = reader.read_value()
+            else:
+                reader.skip_value()
+        return data
+
+    @cronometrado("mapeamento_entidades")
+    def _map_entities(self):
+        """Método privado para mapear entidades do Trello (membros, etiquetas, listas)."""
+        if not self.data:
+            logger.warning("Não há dados para mapear. Carregue os dados primeiro.")
+            return
+
+        self._id_to_member = {m["id"]: {"name": m["fullName"]} for m in self.data.get("members", [])}
+        self._id_to_label = {lbl["id"]: lbl["name"] for lbl in self.data.get("labels", [])}
+        # Snapshots combinados trazem a lista de quadros; exports de um único quadro usam o próprio nome
+        boards = self.data.get("boards") or [{"id": self.data.get("id"), "name": self.data.get("name", "")}]
+        self._id_to_board = {b["id"]: b["name"] for b in boards}
+
+        for lst in self.data.get("lists", []):
+            name_lower = lst["name"].lower().strip()
+            status = None
+            if any(keyword in name_lower for keyword in KEYWORDS_TODO):
+                status = "A FAZER"
+            elif any(keyword in name_lower for keyword in KEYWORDS_DOING):
+                status = "FAZENDO"
+            elif any(keyword in name_lower for keyword in KEYWORDS_DONE):
+                status = "CONCLUÍDO"
+
+            if status:
+                self._id_to_list[lst["id"]] = {"name": lst["name"], "status": status}
+
+        self._custom_fields = {}
+        nomes_usados = set()
+        for campo in self.data.get("customFields", []):
+            tipo = campo.get("type")
+            if tipo not in CUSTOM_FIELD_DTYPES:
+                continue
+            # Quadros combinados podem ter campos homônimos: o segundo leva o ID no nome da coluna
+            nome = campo.get("name") or campo["id"]
+            if nome in nomes_usados:
+                nome = f"{nome} ({campo['id']})"
+            nomes_usados.add(nome)
+            opcoes = {op["id"]: (op.get("value") or {}).get("text", "") for op in campo.get("options") or ()}
+            self._custom_fields[campo["id"]] = {"name": nome, "type": tipo, "options": opcoes}
+        # Um campo de tempo de execução por quadro nos snapshots combinados
+        self._custom_field_ids = {f["id"] for f in self.data.get("customFields", []) if f.get("name") == CUSTOM_FIELD_NAME}
+
+        logger.info(f"Mapeamento concluído. Listas identificadas: {list(l['status'] for l in self._id_to_list.values())}")
+
+    @cronometrado("cards_linhas")
+    def _process_cards_rows(self) -> pd.DataFrame:
+        """
+        Processa os cards um a um, gerando uma linha por par (card, membro).
+
+        Returns:
+            pd.DataFrame: DataFrame ainda sem o schema aplicado (vazio se nenhum card for válido).
+        """
+        processed_tasks: List[Dict] = []
+        cards = self._valid_cards()
+        listas_etiquetas = self._build_label_index(cards)
+        for card, labels, is_routine in zip(cards, listas_etiquetas, self.label_index.rotina()):
+            list_info = self._id_to_list[card["idList"]]
+            is_routine = bool(is_routine)
+
+            # --- Aplicação das Regras de Negócio ---
+            execution_time = pd.NA
+            due_date = pd.to_datetime(card.get("due"), errors='coerce', utc=True)
+
+            if is_routine:
+                execution_time = self._routine_execution_time(card)
+            elif pd.isna(due_date):
+                last_activity_date = pd.to_datetime(card.get("dateLastActivity"), errors='coerce', utc=True)
+                if pd.notna(last_activity_date):
+                    due_date = last_activity_date + timedelta(days=1)
+
+            conclusion_date = pd.to_datetime(card.get("dateLastActivity"), errors='coerce', utc=True) if list_info["status"] == "CONCLUÍDO" else pd.NaT
+
+            member_ids = list(card.get("idMembers", []))
+            if not member_ids:
+                member_ids.append("UNASSIGNED")
+                self._id_to_member["UNASSIGNED"] = {"name": "Não Atribuído"}
+
+            for member_id in member_ids:
+                member_info = self._id_to_member.get(member_id)
+                if not member_info: continue
+
+                processed_tasks.append({
+                    'Board': self._board_name(card),
+                    'ID_Tarefa': card.get("id"),
+                    'Tarefa': card.get("name", "Sem Título"),
+                    'ID_Membro': member_id,
+                    'Membro': str(member_info["name"]).strip().split()[0].upper(),
+                    'ID_Lista': card.get("idList"),
+                    'Status': list_info["status"],
+                    'Data_Entrega': due_date,
+                    'Data_Conclusao': conclusion_date,
+                    'Etiquetas': ", ".join(filter(None, labels)),
+                    'Is_Rotina': is_routine,
+                    'Tempo_Estimado_Min': execution_time
+                })
+
+        return pd.DataFrame(processed_tasks)
+
+    def _valid_cards(self) -> List[Dict]:
+        """Cards que entram no DataFrame mestre: ativos e em listas mapeadas."""
+        return [
+            card for card in self.data.get("cards", [])
+            if not card.get("closed") and card.get("idList") in self._id_to_list
+        ]
+
+    def _build_label_index(self, cards: List[Dict]) -> List[List[str]]:
+        """
+        Monta `label_index` a partir dos `idLabels` dos cards (igual nos dois modos de construção).
+
+        Returns:
+            List[List[str]]: Os nomes das etiquetas de cada card, na ordem de `cards`.
+        """
+        listas_etiquetas = [[self._id_to_label.get(lid, "") for lid in card.get("idLabels", [])] for card in cards]
+        self.label_index = IndiceEtiquetas.from_label_lists([card.get("id") for card in cards], listas_etiquetas)
+        return listas_etiquetas
+
+    def _board_name(self, card: Dict) -> str:
+        """Retorna o nome do quadro de origem do card."""
+        board_name = self._id_to_board.get(card.get("idBoard"))
+        if board_name is None:
+            board_name = self.data.get("name", "")
+        return board_name
+
+    def _routine_execution_time(self, card: Dict) -> int:
+        """
+        Retorna o tempo de execução (minutos) de um card de rotina, com o padrão como fallback.
 
-            
+        Aceita qualquer número finito e não negativo, arredondado para o minuto mais próximo.
+        """
+        if self._custom_field_ids:
+            for item in card.get("customFieldItems") or ():
+                if item.get("idCustomField") in self._custom_field_ids and 'value' in item:
+                    try:
+                        minutos = float((item['value'] or {}).get('number'))
+                    except (TypeError, ValueError):
+                        break
+                    if math.isfinite(minutos) and minutos >= 0:
+                        return int(round(minutos))
+                    break
+        return DEFAULT_EXECUTION_TIME_MIN
 
-        dados={
-            'df_trello':df_mestre
+    @cronometrado("campos_personalizados")
+    def _custom_fields_table(self, cards: List[Dict]) -> pd.DataFrame:
+        """
+        Converte os `customFieldItems` dos cards numa tabela com uma coluna tipada por campo do quadro.
+
+        Percorre os itens uma única vez, separando posição do card e valor bruto por campo; a
+        conversão de tipo é feita depois, uma vez por coluna (ver `CUSTOM_FIELD_DTYPES`). Campos
+        do tipo lista trazem o texto da opção escolhida, como categoria nas opções do quadro.
+
+        Returns:
+            pd.DataFrame: Uma linha por card (na ordem de `cards`), indexada por `ID_Tarefa`.
+        """
+        campos = self._custom_fields
+        posicoes: Dict[str, List[int]] = {campo_id: [] for campo_id in campos}
+        brutos: Dict[str, List[Any]] = {campo_id: [] for campo_id in campos}
+        for posicao, card in enumerate(cards):
+            for item in card.get("customFieldItems") or ():
+                campo_id = item.get("idCustomField")
+                campo = campos.get(campo_id)
+                if campo is None:
+                    continue
+                if campo["type"] == "list":
+                    bruto = item.get("idValue")
+                else:
+                    bruto = (item.get("value") or {}).get(CUSTOM_FIELD_VALUE_KEYS[campo["type"]])
+                if bruto is not None:
+                    posicoes[campo_id].append(posicao)
+                    brutos[campo_id].append(bruto)
+
+        colunas = {
+            campo["name"]: _coluna_campo(campo, len(cards), np.asarray(posicoes[campo_id], dtype=np.intp), brutos[campo_id])
+            for campo_id, campo in campos.items()
         }
-        st.session_state['dados']=dados
+        indice = pd.Index(pd.array([card.get("id") for card in cards], dtype="string"), name='ID_Tarefa')
+        return pd.DataFrame(colunas, index=indice)
+
+    def build_custom_fields(self) -> pd.DataFrame:
+        """
+        Tabela de campos personalizados dos cards que entram no DataFrame mestre (ativos e em listas mapeadas).
+
+        Returns:
+            pd.DataFrame: Indexada por `ID_Tarefa`, uma coluna tipada por campo personalizado do quadro.
+        """
+        if self.data is None and not self._load_data():
+            return pd.DataFrame(index=pd.Index([], dtype="string", name='ID_Tarefa'))
+        if not self._id_to_list:
+            self._map_entities()
+        self.custom_fields = self._custom_fields_table(self._valid_cards())
+        return self.custom_fields
+
+    def build_label_index(self) -> Optional[IndiceEtiquetas]:
+        """
+        Índice de etiquetas dos cards que entram no DataFrame mestre (ativos e em listas mapeadas).
+
+        Returns:
+            Optional[IndiceEtiquetas]: O índice, ou None se o export não pôde ser carregado.
+        """
+        if self.data is None and not self._load_data():
+            return None
+        if not self._id_to_list:
+            self._map_entities()
+        self._build_label_index(self._valid_cards())
+        return self.label_index
+
+    @cronometrado("cards_colunar")
+    def _process_cards_columnar(self) -> pd.DataFrame:
+        """
+        Processa os cards de forma colunar: os campos são coletados em arrays uma única vez
+        e as regras de negócio (datas, fallback de entrega, rotina) são aplicadas como operações
+        sobre colunas inteiras; as tabelas de cards e atribuições são então juntadas por membro.
+
+        Produz exatamente o mesmo resultado de `_process_cards_rows`.
+
+        Returns:
+            pd.DataFrame: DataFrame ainda sem o schema aplicado (vazio se nenhum card for válido).
+        """
+        cartoes, atribuicoes = self._card_tables_columnar()
+        if atribuicoes.empty:
+            return pd.DataFrame()
+        return juntar_tabelas(cartoes, atribuicoes)
+
+    def _card_tables_columnar(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Monta, sem explodir por membro, a tabela de cards e a tabela de atribuições (card, membro).
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (cards, atribuições), ainda sem o schema aplicado.
+        """
+        cards = self._valid_cards()
+        if not cards:
+            return pd.DataFrame(columns=CARD_COLUMNS), pd.DataFrame(columns=ASSIGNMENT_COLUMNS)
+
+        listas_etiquetas = self._build_label_index(cards)
+        etiquetas = pd.array([", ".join(filter(None, nomes)) for nomes in listas_etiquetas], dtype="string")
+        is_routine = self.label_index.rotina()
+
+        status = np.array([self._id_to_list[card["idList"]]["status"] for card in cards], dtype=object)
+        due_date = pd.to_datetime(
+            pd.Series([card.get("due") for card in cards], dtype=object),
+            errors='coerce', utc=True, format='ISO8601'
+        )
+        last_activity = pd.to_datetime(
+            pd.Series([card.get("dateLastActivity") for card in cards], dtype=object),
+            errors='coerce', utc=True, format='ISO8601'
+        )
+
+        # Sem data de entrega (e fora da rotina): usa a última atividade + 1 dia
+        fallback = ~is_routine & due_date.isna().to_numpy()
+        due_date = due_date.mask(fallback, last_activity + timedelta(days=1))
+        conclusion_date = last_activity.where(status == "CONCLUÍDO")
+
+        # Todos os campos personalizados numa passada; a rotina usa o tempo de execução informado
+        self.custom_fields = self._custom_fields_table(cards)
+        execution_time = pd.array(np.where(is_routine, DEFAULT_EXECUTION_TIME_MIN, 0), dtype="Int64")
+        minutos = np.full(len(cards), np.nan)
+        for campo_id in self._custom_field_ids:
+            campo_tempo = self._custom_fields.get(campo_id)
+            if campo_tempo is not None and campo_tempo["type"] == "number":
+                # Cada card só tem valor no campo do próprio quadro
+                valores = self.custom_fields[campo_tempo["name"]].to_numpy(dtype='float64', na_value=np.nan)
+                minutos = np.where(np.isnan(minutos), valores, minutos)
+        informado = is_routine & np.isfinite(minutos) & (minutos >= 0)
+        execution_time[informado] = np.rint(minutos[informado]).astype(np.int64)
+        execution_time[~is_routine] = pd.NA
+
+        card_ids = np.array([card.get("id") for card in cards], dtype=object)
+        cartoes = pd.DataFrame({
+            'Board': np.array([self._board_name(card) for card in cards], dtype=object),
+            'ID_Tarefa': card_ids,
+            'Tarefa': np.array([card.get("name", "Sem Título") for card in cards], dtype=object),
+            'ID_Lista': np.array([card.get("idList") for card in cards], dtype=object),
+            'Status': status,
+            'Data_Entrega': due_date.reset_index(drop=True),
+            'Data_Conclusao': conclusion_date.reset_index(drop=True),
+            'Etiquetas': etiquetas,
+            'Is_Rotina': is_routine,
+            'Tempo_Estimado_Min': execution_time,
+        })
+
+        # --- Atribuições (card, membro) ---
+        member_lists = [card.get("idMembers") or ["UNASSIGNED"] for card in cards]
+        self._id_to_member["UNASSIGNED"] = {"name": "Não Atribuído"}
+        member_lists = [[mid for mid in mids if mid in self._id_to_member] for mids in member_lists]
+        counts = np.fromiter((len(mids) for mids in member_lists), dtype=np.int64, count=len(cards))
+        member_ids = np.array([mid for mids in member_lists for mid in mids], dtype=object)
+        first_names = {
+            mid: str(info["name"]).strip().split()[0].upper() for mid, info in self._id_to_member.items()
+        }
+        atribuicoes = pd.DataFrame({
+            'ID_Tarefa': card_ids[np.repeat(np.arange(len(cards)), counts)],
+            'ID_Membro': member_ids,
+            'Membro': pd.Series(member_ids, dtype=object).map(first_names).to_numpy(),
+        })
+        return cartoes, atribuicoes
+
+    def canonical_form(self) -> Dict[str, Any]:
+        """
+        Retorna uma forma canônica apenas dos campos que afetam o DataFrame mestre.
+
+        Campos voláteis do export (como `dateLastActivity`) só entram quando o construtor
+        realmente os usa: na data de conclusão de cards concluídos e no fallback da data de
+        entrega. Cards arquivados ou em listas não mapeadas são ignorados, como no construtor.
+        Os valores dos campos personalizados tipados entram por card, como na tabela de campos.
+
+        Returns:
+            Dict[str, Any]: Estrutura serializável com listas, etiquetas, membros, campos personalizados e cards.
+        """
+        if not self._load_data():
+            return {}
+        self._map_entities()
+
+        cards = {}
+        for card in self.data.get("cards", []):
+            if card.get("closed") or card.get("idList") not in self._id_to_list:
+                continue
+            labels = [self._id_to_label.get(lid, "") for lid in card.get("idLabels", [])]
+            is_routine = any('rotina' in lbl.lower() for lbl in labels)
+            status = self._id_to_list[card["idList"]]["status"]
+
+            entry = {
+                "board": self._board_name(card),
+                "name": card.get("name", "Sem Título"),
+                "idList": card["idList"],
+                "idLabels": card.get("idLabels", []),
+                "idMembers": card.get("idMembers", []),
+                "due": card.get("due"),
+            }
+            if status == "CONCLUÍDO" or (not is_routine and not card.get("due")):
+                entry["dateLastActivity"] = card.get("dateLastActivity")
+            if is_routine:
+                entry["executionTime"] = self._routine_execution_time(card)
+            campos = {
+                item["idCustomField"]: item.get("idValue") or item.get("value")
+                for item in card.get("customFieldItems") or ()
+                if item.get("idCustomField") in self._custom_fields
+            }
+            if campos:
+                entry["customFields"] = campos
+            cards[card["id"]] = entry
+
+        return {
+            "lists": {lid: info["status"] for lid, info in self._id_to_list.items()},
+            "labels": self._id_to_label,
+            "members": {mid: info["name"] for mid, info in self._id_to_member.items()},
+            "customFields": self._custom_fields,
+            "cards": cards,
+        }
+
+    def status_entries(self) -> pd.DataFrame:
+        """
+        Momento de entrada de cada card em cada status, a partir das movimentações entre listas.
+
+        As listas são classificadas como em `_map_entities`; vale a primeira entrada em A FAZER
+        e FAZENDO e a última em CONCLUÍDO (um card reaberto e concluído de novo conta a nova conclusão).
+
+        Returns:
+            pd.DataFrame: Indexado por `ID_Tarefa`, com as colunas 'A FAZER', 'FAZENDO' e 'CONCLUÍDO' (UTC).
+        """
+        colunas = ['A FAZER', 'FAZENDO', 'CONCLUÍDO']
+        if self.moves is None or self.moves.empty:
+            return pd.DataFrame(columns=colunas, dtype='datetime64[us, UTC]').rename_axis('ID_Tarefa')
+        status = self.moves['ID_Lista'].map({lid: info["status"] for lid, info in self._id_to_list.items()})
+        movimentos = self.moves.assign(Status=status).dropna(subset=['Status'])
+        por_status = movimentos.groupby(['ID_Tarefa', 'Status'], sort=False)['Data']
+        primeiras, ultimas = por_status.min().unstack(), por_status.max().unstack()
+        entradas = primeiras.reindex(columns=colunas)
+        entradas['CONCLUÍDO'] = ultimas.reindex(columns=colunas)['CONCLUÍDO']
+        return entradas.astype('datetime64[us, UTC]')
+
+    @cronometrado("linha_do_tempo")
+    def _apply_status_timeline(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Acrescenta as datas de criação e início, a conclusão real e os lead/cycle times (em dias).
+
+        A conclusão passa a ser a última entrada do card em CONCLUÍDO, quando registrada; sem
+        movimentações, continua aproximada pela última atividade. O início é a primeira entrada em FAZENDO.
+        """
+        def utc(valores) -> pd.Series:
+            return pd.Series(pd.to_datetime(valores, utc=True), index=df.index).astype('datetime64[us, UTC]')
+
+        ids = df['ID_Tarefa'].to_numpy(dtype=object)
+        entradas = self.status_entries().reindex(ids)
+        inicio = utc(entradas['FAZENDO'].to_numpy())
+        conclusao_real = utc(entradas['CONCLUÍDO'].to_numpy())
+
+        conclusao = utc(df['Data_Conclusao'].to_numpy())
+        concluido = (df['Status'] == "CONCLUÍDO").to_numpy(dtype=bool)
+        conclusao = conclusao_real.where(concluido & conclusao_real.notna().to_numpy(), conclusao)
+
+        criacao = data_criacao_ids(ids).set_axis(df.index)
+        # Sem data no ID (IDs fora do padrão do Trello), vale a primeira movimentação registrada
+        criacao = criacao.fillna(utc(entradas.min(axis=1).to_numpy()))
+        um_dia = pd.Timedelta(days=1)
+        return df.assign(
+            Data_Conclusao=conclusao,
+            Data_Criacao=criacao,
+            Data_Inicio=inicio,
+            Lead_Time_Dias=(conclusao - criacao) / um_dia,
+            Cycle_Time_Dias=(conclusao - inicio) / um_dia,
+        )
+
+    @cronometrado("schema_fuso")
+    def _finalize_dataframe(self, df: pd.DataFrame, columns: List[str] = MASTER_COLUMNS) -> pd.DataFrame:
+        """Aplica o schema, converte o fuso horário das datas e ordena as colunas."""
+        df = df.astype({coluna: tipo for coluna, tipo in MASTER_SCHEMA.items() if coluna in columns})
+        for coluna in DATE_COLUMNS:
+            if coluna in columns:
+                # to_datetime cobre colunas só com NaT, que chegam sem fuso
+                df[coluna] = pd.to_datetime(df[coluna], utc=True).dt.tz_convert('America/Sao_Paulo')
+        return df[columns]
+
+    def build_master_dataframe(self, mode: str = "auto") -> pd.DataFrame:
+        """
+        Orquestra o processo de criação do DataFrame mestre.
+
+        Carrega os dados, mapeia as entidades, processa cada card aplicando as regras de
+        negócio e retorna um DataFrame final com o schema definido.
+
+        Args:
+            mode (str): "rows" processa card a card, "columnar" usa operações sobre colunas
+                inteiras e "auto" escolhe o modo colunar a partir de `COLUMNAR_MIN_CARDS` cards.
+
+        Returns:
+            pd.DataFrame: Um DataFrame Pandas estruturado e pronto para análise.
+        """
+        if mode not in ("auto", "rows", "columnar"):
+            raise ValueError(f"Modo de construção inválido: {mode!r}")
+
+        if not self._load_data():
+            return pd.DataFrame() # Retorna DF vazio se o carregamento falhar
+
+        self._map_entities()
+
+        if mode == "auto":
+            mode = "columnar" if len(self.data.get("cards", [])) >= COLUMNAR_MIN_CARDS else "rows"
+
+        logger.info(f"Iniciando processamento dos cards para construção do DataFrame (modo {mode})...")
+        if mode == "columnar":
+            df = self._process_cards_columnar()
+        else:
+            df = self._process_cards_rows()
+
+        if df.empty:
+            logger.warning("Nenhum card foi processado. Verifique o conteúdo do JSON.")
+            return pd.DataFrame()
+
+        df = self._finalize_dataframe(self._apply_status_timeline(df))
+
+        logger.info(f"DataFrame mestre construído com sucesso, contendo {len(df)} registros.")
+        return df
+
+
+def _coluna_campo(campo: Dict[str, Any], n_cards: int, posicoes: np.ndarray, brutos: List[Any]) -> pd.api.extensions.ExtensionArray:
+    """Monta a coluna tipada de um campo personalizado a partir das posições e valores brutos preenchidos."""
+    tipo = campo["type"]
+    if tipo == "number":
+        valores = np.full(n_cards, np.nan)
+        valores[posicoes] = pd.to_numeric(pd.Series(brutos, dtype=object), errors='coerce').to_numpy(dtype='float64')
+        return pd.array(valores, dtype="Float64")
+    if tipo == "date":
+        valores = np.full(n_cards, np.datetime64('NaT'), dtype='datetime64[us]')
+        datas = pd.to_datetime(pd.Series(brutos, dtype=object), errors='coerce', utc=True, format='ISO8601')
+        valores[posicoes] = datas.dt.tz_localize(None).to_numpy(dtype='datetime64[us]')
+        return pd.array(pd.DatetimeIndex(valores).tz_localize('UTC').tz_convert('America/Sao_Paulo'))
+    if tipo == "checkbox":
+        valores = pd.array(np.full(n_cards, pd.NA, dtype=object), dtype="boolean")
+        valores[posicoes] = np.array([str(b).lower() == "true" for b in brutos], dtype=bool)
+        return valores
+    if tipo == "text":
+        valores = np.full(n_cards, None, dtype=object)
+        valores[posicoes] = brutos
+        return pd.array(valores, dtype="string")
+    # Lista: texto da opção escolhida, como categoria (opções com o mesmo texto compartilham a categoria)
+    textos = pd.Index(list(campo["options"].values()), dtype=object)
+    categorias = textos.unique()
+    codigo_opcao = np.append(categorias.get_indexer(textos), -1)
+    codigos = np.full(n_cards, -1, dtype=np.int64)
+    # Opção removida do quadro: get_indexer devolve -1, que aponta para o -1 acrescentado acima
+    codigos[posicoes] = codigo_opcao[pd.Index(list(campo["options"]), dtype=object).get_indexer(pd.Index(brutos, dtype=object))]
+    return pd.Categorical.from_codes(codigos, categories=pd.Index(categorias.tolist()))
+
+
+def data_criacao_ids(ids) -> pd.Series:
+    """
+    Momento de criação dos cards, codificado (em segundos, hexadecimal) nos 8 primeiros caracteres do ID do Trello.
+
+    Returns:
+        pd.Series: Datas em UTC, NaT para IDs fora do padrão.
+    """
+    codigos, unicos = pd.factorize(pd.Series(ids, dtype=object))
+    prefixos = [str(u)[:8] for u in unicos]
+    try:
+        segundos = np.frombuffer(bytes.fromhex("".join(prefixos)), dtype='>u4').astype('float64')
+        if len(segundos) != len(prefixos):
+            raise ValueError
+    except ValueError:
+        segundos = np.array([int(p, 16) if re.fullmatch(r'[0-9a-fA-F]{8}', p) else np.nan for p in prefixos], dtype='float64')
+    datas = pd.to_datetime(segundos, unit='s', utc=True).as_unit('us')
+    return pd.Series(datas.take(codigos), dtype='datetime64[us, UTC]').where(codigos >= 0)
+
+
+def ler_movimentos(path: str) -> Optional[pd.DataFrame]:
+    """Lê as movimentações de cards gravadas pela sincronização (None se o arquivo não existir)."""
+    if not os.path.exists(path):
+        return None
+    import pyarrow.parquet as pq
+    try:
+        movimentos = pq.read_table(path, columns=['ID_Tarefa', 'ID_Lista', 'Data']).to_pandas()
+    except (OSError, pa.ArrowInvalid) as exc:
+        logger.warning(f"Não foi possível ler as movimentações em '{path}': {exc}")
+        return None
+    movimentos['Data'] = pd.to_datetime(movimentos['Data'], utc=True)
+    return movimentos
+
+
+def juntar_tabelas(cartoes: pd.DataFrame, atribuicoes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Junta as tabelas normalizadas no formato do DataFrame mestre (uma linha por card × membro).
+
+    A ordem das atribuições é preservada; atribuições de cards ausentes da tabela de cards são descartadas.
+    """
+    posicoes = pd.Index(cartoes['ID_Tarefa']).get_indexer(atribuicoes['ID_Tarefa'])
+    validas = posicoes >= 0
+    df = cartoes.take(posicoes[validas]).reset_index(drop=True)
+    df['ID_Membro'] = atribuicoes['ID_Membro'].array[validas]
+    df['Membro'] = atribuicoes['Membro'].array[validas]
+    return df[[coluna for coluna in MASTER_COLUMNS if coluna in df.columns]]
+
+
+def hash_arquivo(path: str) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_forma_canonica(forma: Dict[str, Any]) -> str:
+    """SHA-256 da serialização compacta e com chaves ordenadas da forma canônica."""
+    payload = json.dumps(forma, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def resumo_mudancas(anterior: Dict[str, Any], atual: Dict[str, Any]) -> List[str]:
+    """
+    Compara duas formas canônicas e descreve as mudanças, uma linha por card.
+
+    Returns:
+        List[str]: Linhas no formato "+ id nome" (novo), "- id nome" (removido) e
+        "~ id nome: campos" (alterado), precedidas das mudanças de listas, etiquetas, membros e
+        campos personalizados do quadro.
+    """
+    linhas = []
+    nomes_entidades = {"lists": "Listas alteradas", "labels": "Etiquetas alteradas", "members": "Membros alterados",
+                       "customFields": "Campos personalizados alterados"}
+    for chave, nome in nomes_entidades.items():
+        if anterior.get(chave) != atual.get(chave):
+            linhas.append(f"* {nome} no quadro")
+
+    cards_antes = anterior.get("cards", {})
+    cards_agora = atual.get("cards", {})
+    for card_id, card in cards_agora.items():
+        antes = cards_antes.get(card_id)
+        if antes is None:
+            linhas.append(f"+ {card_id} {card['name']}")
+        elif antes != card:
+            campos = sorted(k for k in set(antes) | set(card) if antes.get(k) != card.get(k))
+            linhas.append(f"~ {card_id} {card['name']}: {', '.join(campos)}")
+    for card_id in cards_antes.keys() - cards_agora.keys():
+        linhas.append(f"- {card_id} {cards_antes[card_id]['name']}")
+    return linhas
+
+
+def salvar_snapshot_colunar(df: pd.DataFrame, path: str, versao_origem: str, metadados: Optional[Dict[str, str]] = None):
+    """
+    Grava o DataFrame mestre como Arrow IPC (sem compressão, para permitir memory mapping).
+
+    Args:
+        df (pd.DataFrame): O DataFrame mestre.
+        path (str): Caminho do arquivo de saída.
+        versao_origem (str): SHA-256 do JSON de origem, usado para detectar snapshots desatualizados.
+        metadados (Optional[Dict[str, str]]): Metadados adicionais gravados no schema (chaves `trello_<nome>`).
+    """
+    import pyarrow.compute as pc
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # NaN gravado como valor (e não como nulo): a leitura com memory mapping não precisa copiar a coluna
+    for posicao, campo in enumerate(table.schema):
+        if pa.types.is_floating(campo.type) and table.column(posicao).null_count:
+            table = table.set_column(posicao, campo, pc.fill_null(table.column(posicao), float('nan')))
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        **{f"trello_{chave}".encode(): valor.encode() for chave, valor in (metadados or {}).items()},
+        b"trello_source_sha256": versao_origem.encode(),
+        b"trello_schema_version": SNAPSHOT_SCHEMA_VERSION.encode(),
+    })
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    logger.info(f"Snapshot colunar salvo em '{path}' ({len(df)} registros).")
+
+
+def _metadados_validos(path: str, metadata: Optional[Dict[bytes, bytes]], versao_origem: Optional[str]) -> bool:
+    metadata = metadata or {}
+    if metadata.get(b"trello_schema_version") != SNAPSHOT_SCHEMA_VERSION.encode():
+        logger.info(f"Snapshot '{path}' com schema antigo; ignorando.")
+        return False
+    if versao_origem and metadata.get(b"trello_source_sha256") != versao_origem.encode():
+        logger.info(f"Snapshot '{path}' não corresponde ao JSON atual; ignorando.")
+        return False
+    return True
 
-        
 
-        
+@lru_cache(maxsize=8)
+def _snapshot_confere(path: str, mtime_ns: int, tamanho: int, versao_origem: Optional[str]) -> bool:
+    try:
+        with pa.memory_map(path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata
+    except (pa.ArrowInvalid, OSError) as exc:
+        logger.warning(f"Não foi possível ler o snapshot '{path}': {exc}")
+        return False
+    return _metadados_validos(path, metadata, versao_origem)
+
+
+def snapshot_valido(path: str, versao_origem: Optional[str] = None) -> bool:
+    """
+    True se o snapshot existe, tem o schema atual e (se informado) foi gerado de `versao_origem`.
+
+    Só o schema, no rodapé do arquivo, é lido; o resultado é memoizado por caminho, data de
+    modificação, tamanho e versão.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return _snapshot_confere(path, stat.st_mtime_ns, stat.st_size, versao_origem)
+
+
+def _tabela_snapshot(path: str, versao_origem: Optional[str] = None) -> Optional[pa.Table]:
+    """
+    Abre o snapshot Arrow IPC com memory mapping, sem copiar as colunas.
+
+    Args:
+        path (str): Caminho do snapshot.
+        versao_origem (Optional[str]): Se informado, o snapshot só é aceito se tiver sido gerado deste JSON.
+
+    Returns:
+        Optional[pa.Table]: A tabela, ou None se o snapshot não existir ou estiver desatualizado.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            # Conferido no mesmo leitor: o arquivo pode ter sido trocado depois de `snapshot_valido`
+            if not _metadados_validos(path, reader.schema.metadata, versao_origem):
+                return None
+            table = reader.read_all()
+    except (pa.ArrowInvalid, OSError) as exc:
+        logger.warning(f"Não foi possível ler o snapshot '{path}': {exc}")
+        return None
+    return table
+
+
+@cronometrado("leitura_snapshot")
+def ler_snapshot_colunar(path: str, versao_origem: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Abre o snapshot Arrow IPC com memory mapping.
+
+    Args:
+        path (str): Caminho do snapshot.
+        versao_origem (Optional[str]): Se informado, o snapshot só é aceito se tiver sido gerado deste JSON.
+
+    Returns:
+        Optional[pd.DataFrame]: O DataFrame mestre, ou None se o snapshot não existir ou estiver desatualizado.
+    """
+    table = _tabela_snapshot(path, versao_origem)
+    return None if table is None else table.to_pandas(split_blocks=True)
+
+
+class DatasetCache:
+    """
+    Cache do DataFrame mestre compartilhado por todas as sessões do processo Streamlit.
+
+    Cada snapshot é identificado pelo hash SHA-256 do conteúdo do arquivo; o hash só é
+    recalculado quando o mtime/tamanho do arquivo muda. Sessões que chegam ao mesmo tempo
+    para um snapshot novo aguardam uma única construção, e snapshots antigos são
+    descartados quando o arquivo muda.
+
+    `current` serve o snapshot publicado (buffer ativo) enquanto uma thread observadora
+    constrói o próximo quando o arquivo muda, trocando a referência de uma vez ao terminar.
+
+    Args:
+        max_snapshots (int): Snapshots mantidos no cache.
+        poll_interval (float): Intervalo (s) de verificação do arquivo pelo observador; 0 desliga o observador.
+    """
+
+    def __init__(self, max_snapshots: int = 1, poll_interval: float = INTERVALO_OBSERVADOR_S):
+        self.max_snapshots = max_snapshots
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._current: Dict[str, Tuple[Optional[str], pd.DataFrame]] = {}
+        self._watchers: Dict[str, threading.Thread] = {}
+
+    def _file_hash(self, path: str) -> str:
+        """Retorna o SHA-256 do arquivo, reaproveitando o valor enquanto mtime e tamanho não mudarem."""
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        file_hash = hash_arquivo(path)
+        with self._lock:
+            self._hashes[path] = (stat.st_mtime_ns, stat.st_size, file_hash)
+        return file_hash
+
+    def get(self, path: str, loader: Callable[[str, Optional[str]], pd.DataFrame]) -> Tuple[Optional[str], pd.DataFrame]:
+        """
+        Retorna a versão (hash) e uma visão somente leitura do DataFrame do snapshot atual.
+
+        Args:
+            path (str): Caminho do arquivo de origem.
+            loader (Callable): Função que constrói o DataFrame a partir do caminho e da versão.
+
+        Returns:
+            Tuple[Optional[str], pd.DataFrame]: O hash do snapshot (None se o arquivo não existir) e o DataFrame.
+        """
+        try:
+            version = self._file_hash(path)
+        except FileNotFoundError:
+            return None, loader(path, None)
+
+        with self._lock:
+            df = self._snapshots.get(version)
+            if df is not None:
+                self._snapshots.move_to_end(version)
+                return version, df.copy(deep=False)
+            build_lock = self._build_locks.setdefault(version, threading.Lock())
+
+        # Uma única construção por snapshot: as demais sessões aguardam e reaproveitam o resultado
+        with build_lock:
+            with self._lock:
+                df = self._snapshots.get(version)
+            if df is None:
+                logger.info(f"Construindo snapshot {version[:12]} de '{path}' para o cache do processo.")
+                try:
+                    df = loader(path, version)
+                    with self._lock:
+                        self._snapshots[version] = df
+                        while len(self._snapshots) > self.max_snapshots:
+                            old_version, _ = self._snapshots.popitem(last=False)
+                            logger.info(f"Snapshot {old_version[:12]} removido do cache.")
+                finally:
+                    # Também em caso de erro: a próxima chamada tenta de novo com um lock novo
+                    with self._lock:
+                        self._build_locks.pop(version, None)
+        return version, df.copy(deep=False)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _publish(self, path: str, loader: Callable[[str, Optional[str]], pd.DataFrame]) -> Tuple[Optional[str], pd.DataFrame]:
+        version, df = self.get(path, loader)
+        with self._lock:
+            self._current[path] = (version, df)
+        return version, df
+
+    def _watch(self, path: str, loader: Callable[[str, Optional[str]], pd.DataFrame], last: Optional[Tuple[int, int]]):
+        while True:
+            time.sleep(self.poll_interval)
+            stat = self._stat(path)
+            # Arquivo ausente ou inalterado: continua servindo o snapshot publicado
+            if stat is None or stat == last:
+                continue
+            last = stat
+            try:
+                version, df = self._publish(path, loader)
+                logger.info(f"'{path}' mudou; snapshot {str(version)[:12]} publicado ({len(df)} registros).")
+            except Exception:
+                logger.exception(f"Falha ao reconstruir o snapshot de '{path}'; mantendo o anterior.")
+
+    def current(self, path: str, loader: Callable[[str, Optional[str]], pd.DataFrame]) -> Tuple[Optional[str], pd.DataFrame]:
+        """
+        Retorna o snapshot publicado, sem verificar o arquivo nem aguardar reconstruções.
+
+        Na primeira chamada para `path`, constrói o snapshot e inicia a thread observadora,
+        que reconstrói em segundo plano a cada mudança do arquivo e publica o resultado. Com o
+        observador desligado (`poll_interval` 0), nada publicaria a versão nova: cada chamada
+        confere o arquivo, como `get`.
+
+        Returns:
+            Tuple[Optional[str], pd.DataFrame]: A versão publicada e uma visão do DataFrame.
+        """
+        if self.poll_interval <= 0:
+            return self.get(path, loader)
+        with self._lock:
+            current = self._current.get(path)
+        if current is None:
+            last = self._stat(path)
+            current = self._publish(path, loader)
+            with self._lock:
+                start = path not in self._watchers
+                if start:
+                    self._watchers[path] = threading.Thread(
+                        target=self._watch, args=(path, loader, last), name=f"observador-{path}", daemon=True
+                    )
+            if start:
+                self._watchers[path].start()
+        return current[0], current[1].copy(deep=False)
+
+
+_DATASET_CACHE = DatasetCache()
+
+
+def construir_df_mestre(json_path: str, versao: Optional[str] = None) -> pd.DataFrame:
+    """Constrói o DataFrame mestre a partir do export, sem as tarefas não atribuídas."""
+    moves = ler_movimentos(os.path.join(os.path.dirname(json_path), MOVIMENTOS_PATH))
+    df_mestre = TrelloDataFrameBuilder(json_path=json_path, moves=moves).build_master_dataframe()
+    if df_mestre.empty:
+        return df_mestre
+    return df_mestre[df_mestre['Membro'] != 'NÃO'].reset_index(drop=True)
+
+
+def compactar_df_mestre(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o DataFrame mestre para o schema compacto (`COMPACT_SCHEMA`).
+
+    Os valores exibidos não mudam: as colunas categóricas guardam um código inteiro por linha
+    e cada ID, título ou etiqueta uma única vez (em `df[coluna].cat.categories`).
+    """
+    if df.empty:
+        return df
+    return df.assign(Is_Rotina=df['Is_Rotina'].fillna(False)).astype(COMPACT_SCHEMA)
+
+
+def carregar_df_mestre(json_path: str, versao: Optional[str] = None) -> pd.DataFrame:
+    """
+    Carrega o DataFrame mestre do snapshot colunar quando ele corresponde à versão do JSON,
+    recorrendo à construção a partir do JSON se o snapshot estiver ausente ou desatualizado.
+    Com `SCHEMA_COMPACTO`, o DataFrame é convertido para o schema compacto antes de ir para o cache.
+    """
+    df_mestre = ler_snapshot_colunar(SNAPSHOT_PATH, versao) if versao else None
+    if df_mestre is not None:
+        logger.info(f"DataFrame mestre carregado do snapshot '{SNAPSHOT_PATH}' ({len(df_mestre)} registros).")
+    else:
+        df_mestre = construir_df_mestre(json_path, versao)
+    if SCHEMA_COMPACTO and not df_mestre.empty:
+        antes = df_mestre.memory_usage(deep=True).sum()
+        df_mestre = compactar_df_mestre(df_mestre)
+        logger.info(f"Schema compacto: {antes / 2**20:.1f} MB -> {df_mestre.memory_usage(deep=True).sum() / 2**20:.1f} MB.")
+    return df_mestre
+
+
+def dataset_atual() -> Tuple[Optional[str], pd.DataFrame]:
+    """
+    Versão e DataFrame mestre publicados para este processo.
+
+    Com `DIRETORIO_COMPARTILHADO`, anexa (somente leitura, sem cópia) o DataFrame publicado pelo
+    processo carregador; enquanto nada foi publicado, carrega uma cópia local. Sem ele, usa o cache
+    do processo, reconstruído em segundo plano quando o export muda.
+    """
+    if DIRETORIO_COMPARTILHADO:
+        from compartilhado import anexo_compartilhado
+        publicado = anexo_compartilhado(DIRETORIO_COMPARTILHADO).current()
+        if publicado is not None:
+            return publicado
+        return _DATASET_CACHE.get(TRELLO_JSON_PATH, carregar_df_mestre)
+    return _DATASET_CACHE.current(TRELLO_JSON_PATH, carregar_df_mestre)
+
+
+def versao_export(path: str = TRELLO_JSON_PATH) -> Optional[str]:
+    """SHA-256 do export (memoizado enquanto mtime e tamanho não mudam), sem carregar o DataFrame; None se não existir."""
+    try:
+        return _DATASET_CACHE._file_hash(path)
+    except FileNotFoundError:
+        return None
+
+
+def leitura_dados():
+    # Importado aqui: o job de sincronização e o benchmark usam este módulo sem o Streamlit
+    import streamlit as st
+
+    # O DataFrame é construído uma vez por versão do arquivo e compartilhado entre as sessões.
+    # Quando o arquivo muda, o observador reconstrói em segundo plano e publica a nova versão:
+    # cada rerun pega a versão publicada mais recente, sem esperar a leitura do JSON
+    versao, df_mestre = dataset_atual()
+
+    dados = st.session_state.get('dados')
+    if dados is not None and dados['versao'] == versao:
+        return
+
+    if df_mestre.empty:
+        st.error("Não foi possível carregar os dados do Trello. Verifique o arquivo JSON.")
+
+    dados={
+        'df_trello':df_mestre,
+        'versao':versao
+    }
+    st.session_state['dados']=dados
+
+
+@cronometrado("metricas_derivadas")
+def calcular_metricas_derivadas(df: pd.DataFrame, hoje: pd.Timestamp,
+                                linhas_por_card: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Acrescenta ao DataFrame mestre as colunas derivadas usadas pelas páginas.
+
+    Args:
+        df (pd.DataFrame): O DataFrame mestre (não é modificado).
+        hoje (pd.Timestamp): Data de referência, normalizada e no fuso de São Paulo.
+        linhas_por_card (Optional[np.ndarray]): Número de linhas (membros) do card de cada linha, quando
+            `df` é só uma parte do DataFrame mestre; por padrão, contado no próprio `df`.
+
+    Returns:
+        pd.DataFrame: Novo DataFrame com `Vencendo_Esta_Semana`, `Atrasada`, `Tempo_Estimado_Horas`,
+        `Peso_Atribuicao` (1 / número de membros do card: a parte de cada membro no card)
+        e `Horas_Rateadas` (horas do card divididas entre os membros).
+    """
+    if df.empty and 'Data_Entrega' not in df.columns:
+        return df
+    inicio_semana = hoje - pd.Timedelta(days=hoje.dayofweek)
+    fim_semana = inicio_semana + pd.Timedelta(days=6)
+
+    entrega = df['Data_Entrega']
+    conclusao = df['Data_Conclusao']
+    entrega_dia = entrega.dt.normalize()
+
+    # Uma tarefa está atrasada se não foi concluída e a entrega já passou
+    condicao_a = conclusao.isna() & entrega.notna() & (entrega < hoje)
+    condicao_b = (df['Status'] != "CONCLUÍDO") & (entrega < conclusao)
+
+    tempo_min = pd.to_numeric(df['Tempo_Estimado_Min'], errors='coerce')
+    # Cada card aparece uma vez por membro: o peso divide o card entre eles
+    if linhas_por_card is None:
+        codigos = pd.factorize(df['ID_Tarefa'])[0]
+        linhas_por_card = np.bincount(codigos)[codigos]
+    peso = 1.0 / np.asarray(linhas_por_card, dtype='float64')
+    return df.assign(
+        Vencendo_Esta_Semana=(entrega_dia >= inicio_semana) & (entrega_dia <= fim_semana),
+        Atrasada=np.where(condicao_b | condicao_a, True, False),
+        Tempo_Estimado_Min=tempo_min,
+        Tempo_Estimado_Horas=tempo_min / 60,
+        Peso_Atribuicao=peso,
+        Horas_Rateadas=(tempo_min / 60) * peso,
+    )
+
+
+class DerivedMetricsCache:
+    """
+    Memoiza as colunas derivadas por (snapshot, data de referência) e as visões filtradas
+    por estado dos filtros, com descarte LRU. Compartilhado entre as sessões do processo.
+    """
+
+    def __init__(self, max_views: int = 32):
+        self.max_views = max_views
+        self._lock = threading.Lock()
+        self._base: Dict[Tuple, pd.DataFrame] = {}
+        self._cubes: Dict[Tuple, pd.DataFrame] = {}
+        self._labels: Dict[str, IndiceEtiquetas] = {}
+        self._tasks: Dict[Tuple, IndiceTarefas] = {}
+        self._fields: Dict[str, pd.DataFrame] = {}
+        self._views: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+
+    def _derived(self, versao: str, df: pd.DataFrame, hoje: pd.Timestamp) -> pd.DataFrame:
+        key = (versao, hoje)
+        base = self._base.get(key)
+        if base is None:
+            # O DataFrame compartilhado já vem com as colunas derivadas do dia em que foi publicado
+            base = df if df.attrs.get('hoje_derivado') == hoje else calcular_metricas_derivadas(df, hoje)
+            # Só o snapshot e o dia correntes interessam: os anteriores são descartados
+            self._base = {key: base}
+        return base
+
+    def _task_index(self, versao: str, hoje: pd.Timestamp, base: pd.DataFrame) -> IndiceTarefas:
+        key = (versao, hoje)
+        indice = self._tasks.get(key)
+        if indice is None:
+            indice = IndiceTarefas(base)
+            self._tasks = {key: indice}
+        return indice
+
+    def labels(self, versao: str, construir: Callable[[], IndiceEtiquetas]) -> IndiceEtiquetas:
+        """
+        Retorna o índice de etiquetas do snapshot, construindo-o uma única vez (fora do lock:
+        `construir` pode consultar as tarefas do snapshot).
+        """
+        with self._lock:
+            indice = self._labels.get(versao)
+        if indice is None:
+            indice = construir()
+            with self._lock:
+                self._labels = {versao: indice}
+        return indice
+
+    def custom_fields(self, versao: str, construir: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Retorna a tabela de campos personalizados do snapshot, construindo-a uma única vez."""
+        with self._lock:
+            tabela = self._fields.get(versao)
+            if tabela is None:
+                tabela = construir()
+                self._fields = {versao: tabela}
+        return tabela.copy(deep=False)
+
+    def _view(self, key: Tuple, construir: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        view = self._views.get(key)
+        if view is None:
+            view = construir()
+            if view is None:
+                return None
+            self._views[key] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        else:
+            self._views.move_to_end(key)
+        return view
+
+    def get(self, versao: str, df: pd.DataFrame, hoje: pd.Timestamp, filtros: Tuple,
+            colunas: Optional[Tuple[str, ...]] = None,
+            indice_etiquetas: Optional[IndiceEtiquetas] = None) -> pd.DataFrame:
+        """
+        Retorna a visão filtrada do DataFrame derivado, só com as colunas pedidas.
+
+        Args:
+            versao (str): Hash do snapshot de origem.
+            df (pd.DataFrame): O DataFrame mestre desse snapshot.
+            hoje (pd.Timestamp): Data de referência.
+            filtros (Tuple): (incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo),
+                como em `_chave_filtros`.
+            colunas (Optional[Tuple[str, ...]]): Colunas da visão (None mantém todas).
+            indice_etiquetas (Optional[IndiceEtiquetas]): Índice do snapshot (ver `obter_indice_etiquetas`),
+                necessário quando `filtros` tem etiquetas.
+        """
+        def construir():
+            base = self._derived(versao, df, hoje)
+            if base.empty:
+                return base
+            return selecionar_tarefas(base, filtros, self._task_index(versao, hoje, base), indice_etiquetas, colunas)
+
+        with self._lock:
+            view = self._view((versao, hoje, filtros, colunas), construir)
+        return view.copy(deep=False)
+
+    def snapshot_query(self, versao: str, hoje: pd.Timestamp, filtros: Tuple, colunas: Optional[Tuple[str, ...]],
+                       consultar: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Resultado de uma consulta respondida direto do snapshot colunar (ver `consultar_snapshot`);
+        None (e nada memoizado) se o snapshot não pôde ser usado.
+        """
+        with self._lock:
+            view = self._view(('snapshot', versao, hoje, filtros, colunas), consultar)
+        return None if view is None else view.copy(deep=False)
+
+    def cube(self, versao: str, df: pd.DataFrame, hoje: pd.Timestamp) -> pd.DataFrame:
+        """Retorna o cubo de agregados do snapshot e dia de referência, construindo-o uma única vez."""
+        key = (versao, hoje)
+        with self._lock:
+            cubo = self._cubes.get(key)
+            if cubo is None:
+                cubo = construir_cubo(self._derived(versao, df, hoje))
+                self._cubes = {key: cubo}
+        return cubo
+
+    def partitions(self, versao: str, hoje: pd.Timestamp, filtros: Tuple, view: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Partição por membro da visão filtrada `view` (a retornada por `get` com os mesmos filtros)."""
+        with self._lock:
+            return self._view(('membros', versao, hoje, filtros), lambda: particionar_por_membro(view))
+
+    def workload(self, versao: str, hoje: pd.Timestamp, filtros: Tuple, dias: int, view: pd.DataFrame) -> pd.DataFrame:
+        """Matriz membro × dia útil da visão filtrada `view` (a retornada por `get` com os mesmos filtros)."""
+        with self._lock:
+            return self._view(('carga', versao, hoje, filtros, dias), lambda: matriz_carga(view, hoje, dias))
+
+    def filtered_cube(self, versao: str, hoje: pd.Timestamp, filtros: Tuple, view: pd.DataFrame) -> pd.DataFrame:
+        """
+        Cubo da visão filtrada `view` (a retornada por `get` com os mesmos filtros), para filtros que não são
+        dimensões do cubo completo (etiquetas, período). Memoizado junto com as visões filtradas.
+        """
+        with self._lock:
+            return self._view(('cubo', versao, hoje, filtros), lambda: construir_cubo(view))
+
+
+_METRICAS_CACHE = DerivedMetricsCache()
+
+
+def _instantes_ns(datas: pd.Series) -> np.ndarray:
+    """Instantes em nanossegundos (UTC) de uma coluna de datas com fuso; sem data vira o maior inteiro (ordena no fim)."""
+    utc = pd.to_datetime(datas, utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    return np.where(np.isnat(utc), np.iinfo(np.int64).max, utc.view('int64'))
+
+
+def limites_periodo(periodo: Tuple) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Converte um período de datas (início, fim), ambos inclusive, no intervalo semiaberto [início, fim + 1 dia)
+    em São Paulo.
+    """
+    de, ate = (pd.Timestamp(data) for data in periodo)
+    de = de.tz_localize('America/Sao_Paulo') if de.tzinfo is None else de.tz_convert('America/Sao_Paulo')
+    ate = ate.tz_localize('America/Sao_Paulo') if ate.tzinfo is None else ate.tz_convert('America/Sao_Paulo')
+    return de.normalize(), ate.normalize() + pd.Timedelta(days=1)
+
+
+@cronometrado("filtros")
+def aplicar_filtros(df: pd.DataFrame, incluir_rotinas: bool = True, quadros: Optional[Tuple[str, ...]] = None,
+                    status: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                    modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                    periodo: Optional[Tuple] = None, indice: Optional[IndiceEtiquetas] = None) -> pd.DataFrame:
+    """
+    Aplica os filtros da barra lateral ao DataFrame de tarefas, com máscaras sobre todas as linhas
+    (o DataFrame derivado do snapshot corrente é consultado por `selecionar_tarefas`, pelos índices).
+
+    O filtro de etiquetas mantém as tarefas com qualquer uma (`modo_etiquetas="any"`) ou todas
+    (`"all"`) as etiquetas, consultando o `indice` (construído a partir do DataFrame se omitido).
+    O `periodo` (início, fim), inclusive, filtra pela data de entrega; tarefas sem data ficam de fora.
+    """
+    if df.empty:
+        return df
+    mascara = pd.Series(True, index=df.index)
+    if not incluir_rotinas:
+        mascara &= df['Is_Rotina'] == False
+    if quadros is not None:
+        mascara &= df['Board'].isin(quadros)
+    if status is not None:
+        mascara &= df['Status'].isin(status)
+    if membros:
+        mascara &= df['Membro'].isin(membros)
+    if periodo is not None:
+        de, ate = limites_periodo(periodo)
+        mascara &= (df['Data_Entrega'] >= de) & (df['Data_Entrega'] < ate)
+    if etiquetas:
+        indice = indice or IndiceEtiquetas.from_dataframe(df)
+        mascara &= indice.mascara_linhas(df['ID_Tarefa'], etiquetas, modo_etiquetas)
+    if mascara.all():
+        return df
+    return df[mascara]
+
+
+def particionar_por_membro(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Posições das linhas de cada membro, calculadas com um único groupby.
+
+    Returns:
+        Dict[str, np.ndarray]: Membro (em ordem alfabética) → posições (para `df.iloc`).
+    """
+    if df.empty:
+        return {}
+    return dict(df.groupby('Membro', observed=True, sort=True).indices)
+
+
+def _chave_filtros(incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros=None, periodo=None) -> Tuple:
+    return (incluir_rotinas, tuple(quadros) if quadros is not None else None,
+            tuple(status) if status is not None else None,
+            tuple(sorted(etiquetas)) if etiquetas else None, modo_etiquetas,
+            tuple(sorted(membros)) if membros else None,
+            tuple(pd.Timestamp(data).date() for data in periodo) if periodo else None)
+
+
+@cronometrado("consulta")
+def selecionar_tarefas(df: pd.DataFrame, filtros: Tuple, indice: IndiceTarefas, indice_etiquetas: Optional[IndiceEtiquetas],
+                       colunas: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """
+    Recorta do DataFrame derivado as linhas que passam por `filtros` (ver `_chave_filtros`) e as `colunas`.
+
+    As linhas vêm do índice por status e entrega e só as selecionadas são testadas contra os demais
+    predicados; apenas o recorte (linhas × colunas pedidas) é materializado.
+    """
+    incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo = filtros
+    posicoes = indice.selecionar(incluir_rotinas, quadros, status, membros, periodo)
+    if etiquetas:
+        ids = df['ID_Tarefa'] if posicoes is None else df['ID_Tarefa'].iloc[posicoes]
+        mascara = indice_etiquetas.mascara_linhas(ids, etiquetas, modo_etiquetas)
+        posicoes = np.flatnonzero(mascara) if posicoes is None else posicoes[mascara]
+    recorte = df if colunas is None else df[list(colunas)]
+    if posicoes is None or len(posicoes) == len(df):
+        return recorte
+    return recorte.take(posicoes)
+
+
+def construir_indice_etiquetas(json_path: str) -> Optional[IndiceEtiquetas]:
+    """Constrói o índice de etiquetas (ver `TrelloDataFrameBuilder.build_label_index`) a partir do export."""
+    return TrelloDataFrameBuilder(json_path=json_path).build_label_index()
+
+
+def carregar_indice_etiquetas(json_path: str, versao: Optional[str] = None,
+                              path: Optional[str] = None) -> Optional[IndiceEtiquetas]:
+    """
+    Carrega o índice de etiquetas do snapshot de etiquetas (`path`, por padrão `ETIQUETAS_SNAPSHOT_PATH`)
+    quando ele corresponde à versão do JSON, recorrendo à construção a partir do JSON se estiver ausente
+    ou desatualizado.
+
+    Returns:
+        Optional[IndiceEtiquetas]: O índice, ou None se o export não existir ou já for de outra versão.
+    """
+    tabela = ler_snapshot_colunar(path or ETIQUETAS_SNAPSHOT_PATH, versao) if versao else None
+    if tabela is not None:
+        return IndiceEtiquetas.from_tabela(tabela)
+    if versao and versao_export(json_path) != versao:
+        return None
+    return construir_indice_etiquetas(json_path)
+
+
+def obter_indice_etiquetas(dados: Optional[Dict[str, Any]]) -> IndiceEtiquetas:
+    """
+    Índice de etiquetas do snapshot atual (opções e consultas do filtro de etiquetas).
+
+    Vem dos `idLabels` dos cards (snapshot de etiquetas ou export), então nomes de etiqueta com vírgula
+    ficam inteiros. `dados['indice_etiquetas']`, se presente, é usado no lugar (a sincronização passa o
+    índice que acabou de gravar); sem o export dessa versão, o índice é aproximado pela coluna `Etiquetas`.
+    """
+    dados = dados_consulta(dados)
+    if dados.get('indice_etiquetas') is not None:
+        return dados['indice_etiquetas']
+    versao = dados['versao']
+
+    def pela_coluna():
+        df = dados['df_trello']
+        if df is None:
+            df = consultar_tarefas(dados, ('ID_Tarefa', 'Etiquetas'))
+        return IndiceEtiquetas.from_dataframe(df)
+
+    if versao is None:
+        return pela_coluna()
+    # No modo compartilhado a versão leva o sufixo da geração; o snapshot é identificado só pelo hash do JSON
+    hash_json = versao.split('-')[0]
+    return _METRICAS_CACHE.labels(versao, lambda: carregar_indice_etiquetas(TRELLO_JSON_PATH, hash_json) or pela_coluna())
+
+
+def construir_campos_personalizados(json_path: str) -> pd.DataFrame:
+    """Constrói a tabela de campos personalizados (ver `TrelloDataFrameBuilder.build_custom_fields`) a partir do export."""
+    return TrelloDataFrameBuilder(json_path=json_path).build_custom_fields()
+
+
+def carregar_campos_personalizados(json_path: str, versao: Optional[str] = None) -> pd.DataFrame:
+    """
+    Carrega a tabela de campos personalizados do snapshot colunar quando ele corresponde à versão
+    do JSON, recorrendo à construção a partir do JSON se estiver ausente ou desatualizado.
+    """
+    tabela = ler_snapshot_colunar(CAMPOS_SNAPSHOT_PATH, versao) if versao else None
+    if tabela is not None:
+        return tabela.set_index('ID_Tarefa')
+    return construir_campos_personalizados(json_path)
+
+
+def obter_campos_personalizados(dados: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Campos personalizados dos cards do snapshot atual, uma coluna tipada por campo do quadro.
+
+    A tabela é indexada por `ID_Tarefa` (uma linha por card), pronta para `df.join(campos, on='ID_Tarefa')`.
+    """
+    versao = dados['versao']
+    if versao is None:
+        return construir_campos_personalizados(TRELLO_JSON_PATH)
+    # No modo compartilhado a versão leva o sufixo da geração; o snapshot é identificado só pelo hash do JSON
+    hash_json = versao.split('-')[0]
+    return _METRICAS_CACHE.custom_fields(versao, lambda: carregar_campos_personalizados(TRELLO_JSON_PATH, hash_json))
+
+
+# Colunas derivadas e as colunas do DataFrame mestre de que elas dependem
+COLUNAS_DERIVADAS = ['Vencendo_Esta_Semana', 'Atrasada', 'Tempo_Estimado_Horas', 'Peso_Atribuicao', 'Horas_Rateadas']
+DEPENDENCIAS_DERIVADAS = ['ID_Tarefa', 'Status', 'Data_Entrega', 'Data_Conclusao', 'Tempo_Estimado_Min']
+
+
+def _texto(coluna: pa.ChunkedArray) -> pa.ChunkedArray:
+    return coluna.cast(coluna.type.value_type) if pa.types.is_dictionary(coluna.type) else coluna
+
+
+@cronometrado("consulta_snapshot")
+def consultar_snapshot(path: str, versao_origem: str, hoje: pd.Timestamp, filtros: Tuple,
+                       colunas: Optional[Tuple[str, ...]] = None,
+                       indice_etiquetas: Optional[IndiceEtiquetas] = None) -> Optional[pd.DataFrame]:
+    """
+    Responde uma consulta direto do snapshot colunar, sem carregar o DataFrame mestre.
+
+    O arquivo é aberto com memory mapping, os predicados são avaliados no Arrow só sobre as colunas
+    que eles usam, e apenas as linhas selecionadas das colunas pedidas (mais as de que as colunas
+    derivadas dependem) viram pandas. O peso de cada card é contado no snapshot inteiro, então as
+    colunas derivadas do recorte são as mesmas do DataFrame completo.
+
+    Args:
+        path (str): Caminho do snapshot.
+        versao_origem (str): SHA-256 do export; o snapshot de outra versão não é usado.
+        hoje (pd.Timestamp): Data de referência das colunas derivadas.
+        filtros (Tuple): Como em `_chave_filtros`.
+        colunas (Optional[Tuple[str, ...]]): Colunas do resultado (None: todas, com as derivadas).
+        indice_etiquetas (Optional[IndiceEtiquetas]): Índice usado pelo filtro de etiquetas.
+
+    Returns:
+        Optional[pd.DataFrame]: O recorte, indexado pelas posições no snapshot (como a visão do
+        DataFrame completo), ou None se o snapshot não existir ou não corresponder a `versao_origem`.
+    """
+    import pyarrow.compute as pc
+
+    table = _tabela_snapshot(path, versao_origem)
+    if table is None:
+        return None
+    incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo = filtros
+    condicoes = []
+    if not incluir_rotinas:
+        condicoes.append(pc.equal(table['Is_Rotina'], False))
+    for coluna, valores in (('Board', quadros), ('Status', status), ('Membro', membros)):
+        if valores is not None:
+            texto = _texto(table[coluna])
+            condicoes.append(pc.is_in(texto, value_set=pa.array(list(valores), texto.type)))
+    if periodo is not None:
+        de, ate = limites_periodo(periodo)
+        entrega = table['Data_Entrega']
+        condicoes.append(pc.and_(pc.greater_equal(entrega, pa.scalar(de, entrega.type)),
+                                 pc.less(entrega, pa.scalar(ate, entrega.type))))
+    if etiquetas:
+        indice_etiquetas = indice_etiquetas or IndiceEtiquetas.from_dataframe(table.select(['ID_Tarefa', 'Etiquetas']).to_pandas())
+        condicoes.append(pa.array(indice_etiquetas.mascara_linhas(table['ID_Tarefa'].to_pandas(), etiquetas, modo_etiquetas)))
+
+    nomes = list(colunas) if colunas is not None else table.column_names + COLUNAS_DERIVADAS
+    derivar = any(nome in COLUNAS_DERIVADAS or nome == 'Tempo_Estimado_Min' for nome in nomes)
+    recorte = table.select([nome for nome in table.column_names
+                            if nome in nomes or (derivar and nome in DEPENDENCIAS_DERIVADAS)])
+    posicoes = None
+    if condicoes:
+        mascara = condicoes[0]
+        for condicao in condicoes[1:]:
+            mascara = pc.and_(mascara, condicao)
+        posicoes = pc.indices_nonzero(pc.fill_null(mascara, False))
+        recorte = recorte.take(posicoes)
+    df = recorte.to_pandas(split_blocks=True)
+    if posicoes is not None:
+        df.index = pd.Index(posicoes.to_numpy().astype(np.int64))
+    if derivar:
+        # Membros de cada card contados no snapshot inteiro, não só no recorte
+        contagem = pc.value_counts(table['ID_Tarefa'])
+        linhas_por_card = pc.take(contagem.field('counts'),
+                                  pc.index_in(recorte['ID_Tarefa'], value_set=contagem.field('values')))
+        df = calcular_metricas_derivadas(df, hoje, linhas_por_card.to_numpy())
+    return df[nomes]
+
+
+def dados_consulta(dados: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Os `dados` a consultar: os da sessão, se houver; senão, o snapshot colunar, quando corresponde ao
+    export (com `df_trello` None, as consultas vão direto ao arquivo), ou o DataFrame do processo.
+    """
+    if dados is not None:
+        return dados
+    versao = versao_export()
+    if versao and not DIRETORIO_COMPARTILHADO and snapshot_valido(SNAPSHOT_PATH, versao):
+        return {'df_trello': None, 'versao': versao}
+    versao, df_mestre = dataset_atual()
+    return {'df_trello': df_mestre, 'versao': versao}
+
+
+def consultar_tarefas(dados: Optional[Dict[str, Any]], colunas: Optional[List[str]] = None,
+                      status: Optional[Tuple[str, ...]] = None, membros: Optional[Tuple[str, ...]] = None,
+                      periodo: Optional[Tuple] = None, incluir_rotinas: bool = True,
+                      quadros: Optional[Tuple[str, ...]] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                      modo_etiquetas: str = "any", hoje: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Consulta às tarefas (com as colunas derivadas): só as `colunas` pedidas, das linhas que passam pelos predicados.
+
+    Com o DataFrame carregado, as linhas vêm do índice por status e data de entrega (`IndiceTarefas`);
+    sem ele (`dados` None, como quando a página é servida pelo relatório pré-calculado), a consulta é
+    empurrada para o snapshot colunar (`consultar_snapshot`). Nos dois casos o resultado é memoizado
+    por snapshot, dia, predicados e colunas, e não deve ser alterado no lugar.
+
+    Args:
+        dados (Optional[Dict[str, Any]]): O dicionário de `leitura_dados`, ou None.
+        colunas (Optional[List[str]]): Colunas do resultado (None mantém todas).
+        status (Optional[Tuple[str, ...]]): Status a manter (None mantém todos).
+        membros (Optional[Tuple[str, ...]]): Membros a manter (None ou vazio mantém todos).
+        periodo (Optional[Tuple]): (início, fim) da data de entrega, inclusive; tarefas sem data ficam de fora.
+        incluir_rotinas (bool): Se False, exclui as tarefas de rotina.
+        quadros (Optional[Tuple[str, ...]]): Quadros a manter (None mantém todos).
+        etiquetas (Optional[Tuple[str, ...]]): Etiquetas a filtrar (None ou vazio não filtra).
+        modo_etiquetas (str): "any" mantém tarefas com qualquer uma das etiquetas; "all", com todas.
+        hoje (Optional[pd.Timestamp]): Data de referência (padrão: hoje em São Paulo).
+    """
+    if hoje is None:
+        hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    dados = dados_consulta(dados)
+    filtros = _chave_filtros(incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo)
+    colunas = tuple(colunas) if colunas is not None else None
+    if dados['df_trello'] is None:
+        # Fora do lock do cache: o índice de etiquetas também é consultado no snapshot
+        indice = obter_indice_etiquetas(dados) if etiquetas else None
+        recorte = _METRICAS_CACHE.snapshot_query(dados['versao'], hoje, filtros, colunas, lambda: consultar_snapshot(
+            SNAPSHOT_PATH, dados['versao'], hoje, filtros, colunas, indice
+        ))
+        if recorte is not None:
+            return recorte
+        # O snapshot foi trocado depois da verificação: usa o DataFrame do processo
+        versao, df_mestre = dataset_atual()
+        dados = {'df_trello': df_mestre, 'versao': versao}
+    if dados['versao'] is None:
+        df = aplicar_filtros(calcular_metricas_derivadas(dados['df_trello'], hoje), *filtros)
+        return df if colunas is None or df.columns.empty else df[list(colunas)]
+    indice = obter_indice_etiquetas(dados) if etiquetas else None
+    return _METRICAS_CACHE.get(dados['versao'], dados['df_trello'], hoje, filtros, colunas, indice)
+
+
+def obter_tarefas(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                  quadros: Optional[Tuple[str, ...]] = None, status: Optional[Tuple[str, ...]] = None,
+                  hoje: Optional[pd.Timestamp] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                  modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                  periodo: Optional[Tuple] = None) -> pd.DataFrame:
+    """
+    Retorna o DataFrame de tarefas com as colunas derivadas, já filtrado (todas as colunas de `consultar_tarefas`).
+
+    As colunas derivadas são calculadas uma vez por snapshot e dia, e cada combinação de filtros
+    é memoizada: reruns do Streamlit com os mesmos filtros não refazem nenhum cálculo.
+
+    Returns:
+        pd.DataFrame: Visão do DataFrame derivado; não deve ser alterada no lugar.
+    """
+    return consultar_tarefas(dados, None, status, membros, periodo, incluir_rotinas, quadros,
+                             etiquetas, modo_etiquetas, hoje)
+
+
+def obter_tarefas_por_membro(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                             quadros: Optional[Tuple[str, ...]] = None, status: Optional[Tuple[str, ...]] = None,
+                             hoje: Optional[pd.Timestamp] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                             modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                             periodo: Optional[Tuple] = None,
+                             colunas: Optional[List[str]] = None) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Como `consultar_tarefas`, retornando também a partição por membro do resultado (`colunas`, se
+    informadas, devem incluir `Membro`).
+
+    A partição é memoizada junto com a visão, então cada membro é recortado em tempo
+    proporcional às suas próprias linhas, sem refiltrar o DataFrame inteiro.
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, np.ndarray]]: A visão filtrada e `{membro: posições}`.
+    """
+    if hoje is None:
+        hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    dados = dados_consulta(dados)
+    df = consultar_tarefas(dados, colunas, status, membros, periodo, incluir_rotinas, quadros,
+                           etiquetas, modo_etiquetas, hoje)
+    if dados['versao'] is None:
+        return df, particionar_por_membro(df)
+    filtros = _chave_filtros(incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo)
+    return df, _METRICAS_CACHE.partitions(dados['versao'], hoje, filtros, df)
+
+
+def obter_carga_trabalho(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True,
+                         quadros: Optional[Tuple[str, ...]] = None, dias: int = HORIZONTE_PADRAO_DIAS,
+                         hoje: Optional[pd.Timestamp] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+                         modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+                         periodo: Optional[Tuple] = None) -> pd.DataFrame:
+    """
+    Horas projetadas de cada membro em cada dia útil do horizonte, a partir das tarefas abertas
+    (A FAZER e FAZENDO) que passam pelos filtros. Ver `alocacao.matriz_carga`.
+
+    Returns:
+        pd.DataFrame: Membros nas linhas, dias úteis nas colunas.
+    """
+    if hoje is None:
+        hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    status = ('A FAZER', 'FAZENDO')
+    dados = dados_consulta(dados)
+    df = consultar_tarefas(dados, ['Membro', 'Data_Entrega', 'Horas_Rateadas'], status, membros, periodo,
+                           incluir_rotinas, quadros, etiquetas, modo_etiquetas, hoje)
+    if dados['versao'] is None:
+        return matriz_carga(df, hoje, dias)
+    filtros = _chave_filtros(incluir_rotinas, quadros, status, etiquetas, modo_etiquetas, membros, periodo)
+    return _METRICAS_CACHE.workload(dados['versao'], hoje, filtros, dias, df)
+
+
+# Dimensões do cubo de agregados usado pelo Resumo Histórico
+CUBO_DIMENSOES = ['Board', 'Membro', 'Status', 'Is_Rotina', 'Semana_Entrega']
+CUBO_MEDIDAS = [
+    'Qtd_Tarefas', 'Qtd_Atrasadas', 'Qtd_Atrasadas_Abertas', 'Qtd_Vencendo_Semana', 'Horas_Estimadas',
+    'Qtd_Cards', 'Qtd_Cards_Atrasados', 'Qtd_Cards_Vencendo_Semana', 'Horas_Rateadas',
+]
+# Colunas das tarefas lidas para montar o cubo
+COLUNAS_CUBO = [
+    'ID_Tarefa', 'Board', 'Membro', 'Status', 'Is_Rotina', 'Data_Entrega', 'Atrasada', 'Vencendo_Esta_Semana',
+    'Tempo_Estimado_Horas', 'Horas_Rateadas',
+]
+
+
+@cronometrado("cubo")
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega o DataFrame derivado por quadro × membro × status × rotina × semana de entrega.
+
+    O tamanho do cubo depende do número de membros e semanas, não do número de tarefas,
+    então os gráficos e métricas do Resumo Histórico são respondidos a partir dele.
+
+    Returns:
+        pd.DataFrame: Uma linha por combinação observada, com as contagens por atribuição (card × membro)
+        `Qtd_Tarefas`, `Qtd_Atrasadas`, `Qtd_Atrasadas_Abertas`, `Qtd_Vencendo_Semana` e `Horas_Estimadas`,
+        as contagens por card distinto de `df` (frações que somam 1 por card) `Qtd_Cards`, `Qtd_Cards_Atrasados`
+        e `Qtd_Cards_Vencendo_Semana`, e `Horas_Rateadas` (a parte de cada membro nas horas do card).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=CUBO_DIMENSOES + CUBO_MEDIDAS)
+    # Contado nas linhas de `df`, e não em `Peso_Atribuicao`: se só parte dos membros de um card foi
+    # selecionada, o card ainda soma 1
+    codigos = pd.factorize(df['ID_Tarefa'], use_na_sentinel=False)[0]
+    peso = pd.Series(1.0 / np.bincount(codigos)[codigos], index=df.index)
+    entrega_dia = df['Data_Entrega'].dt.normalize()
+    base = pd.DataFrame({
+        'Board': df['Board'],
+        'Membro': df['Membro'],
+        'Status': df['Status'],
+        'Is_Rotina': df['Is_Rotina'],
+        'Semana_Entrega': entrega_dia - pd.to_timedelta(entrega_dia.dt.dayofweek, unit='D'),
+        'Qtd_Tarefas': df['ID_Tarefa'].notna().astype('int64'),
+        'Qtd_Atrasadas': df['Atrasada'].astype('int64'),
+        'Qtd_Atrasadas_Abertas': (df['Atrasada'] & (df['Status'] != "CONCLUÍDO")).astype('int64'),
+        'Qtd_Vencendo_Semana': df['Vencendo_Esta_Semana'].astype('int64'),
+        'Horas_Estimadas': df['Tempo_Estimado_Horas'].astype('float64'),
+        'Qtd_Cards': peso,
+        'Qtd_Cards_Atrasados': peso * df['Atrasada'],
+        'Qtd_Cards_Vencendo_Semana': peso * df['Vencendo_Esta_Semana'].astype('float64'),
+        'Horas_Rateadas': df['Horas_Rateadas'].astype('float64'),
+    })
+    return base.groupby(CUBO_DIMENSOES, observed=True, dropna=False, sort=False).sum().reset_index()
+
+
+def obter_cubo(dados: Optional[Dict[str, Any]], incluir_rotinas: bool = True, quadros: Optional[Tuple[str, ...]] = None,
+               hoje: Optional[pd.Timestamp] = None, etiquetas: Optional[Tuple[str, ...]] = None,
+               modo_etiquetas: str = "any", membros: Optional[Tuple[str, ...]] = None,
+               periodo: Optional[Tuple] = None) -> pd.DataFrame:
+    """
+    Retorna o cubo de agregados do snapshot atual, já com os filtros da barra lateral aplicados.
+
+    Args:
+        dados (Optional[Dict[str, Any]]): O dicionário guardado por `leitura_dados` em `st.session_state['dados']`,
+            ou None para consultar o snapshot colunar (ver `consultar_tarefas`).
+        incluir_rotinas (bool): Se False, exclui as linhas de rotina.
+        quadros (Optional[Tuple[str, ...]]): Quadros a manter (None mantém todos).
+        hoje (Optional[pd.Timestamp]): Data de referência (padrão: hoje em São Paulo).
+        etiquetas (Optional[Tuple[str, ...]]): Etiquetas a filtrar; com etiquetas, membros ou período, o cubo é
+            refeito a partir das tarefas consultadas (e memoizado por combinação de filtros).
+        modo_etiquetas (str): "any" ou "all", como em `obter_tarefas`.
+        membros (Optional[Tuple[str, ...]]): Membros a manter (None ou vazio mantém todos); os cards com
+            algum membro selecionado contam uma vez cada nas contagens de cards distintos.
+        periodo (Optional[Tuple]): (início, fim) da data de entrega, inclusive.
+    """
+    if hoje is None:
+        hoje = pd.Timestamp.now(tz='America/Sao_Paulo').normalize()
+    dados = dados_consulta(dados)
+    if dados['df_trello'] is not None and not etiquetas and not membros and periodo is None:
+        # Rotina e quadros são dimensões do cubo completo e valem para o card inteiro: basta filtrar as suas linhas
+        if dados['versao'] is None:
+            cubo = construir_cubo(calcular_metricas_derivadas(dados['df_trello'], hoje))
+        else:
+            cubo = _METRICAS_CACHE.cube(dados['versao'], dados['df_trello'], hoje)
+        return aplicar_filtros(cubo, incluir_rotinas=incluir_rotinas, quadros=quadros)
+    # Etiquetas e período não são dimensões do cubo, e o filtro de membros separa os membros de um card
+    # (as frações do cubo completo deixariam de somar 1 por card); sem o DataFrame carregado, não há cubo
+    # completo. O cubo é refeito a partir das tarefas consultadas, só com as colunas que usa
+    tarefas = consultar_tarefas(dados, COLUNAS_CUBO, None, membros, periodo, incluir_rotinas, quadros,
+                                etiquetas, modo_etiquetas, hoje)
+    if dados['versao'] is None:
+        return construir_cubo(tarefas)
+    filtros = _chave_filtros(incluir_rotinas, quadros, None, etiquetas, modo_etiquetas, membros, periodo)
+    return _METRICAS_CACHE.filtered_cube(dados['versao'], hoje, filtros, tarefas)